@@ -0,0 +1,385 @@
+import os
+import io
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import telemetry
+
+# Bump when the stored layout of any analyzer result changes
+CACHE_VERSION = 4
+
+# Part of each analyzer's cache key: bump one when its algorithm changes the
+# results without changing their layout, so older entries stop matching
+ALGORITHM_VERSIONS = {"scene_cuts": 1, "emotion": 1, "segment_emotion": 1}
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "VHG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "video_highlights")
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("VHG_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Bytes read from the start, middle and end of a file for its fingerprint
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+# Scene detection in cached_video_frames: "shared" runs the SceneCutConsumer on
+# the decode shared with emotion sampling, "fast" runs
+# scene_detector.get_scene_cuts_fast (chunk-parallel) on its own decode
+SCENE_MODES = ("shared", "fast")
+
+
+def file_fingerprint(path, sample_bytes=FINGERPRINT_SAMPLE_BYTES):
+    """
+    Fast content hash of a video: blake2b over the file size plus 1 MiB taken
+    from the start, middle and end. Re-uploads of the same file get the same
+    fingerprint even though they land at a new temporary path.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - sample_bytes // 2), max(0, size - sample_bytes)}):
+            f.seek(offset)
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Content-addressed on-disk cache for analyzer results.
+
+    Each entry is one .npz file named after a hash of (analyzer, video
+    fingerprint, analyzer parameters). Reading an entry refreshes its mtime,
+    and the least recently used entries are deleted once the directory grows
+    past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, video_path):
+        """File fingerprint, memoized per (path, size, mtime) so reruns skip the hashing."""
+        stat = os.stat(video_path)
+        memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._fingerprints:
+            self._fingerprints[memo_key] = file_fingerprint(video_path)
+        return self._fingerprints[memo_key]
+
+    def entry_path(self, analyzer, video_path, params):
+        key_source = json.dumps(
+            {"v": CACHE_VERSION, "analyzer": analyzer, "video": self.fingerprint(video_path), "params": params},
+            sort_keys=True
+        )
+        key = hashlib.blake2b(key_source.encode(), digest_size=20).hexdigest()
+        return os.path.join(self.cache_dir, f"{analyzer}-{key}.npz")
+
+    def get(self, analyzer, video_path, params):
+        """Returns the stored dict of arrays, or None on a miss."""
+        path = self.entry_path(analyzer, video_path, params)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            telemetry.add("cache_misses")
+            return None
+
+        with self._lock:
+            self.hits += 1
+        telemetry.add("cache_hits")
+        return arrays
+
+    def put(self, analyzer, video_path, params, arrays):
+        """Stores a dict of arrays atomically, then enforces the size bound."""
+        path = self.entry_path(analyzer, video_path, params)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters plus the current size of the cache directory."""
+        files = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith(".npz")]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{self.hits / lookups * 100:.1f}%" if lookups else "n/a",
+            "evictions": self.evictions,
+            "entries": len(files),
+            "size_mb": round(sum(os.path.getsize(f) for f in files if os.path.exists(f)) / 1024 / 1024, 2),
+        }
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Returns the process-wide AnalysisCache."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
+
+
+# --- Converters between analyzer results and arrays ---
+
+def _json_array(value):
+    return np.array(json.dumps(value))
+
+
+def _from_json_array(array):
+    return json.loads(str(array))
+
+
+def scene_cuts_to_arrays(scene_cuts_df):
+    return {
+        "segment": scene_cuts_df.index.to_numpy(dtype=np.int64),
+        "start_time": scene_cuts_df["Start_Time"].to_numpy(dtype=str),
+        "end_time": scene_cuts_df["End_Time"].to_numpy(dtype=str),
+    }
+
+
+def scene_cuts_from_arrays(arrays):
+    return pd.DataFrame({
+        "Segment": arrays["segment"],
+        "Start_Time": arrays["start_time"].astype(str),
+        "End_Time": arrays["end_time"].astype(str),
+    }).set_index("Segment")
+
+
+def audio_peaks_to_arrays(peak_data, envelope):
+    return {
+        "peak_time": peak_data.time_seconds,
+        "peak_score": peak_data.score,
+        "peak_end": peak_data.end_seconds,
+        "hop_seconds": np.float64(envelope.hop_seconds),
+        "features": envelope.features,
+        "feature_names": np.array(envelope.names),
+    }
+
+
+def audio_peaks_from_arrays(arrays):
+    from audio_analyzer import AudioEnvelope, AudioPeaks
+    envelope = AudioEnvelope(float(arrays["hop_seconds"]), arrays["features"], tuple(arrays["feature_names"].tolist()))
+    return AudioPeaks(arrays["peak_time"], arrays["peak_score"], arrays["peak_end"]), envelope
+
+
+# --- Cached analyzer entry points ---
+
+def _scene_params(mode, threshold, downscale=None, frame_skip=0):
+    """
+    Cache key parameters of a scene cut list. The implementations differ in
+    their results, so the mode is part of the key; the worker count of the
+    fast mode is not (its chunks do not depend on it).
+    """
+    params = {"detector": "content", "mode": mode, "threshold": threshold, "version": ALGORITHM_VERSIONS["scene_cuts"]}
+    if mode != "full":
+        params.update(downscale=downscale, frame_skip=frame_skip)
+    return params
+
+
+def cached_scene_cuts(video_path, threshold=27, cache=None, mode="full", downscale=None, frame_skip=0, workers=None):
+    """
+    Scene cuts through the cache: get_scene_cuts (SceneManager) for
+    mode="full", get_scene_cuts_fast with downscale/frame_skip/workers for
+    mode="fast".
+    """
+    from scene_detector import get_scene_cuts, get_scene_cuts_fast
+
+    if mode not in ("full", "fast"):
+        raise ValueError(f"Unknown scene detection mode '{mode}'")
+    cache = cache or get_cache()
+    params = _scene_params(mode, threshold, downscale, frame_skip)
+    arrays = cache.get("scene_cuts", video_path, params)
+    if arrays is not None:
+        return scene_cuts_from_arrays(arrays)
+
+    if mode == "fast":
+        scene_cuts_df = get_scene_cuts_fast(video_path, threshold=threshold, workers=workers,
+                                            downscale=downscale, frame_skip=frame_skip)
+    else:
+        scene_cuts_df = get_scene_cuts(video_path, threshold=threshold)
+    if "Error" not in scene_cuts_df.columns:
+        cache.put("scene_cuts", video_path, params, scene_cuts_to_arrays(scene_cuts_df))
+    return scene_cuts_df
+
+
+def cached_audio_peaks(video_path, frame_length=2048, hop_length=512, cache=None, strict=False, **kwargs):
+    """get_audio_peaks through the cache. Dummy fallback results are never stored."""
+    from audio_analyzer import get_audio_peaks
+
+    cache = cache or get_cache()
+    params = {"frame_length": frame_length, "hop_length": hop_length, **kwargs}
+    arrays = cache.get("audio_peaks", video_path, params)
+    if arrays is not None:
+        return audio_peaks_from_arrays(arrays)
+
+    peak_data, envelope = get_audio_peaks(
+        video_path, frame_length=frame_length, hop_length=hop_length, strict=strict, **kwargs
+    )
+    if not envelope.dummy:
+        cache.put("audio_peaks", video_path, params, audio_peaks_to_arrays(peak_data, envelope))
+    return peak_data, envelope
+
+
+def cached_energy_pyramid(video_path, envelope, frame_length=2048, hop_length=512, cache=None, **kwargs):
+    """
+    EnergyPyramid of a cached_audio_peaks envelope, cached under the same
+    parameters so reruns load the compact levels instead of rebuilding them.
+    """
+    from energy_pyramid import EnergyPyramid
+
+    cache = cache or get_cache()
+    params = {"frame_length": frame_length, "hop_length": hop_length, **kwargs}
+    arrays = cache.get("energy_pyramid", video_path, params)
+    if arrays is not None:
+        return EnergyPyramid.from_arrays(arrays)
+
+    pyramid = EnergyPyramid.from_envelope(envelope)
+    if not envelope.dummy:
+        cache.put("energy_pyramid", video_path, params, pyramid.to_arrays())
+    return pyramid
+
+
+def _emotion_params(implementation, max_frames, prefilter):
+    """
+    Cache key parameters of an emotion summary. get_emotional_score ("seek")
+    and the EmotionSamplerConsumer on the shared decode ("consumer") pick
+    different frames, so their summaries are stored apart.
+    """
+    return {"implementation": implementation, "max_frames": max_frames, "prefilter": bool(prefilter),
+            "version": ALGORITHM_VERSIONS["emotion"]}
+
+
+def cached_emotional_score(video_path, max_frames=50, cache=None, engine=None, prefilter=True):
+    """get_emotional_score through the cache."""
+    from emotion_detector import get_emotional_score
+
+    cache = cache or get_cache()
+    params = _emotion_params("seek", max_frames, prefilter)
+    arrays = cache.get("emotion", video_path, params)
+    if arrays is not None:
+        return _from_json_array(arrays["summary"])
+
+    emotion_summary = get_emotional_score(video_path, max_frames=max_frames, engine=engine, prefilter=prefilter)
+    if "error" not in emotion_summary:
+        cache.put("emotion", video_path, params, {"summary": _json_array(emotion_summary)})
+    return emotion_summary
+
+
+def cached_video_frames(video_path, threshold=27, max_frames=50, engine=None, cache=None,
+                        scene_mode="shared", downscale=None, frame_skip=0, workers=None, prefilter=True):
+    """
+    frame_source.analyze_video_frames through the cache. When only one of the
+    two results is cached, the shared decode runs just the missing analyzer
+    where possible.
+
+    With scene_mode="fast" the scene cuts come from get_scene_cuts_fast
+    (`workers` processes) instead, and the emotion sample from
+    get_emotional_score. `downscale` and `frame_skip` apply to both modes,
+    `prefilter` to the emotion sample.
+    """
+    from frame_source import analyze_video_frames
+
+    if scene_mode not in SCENE_MODES:
+        raise ValueError(f"Unknown scene detection mode '{scene_mode}' (expected one of {', '.join(SCENE_MODES)})")
+    cache = cache or get_cache()
+    if scene_mode == "fast":
+        scene_cuts_df = cached_scene_cuts(video_path, threshold, cache=cache, mode="fast",
+                                          downscale=downscale, frame_skip=frame_skip, workers=workers)
+        emotion_summary = (cached_emotional_score(video_path, max_frames, cache=cache, engine=engine, prefilter=prefilter)
+                           if max_frames else None)
+        return scene_cuts_df, emotion_summary
+
+    scene_params = _scene_params("shared", threshold, downscale, frame_skip)
+    emotion_params = _emotion_params("consumer", max_frames, prefilter)
+
+    scene_arrays = cache.get("scene_cuts", video_path, scene_params)
+    emotion_arrays = cache.get("emotion", video_path, emotion_params) if max_frames else None
+
+    scene_cuts_df = scene_cuts_from_arrays(scene_arrays) if scene_arrays is not None else None
+    emotion_summary = _from_json_array(emotion_arrays["summary"]) if emotion_arrays is not None else None
+
+    if scene_cuts_df is not None and (not max_frames or emotion_summary is not None):
+        return scene_cuts_df, emotion_summary
+
+    if scene_cuts_df is not None:
+        # Scene cuts are cached; only the emotion sample is missing (taken by seeking,
+        # which is stored under its own key)
+        return scene_cuts_df, cached_emotional_score(video_path, max_frames, cache=cache, engine=engine, prefilter=prefilter)
+
+    run_emotion = bool(max_frames) and emotion_summary is None
+    new_scene_cuts_df, new_emotion_summary = analyze_video_frames(
+        video_path, threshold=threshold, max_frames=max_frames if run_emotion else 0, engine=engine,
+        downscale=downscale, frame_skip=frame_skip, prefilter=prefilter
+    )
+    if "Error" not in new_scene_cuts_df.columns:
+        cache.put("scene_cuts", video_path, scene_params, scene_cuts_to_arrays(new_scene_cuts_df))
+    if run_emotion:
+        emotion_summary = new_emotion_summary
+        if "error" not in emotion_summary:
+            cache.put("emotion", video_path, emotion_params, {"summary": _json_array(emotion_summary)})
+
+    return new_scene_cuts_df, emotion_summary
+
+
+def cached_segment_emotion_scores(video_path, segments, frames_per_segment=10, engine=None, cache=None, prefilter=True):
+    """emotion_detector.get_segment_emotion_scores through the cache."""
+    from emotion_detector import get_segment_emotion_scores
+
+    cache = cache or get_cache()
+    params = {
+        "frames_per_segment": frames_per_segment,
+        "segments": [[int(i), round(float(s), 3), round(float(e), 3)] for i, s, e in segments],
+        "prefilter": bool(prefilter),
+        "version": ALGORITHM_VERSIONS["segment_emotion"],
+    }
+    arrays = cache.get("segment_emotion", video_path, params)
+    if arrays is not None:
+        # JSON object keys are strings; restore the segment ids
+        return {int(k): v for k, v in _from_json_array(arrays["scores"]).items()}
+
+    scores = get_segment_emotion_scores(video_path, segments, frames_per_segment=frames_per_segment, engine=engine,
+                                        prefilter=prefilter)
+    if scores:
+        cache.put("segment_emotion", video_path, params, {"scores": _json_array({str(k): v for k, v in scores.items()})})
+    return scores
@@ -1,206 +1,331 @@
-import streamlit as st
-import pandas as pd
-import os
-import time
-import tempfile
-from scorer import calculate_highlight_scores
-# ----------------------------------------------
-# Import the functions you wrote in Steps 4 and 5
-# ----------------------------------------------
-from scene_detector import get_scene_cuts
-from audio_analyzer import get_audio_peaks
-from emotion_detector import get_emotional_score
-#from highlight_generator import generate_highlight_video # <<< UNCOMMENTED THIS LINE
-
-# --- Streamlit Page Configuration ---
-st.set_page_config(layout="wide", page_title="AI Highlights Generator Demo")
-st.title("🎬 Smart Video Highlights Generator: Final System Demo")
-st.markdown("### Goal: Demonstrate Multimodal Fusion and Final Video Generation")
-st.markdown("---")
-
-# --- 1. Video Input and Preprocessing ---
-st.header("1. Input & Preprocessing")
-st.info("Upload a video file to begin analysis. The system will save it temporarily for processing.")
-
-uploaded_file = st.file_uploader("Choose a video file...", type=["mp4", "mov", "avi"])
-
-if uploaded_file is not None:
-    # --- Step 1A: Save the uploaded file temporarily ---
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{uploaded_file.name}") as temp_file:
-        temp_file.write(uploaded_file.getbuffer())
-        temp_file_path = temp_file.name
-
-    col1, col2 = st.columns([1, 2])
-
-    with col1:
-        st.subheader("Uploaded Video Preview")
-        st.video(temp_file_path)
-        st.success(f"File saved to temporary path: `{os.path.basename(temp_file_path)}`")
-
-    with col2:
-        st.subheader("Video Metadata")
-        st.metric(label="File Name", value=uploaded_file.name)
-        st.metric(label="File Size", value=f"{uploaded_file.size / 1024 / 1024:.2f} MB")
-        st.markdown("---")
-
-    st.markdown("---")
-
-    # --- Step 1B: Analysis Button to trigger the feature extraction ---
-    if st.button("▶️ Run Full Multimodal Analysis & Generate Highlight Reel", type="primary"):
-        st.toast('Analysis started...', icon='⏳')
-        progress_bar = st.progress(0)
-
-        # --- 2. EXECUTE VISUAL ANALYSIS (Scene Cuts) ---
-        st.header("2. Visual Feature Extraction: Scene Change Detection")
-        st.markdown("The `scene_detector.py` module uses **PySceneDetect/OpenCV** to find abrupt visual cuts.")
-        progress_bar.progress(20)
-        time.sleep(0.5)
-
-        # Call the function from your scene_detector.py file
-        scene_cuts_df = get_scene_cuts(temp_file_path)
-
-        st.success("✅ **Result: Detected Content Segments (Visual Cuts)**")
-        st.dataframe(scene_cuts_df, use_container_width=True)
-
-        st.markdown("---")
-
-        # --- 3. EXECUTE AUDITORY ANALYSIS (Audio Peaks) ---
-        st.header("3. Auditory Feature Extraction: Audio Peak Analysis")
-        st.markdown("The `audio_analyzer.py` module uses **Librosa/Pydub** to find loud, high-energy moments.")
-        progress_bar.progress(40)
-        time.sleep(0.5)
-
-        # Call the function from your audio_analyzer.py file
-        peak_data, energy_df = get_audio_peaks(temp_file_path)
-
-        col_chart, col_data = st.columns(2)
-
-        with col_chart:
-            st.subheader("Audio Energy Over Time")
-            st.line_chart(energy_df, x='Time (s)', y='Energy')
-            st.caption("Spikes indicate high volume or audio events.")
-
-        with col_data:
-            st.subheader("Detected Peak Timecodes")
-            # Convert list of dicts (peak_data) to a DataFrame for clean display
-            peak_df = pd.DataFrame(peak_data)[['time', 'score']]
-            st.success("✅ **Result: Timecodes of High-Energy Audio Peaks**")
-            st.dataframe(peak_df, use_container_width=True)
-
-        # --- 4. EXECUTE PHASE 3 ANALYSIS (Emotional Score) ---
-        st.header("4. Phase 3: Emotional Feature Extraction")
-        st.markdown("The system analyzes faces in the video for high-value emotions (Happy, Surprise) to create an overall **Excitement Score**.")
-        progress_bar.progress(60)
-        time.sleep(0.5)
-
-        # ----------------------------------------------------------------------
-        # CALL THE EMOTION DETECTOR FUNCTION
-        # ----------------------------------------------------------------------
-
-        emotion_summary = get_emotional_score(temp_file_path)
-
-        if "error" not in emotion_summary:
-            st.success("✅ **Result: Emotional Summary**")
-
-            col_e1, col_e2, col_e3 = st.columns(3)
-            with col_e1:
-                st.metric(label="Frames Analyzed", value=emotion_summary['analyzed_frames'])
-            with col_e2:
-                st.metric(label="High-Emotion Frames", value=emotion_summary['excitement_score'])
-            with col_e3:
-                st.metric(label="Detection Success Rate", value=emotion_summary['detection_success_rate'])
-
-            st.dataframe(pd.DataFrame([emotion_summary]).drop(columns=['analyzed_frames', 'detection_success_rate', 'excitement_score']), use_container_width=True)
-
-        else:
-            st.error(f"Emotion Detection Error: {emotion_summary['error']}")
-
-        st.markdown("---")
-
-        # --- 5. EXECUTE PHASE 2 SCORING (Feature Fusion) ---
-        st.header("5. Final Phase: Highlight Scoring System (Multimodal Fusion)") # <<< UNCOMMENTED HEADER
-        st.markdown("The system now fuses the Visual Segments, Auditory Peaks, and Emotional Data to calculate a final **Highlight Score** for each clip.")
-        progress_bar.progress(80)
-        time.sleep(0.5)
-
-        # ----------------------------------------------------------------------
-        # CALL THE SCORER FUNCTION AND DISPLAY RESULTS
-        # ----------------------------------------------------------------------
-
-        # Ensure we have data from all modules before scoring
-        if 'scene_cuts_df' in locals() and 'peak_data' in locals():
-            try:
-                # 1. Call the scorer function
-                scored_results_df = calculate_highlight_scores(scene_cuts_df, peak_data, emotion_summary)
-
-                # 2. Display the final ranked list
-                st.subheader("Final Ranked Highlights")
-                st.success("🏆 The segments are ranked below by their calculated **Highlight Score**.")
-                st.dataframe(scored_results_df, use_container_width=True)
-
-                # 3. Extract the Top Highlight
-                top_segment = scored_results_df.iloc[0]
-
-                st.markdown("---")
-                st.subheader("🥇 Top Highlight Identified:")
-                st.info(f"The most engaging segment starts at **{top_segment['Start_Time']}** and ends at **{top_segment['End_Time']}** (Score: {top_segment['Highlight_Score']}).")
-
-            except Exception as e:
-                st.error(f"Error during Highlight Scoring: {e}")
-        else:
-            st.warning("Cannot run Phase 2 scoring: Visual or Auditory data is missing.")
-
-
-        st.markdown("---") # <<< INSERTION POINT FOR SECTION 6
-
-        # --- 6. PHASE 4: FINAL HIGHLIGHT GENERATION ---
-        # st.header("6. Final Phase: Highlight Video Generation")
-        # st.markdown("The system selects the highest-scoring segments and stitches them into the final highlight reel.")
-        # progress_bar.progress(95)
-        
-        # # Ensure we have the scored data from the previous step
-        # if 'scored_results_df' in locals():
-        #     try:
-        #         output_video_path = generate_highlight_video(temp_file_path, scored_results_df, top_n=3)
-
-        #         if output_video_path:
-        #             st.success(f"🎥 Highlight Video Generated: {os.path.basename(output_video_path)}")
-
-        #             # Create a download button for the user
-        #             with open(output_video_path, "rb") as file:
-        #                 st.download_button(
-        #                     label="Download Highlight Reel",
-        #                     data=file,
-        #                     file_name=os.path.basename(output_video_path),
-        #                     mime="video/mp4"
-        #                 )
-        #         else:
-        #             st.error("Could not generate highlight video. Check terminal for MoviePy errors.")
-        #     except Exception as e:
-        #         st.error(f"Critical error in video generation (Phase 4): {e}")
-
-
-        # # --- Update the final conclusion and cleanup ---
-        # progress_bar.progress(100)
-        # st.balloons()
-        # st.toast('Full Project Execution Complete!', icon='✅')
-        # st.markdown("---") 
-
-
-        # --- Conclusion for Phase 1 ---
-        st.header("Phase 1 Completion: Foundation Ready")
-        st.info(
-            """
-            This step successfully extracted the two key modalities required for scoring:
-            1. **Time-coded Visual Segments** (Scene Cuts)
-            2. **Time-coded Auditory Events** (Loudness Peaks)
-
-            This data is now ready to be processed by the **Highlight Scoring System (Phase 2)**.
-            """
-        )
-
-    # --- Cleanup after processing (good practice) ---
-    if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-        # We can't delete it right away if Streamlit is still viewing it, but for clean
-        # file management, you would typically delete temp files on exit.
-        pass
\ No newline at end of file
+import streamlit as st
+import pandas as pd
+import os
+from scorer import calculate_highlight_scores, calculate_two_phase_scores
+from audio_analyzer import peaks_to_frame
+# ----------------------------------------------
+# Import the functions you wrote in Steps 4 and 5
+# ----------------------------------------------
+from emotion_engine import get_emotion_engine
+from pipeline import Stage, StageError, run_pipeline
+import telemetry
+from workspace import Workspace, WorkspaceQuotaError
+from warmup import warm_up_in_background
+from analysis_cache import get_cache, cached_video_frames, cached_audio_peaks, cached_segment_emotion_scores, cached_energy_pyramid
+#from highlight_generator import generate_highlight_video # <<< UNCOMMENTED THIS LINE
+
+# --- Streamlit Page Configuration ---
+st.set_page_config(layout="wide", page_title="AI Highlights Generator Demo")
+
+# Upper bound on how long one analysis stage may run
+STAGE_TIMEOUT_S = 3600
+
+@st.cache_resource
+def load_emotion_engine():
+    # Cached across reruns so the worker processes keep their models loaded
+    return get_emotion_engine()
+
+@st.cache_resource
+def load_analysis_cache():
+    # One cache object per server process so hit/miss counters accumulate
+    return get_cache()
+
+@st.cache_resource
+def start_warmup():
+    # Heavy libraries and the emotion models load once per server process on a
+    # background thread, so the page is interactive while they load
+    return warm_up_in_background(engine=load_emotion_engine())
+
+def get_session_workspace():
+    # One workspace per browser session; it is deleted when the session's state
+    # is garbage-collected, at server exit, or by the stale sweep after a crash
+    if "workspace" not in st.session_state:
+        st.session_state["workspace"] = Workspace()
+    st.session_state["workspace"].touch()
+    return st.session_state["workspace"]
+
+@st.fragment
+def show_energy_chart():
+    # A fragment: moving the slider reruns only this function, so the results of
+    # the Run click stay on the page. The pyramid is kept in the session state
+    energy_pyramid = st.session_state["energy_pyramid"]
+    duration = max(float(energy_pyramid.duration), 0.1)
+    view_start, view_end = st.slider("Time range (s)", 0.0, duration, (0.0, duration), key="energy_range")
+    energy_view = energy_pyramid.query(view_start, view_end)
+    st.line_chart(energy_view, x='Time (s)', y=['Energy_Max', 'Energy', 'Energy_Min'])
+
+warmup_future = start_warmup()
+
+st.sidebar.subheader("Model Warm-up")
+if warmup_future.done():
+    st.sidebar.json(warmup_future.result())
+else:
+    st.sidebar.caption("⏳ Loading analysis libraries and emotion models in the background...")
+
+st.title("🎬 Smart Video Highlights Generator: Final System Demo")
+st.markdown("### Goal: Demonstrate Multimodal Fusion and Final Video Generation")
+st.markdown("---")
+
+# --- 1. Video Input and Preprocessing ---
+st.header("1. Input & Preprocessing")
+st.info("Upload a video file to begin analysis. The system will save it temporarily for processing.")
+
+uploaded_file = st.file_uploader("Choose a video file...", type=["mp4", "mov", "avi"])
+workspace = get_session_workspace()
+
+if uploaded_file is not None:
+    # --- Step 1A: Stream the upload into this session's workspace ---
+    # Stored under its content hash, so reruns and identical re-uploads are not written again
+    try:
+        temp_file_path = workspace.ingest(uploaded_file, uploaded_file.name)
+    except WorkspaceQuotaError as e:
+        st.error(f"Upload rejected: {e}")
+        st.stop()
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        st.subheader("Uploaded Video Preview")
+        st.video(temp_file_path)
+        st.success(f"File saved to temporary path: `{os.path.basename(temp_file_path)}`")
+
+    with col2:
+        st.subheader("Video Metadata")
+        st.metric(label="File Name", value=uploaded_file.name)
+        st.metric(label="File Size", value=f"{uploaded_file.size / 1024 / 1024:.2f} MB")
+        st.markdown("---")
+
+    st.markdown("---")
+
+    # Candidate mode runs DeepFace only inside the top-ranked segments
+    candidate_mode = st.checkbox("Candidate-driven emotion analysis (faster on long videos)", value=True)
+
+    # Scene detection speed/accuracy trade-off (scene_detector.evaluate_fast_scene_detection measures it)
+    col_mode, col_downscale, col_skip = st.columns(3)
+    with col_mode:
+        scene_mode = st.selectbox("Scene detection", ["shared", "fast"],
+                                  format_func=lambda mode: {"shared": "Shared decode (exact)", "fast": "Fast (parallel chunks)"}[mode])
+    with col_downscale:
+        scene_downscale = st.number_input("Downscale factor (0 = automatic)", min_value=0, max_value=16, value=0) or None
+    with col_skip:
+        scene_frame_skip = st.number_input("Frames skipped between comparisons", min_value=0, max_value=10, value=0)
+
+    # --- Step 1B: Analysis Button to trigger the feature extraction ---
+    if st.button("▶️ Run Full Multimodal Analysis & Generate Highlight Reel", type="primary"):
+        st.toast('Analysis started...', icon='⏳')
+        progress_bar = st.progress(0)
+        stage_status = st.empty()
+
+        # --- Run the independent analysis stages concurrently ---
+        # Results are cached by video content, so reruns and re-uploads skip the analysis
+        emotion_engine = load_emotion_engine()
+        analysis_cache = load_analysis_cache()
+
+        # Every analyzer, the scorer and the renderer report into this run's span tree
+        run_span = telemetry.Span("analysis_run", video=uploaded_file.name)
+
+        def on_stage_progress(event):
+            # Analysis stages fill the bar up to 80%, in proportion to the work they report
+            progress_bar.progress(int(event['progress'] * 80))
+            stage_status.caption(
+                f"Stage `{event['stage']}` {event['status']} "
+                f"({event['stage_progress']:.0%}, {event['elapsed']:.1f}s)"
+            )
+
+        try:
+            with telemetry.activated(run_span):
+                stage_results, stage_timings = run_pipeline([
+                    # Shared mode decodes the video once for scene detection and emotion
+                    # sampling; fast mode runs the chunk-parallel scene detector instead
+                    Stage("frames", lambda: cached_video_frames(
+                        temp_file_path, max_frames=0 if candidate_mode else 50, engine=emotion_engine, cache=analysis_cache,
+                        scene_mode=scene_mode, downscale=scene_downscale, frame_skip=int(scene_frame_skip)
+                    ), timeout=STAGE_TIMEOUT_S),
+                    Stage("audio", lambda: cached_audio_peaks(temp_file_path, cache=analysis_cache, features=True), timeout=STAGE_TIMEOUT_S),
+                ], progress_callback=on_stage_progress)
+        except StageError as e:
+            run_span.finish(error=e)
+            st.error(f"Analysis failed in stage '{e.stage}': {e.cause}")
+            st.stop()
+
+        scene_cuts_df, emotion_summary = stage_results["frames"]
+        peak_data, audio_envelope = stage_results["audio"]
+        # Min/max/mean levels of the envelope, so the chart never ships the per-hop series
+        st.session_state["energy_pyramid"] = cached_energy_pyramid(temp_file_path, audio_envelope, cache=analysis_cache, features=True)
+        stage_status.caption(" | ".join(f"{name}: {seconds:.1f}s" for name, seconds in stage_timings.items()))
+
+        # --- 2. VISUAL ANALYSIS RESULTS (Scene Cuts) ---
+        st.header("2. Visual Feature Extraction: Scene Change Detection")
+        st.markdown("The `scene_detector.py` module uses **PySceneDetect/OpenCV** to find abrupt visual cuts.")
+
+        st.success("✅ **Result: Detected Content Segments (Visual Cuts)**")
+        st.dataframe(scene_cuts_df, use_container_width=True)
+
+        st.markdown("---")
+
+        # --- 3. AUDITORY ANALYSIS RESULTS (Audio Peaks) ---
+        st.header("3. Auditory Feature Extraction: Audio Peak Analysis")
+        st.markdown("The `audio_analyzer.py` module streams the soundtrack through **FFmpeg** to find loud, high-energy moments.")
+
+        col_chart, col_data = st.columns(2)
+
+        with col_chart:
+            st.subheader("Audio Energy Over Time")
+            show_energy_chart()
+            st.caption("Spikes indicate high volume or audio events. Narrow the time range to zoom in; "
+                       "the band shows the loudest and quietest moment behind each point.")
+
+        with col_data:
+            st.subheader("Detected Peak Timecodes")
+            # Format the peak arrays as timecodes for display
+            peak_df = peaks_to_frame(peak_data)[['time', 'score']]
+            st.success("✅ **Result: Timecodes of High-Energy Audio Peaks**")
+            st.dataframe(peak_df, use_container_width=True)
+
+        # --- 4. EXECUTE PHASE 3 ANALYSIS (Emotional Score) ---
+        st.header("4. Phase 3: Emotional Feature Extraction")
+        st.markdown("The system analyzes faces in the video for high-value emotions (Happy, Surprise) to create an overall **Excitement Score**.")
+
+        # ----------------------------------------------------------------------
+        # EMOTION SUMMARY (computed during the shared decode in section 2)
+        # ----------------------------------------------------------------------
+
+        if emotion_summary is None:
+            st.info("Candidate-driven mode: emotions are analyzed only inside the top-ranked segments during scoring (section 5).")
+
+        elif "error" not in emotion_summary:
+            st.success("✅ **Result: Emotional Summary**")
+
+            col_e1, col_e2, col_e3 = st.columns(3)
+            with col_e1:
+                st.metric(label="Frames Analyzed", value=emotion_summary['analyzed_frames'])
+            with col_e2:
+                st.metric(label="High-Emotion Frames", value=emotion_summary['excitement_score'])
+            with col_e3:
+                st.metric(label="Detection Success Rate", value=emotion_summary['detection_success_rate'])
+
+            if 'inference_fps' in emotion_summary:
+                st.caption(f"Emotion inference throughput: {emotion_summary['inference_fps']} frames/s")
+            if emotion_summary.get('face_check') is False:
+                st.caption("No face detector in this OpenCV build: faceless frames were not skipped before DeepFace.")
+
+            st.dataframe(pd.DataFrame([emotion_summary]).drop(columns=['analyzed_frames', 'detection_success_rate', 'excitement_score', 'inference_fps'], errors='ignore'), use_container_width=True)
+
+        else:
+            st.error(f"Emotion Detection Error: {emotion_summary['error']}")
+
+        st.markdown("---")
+
+        # --- 5. EXECUTE PHASE 2 SCORING (Feature Fusion) ---
+        st.header("5. Final Phase: Highlight Scoring System (Multimodal Fusion)") # <<< UNCOMMENTED HEADER
+        st.markdown("The system now fuses the Visual Segments, Auditory Peaks, and Emotional Data to calculate a final **Highlight Score** for each clip.")
+        progress_bar.progress(80)
+
+        # ----------------------------------------------------------------------
+        # CALL THE SCORER FUNCTION AND DISPLAY RESULTS
+        # ----------------------------------------------------------------------
+
+        # Ensure we have data from all modules before scoring
+        if 'scene_cuts_df' in locals() and 'peak_data' in locals():
+            try:
+                # 1. Call the scorer function
+                with telemetry.activated(run_span):
+                    if candidate_mode:
+                        scored_results_df = calculate_two_phase_scores(
+                            scene_cuts_df, peak_data,
+                            lambda candidates: cached_segment_emotion_scores(
+                                temp_file_path, candidates, engine=emotion_engine, cache=analysis_cache
+                            ),
+                            audio_features=audio_envelope
+                        )
+                    else:
+                        scored_results_df = calculate_highlight_scores(
+                            scene_cuts_df, peak_data, emotion_summary, audio_features=audio_envelope
+                        )
+
+                # 2. Display the final ranked list
+                st.subheader("Final Ranked Highlights")
+                st.success("🏆 The segments are ranked below by their calculated **Highlight Score**.")
+                st.dataframe(scored_results_df, use_container_width=True)
+
+                # 3. Extract the Top Highlight
+                top_segment = scored_results_df.iloc[0]
+
+                st.markdown("---")
+                st.subheader("🥇 Top Highlight Identified:")
+                st.info(f"The most engaging segment starts at **{top_segment['Start_Time']}** and ends at **{top_segment['End_Time']}** (Score: {top_segment['Highlight_Score']}).")
+
+            except Exception as e:
+                st.error(f"Error during Highlight Scoring: {e}")
+        else:
+            st.warning("Cannot run Phase 2 scoring: Visual or Auditory data is missing.")
+
+
+        # Cache hit/miss statistics for this server process
+        st.sidebar.subheader("Analysis Cache")
+        st.sidebar.json(analysis_cache.stats())
+
+        # Where the time went: one row per span, counters summed over sub-spans
+        run_span.finish()
+        with st.expander("⏱️ Run Telemetry (wall/CPU time, memory growth, frames and samples processed)"):
+            st.dataframe(pd.DataFrame(telemetry.summarize(run_span)).fillna(""), use_container_width=True)
+            if telemetry.TELEMETRY_PATH:
+                st.caption(f"Spans are also written as JSON lines to `{telemetry.TELEMETRY_PATH}`.")
+
+        st.markdown("---") # <<< INSERTION POINT FOR SECTION 6
+
+        # --- 6. PHASE 4: FINAL HIGHLIGHT GENERATION ---
+        # st.header("6. Final Phase: Highlight Video Generation")
+        # st.markdown("The system selects the highest-scoring segments and stitches them into the final highlight reel.")
+        # progress_bar.progress(95)
+        
+        # # Ensure we have the scored data from the previous step
+        # if 'scored_results_df' in locals():
+        #     try:
+        #         workspace.check_quota()
+        #         output_video_path = generate_highlight_video(temp_file_path, scored_results_df, top_n=3, output_dir=workspace.outputs_dir)
+
+        #         if output_video_path:
+        #             st.success(f"🎥 Highlight Video Generated: {os.path.basename(output_video_path)}")
+
+        #             # Create a download button for the user
+        #             with open(output_video_path, "rb") as file:
+        #                 st.download_button(
+        #                     label="Download Highlight Reel",
+        #                     data=file,
+        #                     file_name=os.path.basename(output_video_path),
+        #                     mime="video/mp4"
+        #                 )
+        #         else:
+        #             st.error("Could not generate highlight video. Check terminal for MoviePy errors.")
+        #     except Exception as e:
+        #         st.error(f"Critical error in video generation (Phase 4): {e}")
+
+
+        # # --- Update the final conclusion and cleanup ---
+        # progress_bar.progress(100)
+        # st.balloons()
+        # st.toast('Full Project Execution Complete!', icon='✅')
+        # st.markdown("---") 
+
+
+        # --- Conclusion for Phase 1 ---
+        st.header("Phase 1 Completion: Foundation Ready")
+        st.info(
+            """
+            This step successfully extracted the two key modalities required for scoring:
+            1. **Time-coded Visual Segments** (Scene Cuts)
+            2. **Time-coded Auditory Events** (Loudness Peaks)
+
+            This data is now ready to be processed by the **Highlight Scoring System (Phase 2)**.
+            """
+        )
+
+    # --- Cleanup after processing (good practice) ---
+    # The current upload stays for the video preview; earlier uploads of this session are deleted
+    workspace.release_inputs(keep=[temp_file_path])
+
+else:
+    # Upload cleared: nothing in the workspace is needed any more
+    workspace.release_inputs()
+    workspace.clear_outputs()
\ No newline at end of file
@@ -1,84 +1,332 @@
-import librosa
-import numpy as np
-import pandas as pd
-from pydub import AudioSegment
-import tempfile
-import os
-import shutil
-
-def get_audio_peaks(video_path):
-    """Analyzes audio for overall energy and finds peak moments."""
-    
-    # --- NOTE: This function requires FFmpeg to be available on your system PATH ---
-    
-    # 1. Define a temporary path for audio extraction
-    temp_dir = tempfile.gettempdir()
-    temp_audio_path = os.path.join(temp_dir, 'temp_audio_extract.wav')
-
-    # 2. Extract audio from video using pydub
-    try:
-        # Pydub reads the audio track of the video file
-        audio = AudioSegment.from_file(video_path)
-        
-        # Save audio to a temporary WAV file for Librosa (safer processing)
-        audio.export(temp_audio_path, format="wav")
-        
-        # 3. Load audio with Librosa
-        y, sr = librosa.load(temp_audio_path, sr=None)
-        
-    except Exception as e:
-        # Handle cases where FFmpeg or pydub fails due to missing PATH
-        import numpy as np
-        
-        # Log the failure but continue with dummy data
-        print(f"Audio Analysis Failed due to FFmpeg PATH issue: {e}")
-        print("Using dummy numerical data to allow Phase 2 Scoring to run.")
-        
-        # --- GENERATE DUMMY NUMERICAL DATA ---
-        # Generate 30 seconds of dummy data
-        time_points = np.arange(0, 30.0, 0.5) 
-        # Create a randomized energy level array
-        energy_df = pd.DataFrame({'Time (s)': time_points, 'Energy': np.random.rand(len(time_points)) * 0.1 + 0.5})
-        # Create a few dummy peaks with numerical scores and times
-        peak_data = [
-            {'time': '00:00:08', 'score': 90}, 
-            {'time': '00:00:15', 'score': 95},
-            {'time': '00:00:22', 'score': 88}
-        ]
-        
-        # Return the safe data
-        return peak_data, energy_df
-
-    # 4. Calculate root-mean-square (RMS) energy per frame (a measure of loudness)
-    frame_length = 2048 
-    hop_length = 512
-    rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
-    
-    # 5. Identify significant peaks (loud moments)
-    # Normalize RMS and find moments above a high threshold (e.g., 80% of peak energy)
-    rms_normalized = rms / np.max(rms)
-    peak_indices = np.where(rms_normalized > 0.8)[0]
-    
-    # 6. Convert indices to timecodes
-    peak_data = []
-    for idx in peak_indices:
-        time_seconds = librosa.frames_to_time(idx, sr=sr, hop_length=hop_length)
-        
-        # Only report if this is a distinctly new peak (more than 1 second from the last one)
-        if not peak_data or (time_seconds - peak_data[-1]['time_seconds']) > 1.0: 
-            peak_data.append({
-                "time": librosa.display.time_to_string(time_seconds, unit='s', hours=False),
-                "score": int(rms_normalized[idx] * 100),
-                "time_seconds": time_seconds
-            })
-
-    # 7. Prepare data for Streamlit energy chart
-    time_points = librosa.frames_to_time(np.arange(len(rms)), sr=sr, hop_length=hop_length)
-    energy_df = pd.DataFrame({'Time (s)': time_points, 'Energy': rms})
-    
-    # 8. Clean up temp file
-    if os.path.exists(temp_audio_path):
-        os.remove(temp_audio_path)
-
-    # Return the clean peak data and the energy dataframe
-    return peak_data, energy_df
\ No newline at end of file
+import numpy as np
+import pandas as pd
+import subprocess
+import json
+from typing import NamedTuple
+import telemetry
+
+def probe_audio_stream(video_path):
+    """
+    Returns (sample_rate, channels, duration_seconds) of the first audio stream
+    using ffprobe. The duration is None when the container does not report one.
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=sample_rate,channels:format=duration", "-of", "json", video_path],
+        capture_output=True, text=True, check=True
+    )
+    info = json.loads(result.stdout)
+    streams = info.get("streams", [])
+    if not streams:
+        raise ValueError(f"No audio stream found in {video_path}")
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    return int(streams[0]["sample_rate"]), int(streams[0]["channels"]), duration
+
+def stream_audio_chunks(video_path, sr, channels, chunk_seconds=10.0, input_options=(), processes=None):
+    """
+    Decodes the audio track through an ffmpeg pipe and yields mono float32
+    chunks of about `chunk_seconds`, so the full soundtrack is never in memory.
+    Channels are averaged, which matches librosa.load(mono=True).
+
+    `input_options` are extra ffmpeg input options placed before -i (live
+    mode uses them to keep reading a file that is still being written). The
+    ffmpeg process is appended to `processes` when given, so another thread
+    can stop it.
+    """
+    process = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", *input_options, "-i", video_path, "-vn",
+         "-f", "f32le", "-acodec", "pcm_f32le", "pipe:1"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if processes is not None:
+        processes.append(process)
+
+    # Read whole sample frames (all channels) per chunk
+    bytes_per_frame = 4 * channels
+    chunk_bytes = int(sr * chunk_seconds) * bytes_per_frame
+    leftover = b""
+
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % bytes_per_frame
+            leftover = data[usable:]
+
+            samples = np.frombuffer(data[:usable], dtype=np.float32)
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+            yield samples
+
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {process.stderr.read().decode(errors='ignore').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+class RmsAccumulator:
+    """
+    Computes librosa.feature.rms(y, frame_length, hop_length) (center=True,
+    zero padding) incrementally. The last frame_length - hop_length samples of
+    each chunk are carried into the next, so frames spanning chunk boundaries
+    are identical to a single pass over the whole signal.
+    """
+
+    def __init__(self, frame_length=2048, hop_length=512):
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        # Centre padding: librosa pads frame_length // 2 zeros on each side
+        self.buffer = np.zeros(frame_length // 2, dtype=np.float32)
+        self.samples_seen = 0
+
+    def update(self, samples):
+        """Adds a chunk of samples and returns the RMS values of all newly complete frames."""
+        self.samples_seen += len(samples)
+        return self._process(samples)
+
+    def finish(self):
+        """Flushes the trailing centre padding and returns the final frames."""
+        # librosa yields exactly 1 + n_samples // hop_length frames in total
+        return self._process(np.zeros(self.frame_length // 2, dtype=np.float32))
+
+    def _process(self, samples):
+        buffer = np.concatenate([self.buffer, samples])
+        if len(buffer) < self.frame_length:
+            self.buffer = buffer
+            return self._frame_features(np.zeros((0, self.frame_length), dtype=np.float32))
+
+        n_frames = 1 + (len(buffer) - self.frame_length) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.frame_length)[::self.hop_length][:n_frames]
+
+        # Keep the tail the next frame still needs
+        self.buffer = buffer[n_frames * self.hop_length:]
+        return self._frame_features(frames)
+
+    def _frame_features(self, frames):
+        """Output for a (n_frames, frame_length) view of the signal; subclasses add more features."""
+        return np.sqrt(np.mean(frames ** 2, axis=1)).astype(np.float32)
+
+class AudioPeaks(NamedTuple):
+    """
+    Audio peaks as parallel numpy arrays, sorted by time. This is what the
+    analysis stages pass around; timecode strings only exist for display
+    (see peaks_to_frame). Use len(peaks.time_seconds) for the peak count.
+
+    Fields:
+        time_seconds (np.ndarray): Peak (or region start) times in seconds, float64.
+        score (np.ndarray): Normalized energy x 100, int64.
+        end_seconds (np.ndarray): Region ends for mode="sustained"; equal to
+            time_seconds for single-frame peaks.
+    """
+    time_seconds: np.ndarray
+    score: np.ndarray
+    end_seconds: np.ndarray
+
+class AudioEnvelope(NamedTuple):
+    """
+    Per-hop audio features on get_audio_peaks' frame grid, as one float32
+    matrix. Tables for charts are built from it only at display time (see
+    energy_pyramid.EnergyPyramid.query).
+
+    Fields:
+        hop_seconds (float): Time between frames; frame i is at i * hop_seconds.
+        features (np.ndarray): float32 (n_frames, len(names)) matrix.
+        names (tuple): Column names: ("rms",), or audio_features.FEATURE_NAMES
+            with get_audio_peaks(features=True).
+        dummy (bool): True for the placeholder returned when decoding failed.
+    """
+    hop_seconds: float
+    features: np.ndarray
+    names: tuple
+    dummy: bool = False
+
+    @property
+    def time_seconds(self):
+        return np.arange(len(self.features)) * self.hop_seconds
+
+    def column(self, name):
+        """The values of one named feature."""
+        return self.features[:, self.names.index(name)]
+
+def make_audio_peaks(time_seconds, score, end_seconds=None):
+    """Builds AudioPeaks with the canonical dtypes; end_seconds defaults to the start times."""
+    time_seconds = np.asarray(time_seconds, dtype=np.float64)
+    end_seconds = time_seconds if end_seconds is None else np.asarray(end_seconds, dtype=np.float64)
+    return AudioPeaks(time_seconds, np.asarray(score, dtype=np.int64), end_seconds)
+
+def seconds_to_timecode(time_seconds):
+    """Formats seconds as HH:MM:SS.mmm, the format scorer.time_to_seconds parses."""
+    hours, remainder = divmod(float(time_seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+def peaks_to_frame(peaks):
+    """
+    Display table of AudioPeaks for the UI and CSV exports, with the times
+    formatted as HH:MM:SS.mmm timecodes.
+
+    Returns:
+        pd.DataFrame: Columns time, score, time_seconds and end_seconds.
+    """
+    return pd.DataFrame({
+        'time': [seconds_to_timecode(t) for t in peaks.time_seconds],
+        'score': peaks.score,
+        'time_seconds': peaks.time_seconds,
+        'end_seconds': peaks.end_seconds
+    })
+
+def extract_peaks(rms_normalized, sr, hop_length, threshold=0.8, min_separation=1.0):
+    """
+    Finds loud moments in a normalized RMS envelope with array operations only.
+
+    A peak is a local maximum above `threshold`; peaks closer than
+    `min_separation` seconds are thinned out, keeping the loudest.
+
+    Returns:
+        tuple: (time_seconds, score) numpy arrays, sorted by time.
+    """
+    from scipy.signal import find_peaks
+
+    # Pad with -inf so maxima on the very first or last frame are found too
+    padded = np.concatenate([[-np.inf], rms_normalized, [-np.inf]])
+    distance = max(1, int(np.ceil(min_separation * sr / hop_length)))
+    indices, _ = find_peaks(padded, distance=distance)
+    indices = indices - 1
+    indices = indices[rms_normalized[indices] > threshold]
+
+    time_seconds = indices * hop_length / sr
+    score = (rms_normalized[indices] * 100).astype(int)
+    return time_seconds, score
+
+def find_sustained_regions(rms_normalized, sr, hop_length, threshold=0.6, min_duration=1.0, max_gap=0.25):
+    """
+    Finds sustained high-energy stretches (crowd roars, long cheers) rather than single frames.
+
+    Runs above `threshold` separated by less than `max_gap` seconds are merged,
+    and regions shorter than `min_duration` seconds are dropped.
+
+    Returns:
+        pd.DataFrame: One row per region with start, end (seconds) and mean_energy.
+    """
+    above = np.concatenate([[False], rms_normalized > threshold, [False]])
+    edges = np.diff(above.astype(np.int8))
+    starts = np.where(edges == 1)[0]
+    ends = np.where(edges == -1)[0]  # exclusive frame index
+
+    # Merge runs separated by short dips
+    if len(starts) > 1:
+        gap_frames = max_gap * sr / hop_length
+        keep = (starts[1:] - ends[:-1]) > gap_frames
+        starts = starts[np.concatenate([[True], keep])]
+        ends = ends[np.concatenate([keep, [True]])]
+
+    # Mean energy per region from a cumulative sum
+    cumulative = np.concatenate([[0.0], np.cumsum(rms_normalized, dtype=np.float64)])
+    mean_energy = (cumulative[ends] - cumulative[starts]) / np.maximum(ends - starts, 1)
+
+    regions = pd.DataFrame({
+        'start': starts * hop_length / sr,
+        'end': ends * hop_length / sr,
+        'mean_energy': mean_energy
+    })
+    return regions[(regions['end'] - regions['start']) >= min_duration].reset_index(drop=True)
+
+@telemetry.traced("audio_peaks")
+def get_audio_peaks(video_path, frame_length=2048, hop_length=512, chunk_seconds=10.0, mode="peaks", strict=False, features=False):
+    """
+    Analyzes audio for overall energy and finds peak moments.
+
+    Returns (peaks, envelope): an AudioPeaks and an AudioEnvelope, both numeric arrays.
+
+    With mode="sustained" each peak is a sustained high-energy region instead
+    of a single loud frame; its end_seconds is the region's end and its score
+    is the region's mean normalized energy.
+
+    With strict=True a decoding failure is raised instead of being replaced by
+    dummy data (used by the batch runner so failures end up in its manifest).
+
+    With features=True the same decode also yields onset strength, spectral
+    flux and spectral centroid (see audio_features.py), added to the envelope
+    as extra columns for scorer.calculate_highlight_scores(audio_features=...).
+    """
+
+    # --- NOTE: This function requires FFmpeg to be available on your system PATH ---
+
+    # 1. Stream the audio track straight from the container (no temp WAV file,
+    #    so concurrent sessions cannot clobber each other)
+    try:
+        sr, channels, duration = probe_audio_stream(video_path)
+        total_samples = int(duration * sr) if duration else None
+
+        # 2. Calculate root-mean-square (RMS) energy per frame (a measure of loudness)
+        #    chunk by chunk, so memory stays bounded for any input length
+        if features:
+            from audio_features import AudioFeatureAccumulator
+            accumulator = AudioFeatureAccumulator(sr, frame_length=frame_length, hop_length=hop_length)
+        else:
+            accumulator = RmsAccumulator(frame_length=frame_length, hop_length=hop_length)
+        output_chunks = []
+        for samples in stream_audio_chunks(video_path, sr, channels, chunk_seconds):
+            output_chunks.append(accumulator.update(samples))
+            telemetry.progress(accumulator.samples_seen, total_samples)
+        output_chunks.append(accumulator.finish())
+        output = np.concatenate(output_chunks)
+        rms = output[:, 0] if features else output
+        telemetry.add("audio_samples", accumulator.samples_seen)
+
+        if accumulator.samples_seen == 0:
+            raise ValueError("Audio stream decoded to zero samples")
+
+    except Exception as e:
+        if strict:
+            raise
+
+        # Handle cases where FFmpeg is missing from PATH or decoding fails
+
+        # Log the failure but continue with dummy data
+        print(f"Audio Analysis Failed due to FFmpeg PATH issue: {e}")
+        print("Using dummy numerical data to allow Phase 2 Scoring to run.")
+
+        # --- GENERATE DUMMY NUMERICAL DATA ---
+        # Generate 30 seconds of dummy data: a randomized energy level every 0.5 s
+        dummy_energy = (np.random.rand(60, 1) * 0.1 + 0.5).astype(np.float32)
+        # Flag the placeholder so callers (e.g. the analysis cache) can tell it apart
+        envelope = AudioEnvelope(0.5, dummy_energy, ("rms",), dummy=True)
+        # Create a few dummy peaks with numerical scores and times
+        peak_data = make_audio_peaks([8.0, 15.0, 22.0], [90, 95, 88])
+
+        # Return the safe data
+        return peak_data, envelope
+
+    # 3. Identify significant peaks (loud moments)
+    # Normalize RMS and find moments above a high threshold (e.g., 80% of peak energy)
+    max_rms = np.max(rms)
+    rms_normalized = rms / max_rms if max_rms > 0 else rms
+
+    # 4. Build the peak arrays (timecode strings are left to the UI)
+    if mode == "sustained":
+        regions = find_sustained_regions(rms_normalized, sr, hop_length)
+        peak_data = make_audio_peaks(
+            regions['start'].to_numpy(), (regions['mean_energy'].to_numpy() * 100).astype(int), regions['end'].to_numpy()
+        )
+    else:
+        # Only distinct peaks (more than 1 second apart) are reported
+        peak_times, peak_scores = extract_peaks(rms_normalized, sr, hop_length, threshold=0.8, min_separation=1.0)
+        peak_data = make_audio_peaks(peak_times, peak_scores)
+
+    # 5. Keep the per-hop envelope as one matrix (charts are built from it later)
+    if features:
+        from audio_features import FEATURE_NAMES
+        envelope = AudioEnvelope(hop_length / sr, output, FEATURE_NAMES)
+    else:
+        envelope = AudioEnvelope(hop_length / sr, output[:, None], ("rms",))
+
+    # Return the clean peak data and the energy envelope
+    return peak_data, envelope
\ No newline at end of file
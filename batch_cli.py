@@ -0,0 +1,255 @@
+"""
+Headless batch runner: analyzes directories or globs of videos in a process
+pool, writes scored segments and highlight reels to an output tree, and keeps
+a manifest so an interrupted run resumes where it stopped.
+
+    python batch_cli.py /data/uploads "/data/archive/**/*.mp4" -o /data/highlights -w 8
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def discover_videos(inputs):
+    """Expands directories (recursively) and glob patterns into a sorted list of video files."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if name.lower().endswith(VIDEO_EXTENSIONS):
+                        found.add(os.path.abspath(os.path.join(root, name)))
+        else:
+            for path in glob.glob(item, recursive=True):
+                if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS):
+                    found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+def load_manifest(manifest_path):
+    """Returns the latest manifest record per video fingerprint."""
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            records[record["fingerprint"]] = record
+    return records
+
+
+def append_manifest(manifest_path, record):
+    with open(manifest_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def output_dir_for(video_path, fingerprint, output_root):
+    """One directory per video, named after the file and its fingerprint so names never clash."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(output_root, f"{stem}-{fingerprint[:12]}")
+
+
+def process_video(video_path, output_dir, top_n=3, max_frames=50, candidate_mode=True, render_mode="copy", render=True, target_duration=None,
+                  scene_mode="shared", scene_downscale=None, scene_frame_skip=0, scene_workers=None):
+    """
+    Runs the full analysis/scoring/rendering chain for one video.
+
+    Unlike the Streamlit app this never substitutes dummy data: audio decoding
+    failures raise, so they are recorded against the video.
+
+    scene_mode picks the scene detection speed/accuracy trade-off (see
+    analysis_cache.SCENE_MODES); scene_downscale and scene_frame_skip trade
+    accuracy for speed in either mode, scene_workers sizes the "fast" pool.
+    scene_detector.evaluate_fast_scene_detection measures the trade-off.
+
+    Returns:
+        dict: Output file paths plus per-stage timings and warnings.
+    """
+    from analysis_cache import cached_video_frames, cached_audio_peaks, cached_segment_emotion_scores
+    from audio_analyzer import peaks_to_frame
+    from scorer import calculate_highlight_scores, calculate_two_phase_scores
+    from highlight_generator import select_top_segments, render_highlight_video
+    from selection import select_segments_for_duration
+
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+    warnings = []
+
+    # 1. Visual analysis (scene cuts + optional global emotion sample, one decode)
+    start = time.perf_counter()
+    scene_cuts_df, emotion_summary = cached_video_frames(
+        video_path, max_frames=0 if candidate_mode else max_frames, scene_mode=scene_mode,
+        downscale=scene_downscale, frame_skip=scene_frame_skip, workers=scene_workers
+    )
+    timings["frames"] = round(time.perf_counter() - start, 2)
+    if "Error" in scene_cuts_df.columns:
+        raise RuntimeError(scene_cuts_df["Error"].iloc[0])
+    if emotion_summary is not None and "error" in emotion_summary:
+        raise RuntimeError(f"Emotion detection failed: {emotion_summary['error']}")
+
+    # 2. Audio analysis (strict: no dummy fallback)
+    start = time.perf_counter()
+    peak_data, audio_envelope = cached_audio_peaks(video_path, strict=True, features=True)
+    timings["audio"] = round(time.perf_counter() - start, 2)
+
+    if scene_cuts_df.empty:
+        warnings.append("no scene cuts detected")
+
+    # 3. Scoring
+    start = time.perf_counter()
+    if candidate_mode:
+        scored_df = calculate_two_phase_scores(
+            scene_cuts_df, peak_data,
+            lambda candidates: cached_segment_emotion_scores(video_path, candidates),
+            audio_features=audio_envelope
+        )
+    else:
+        # --max-frames 0 skips the global emotion sample (emotion_summary is None)
+        scored_df = calculate_highlight_scores(scene_cuts_df, peak_data, emotion_summary or {}, audio_features=audio_envelope)
+    timings["scoring"] = round(time.perf_counter() - start, 2)
+
+    outputs = {"segments": os.path.join(output_dir, "segments.csv"), "peaks": os.path.join(output_dir, "peaks.csv")}
+    scored_df.to_csv(outputs["segments"])
+    peaks_to_frame(peak_data).to_csv(outputs["peaks"], index=False)
+    if emotion_summary is not None:
+        outputs["emotion"] = os.path.join(output_dir, "emotion.json")
+        with open(outputs["emotion"], "w") as f:
+            json.dump(emotion_summary, f, indent=2)
+
+    # 4. Rendering
+    if render:
+        if target_duration:
+            segments = select_segments_for_duration(scored_df, target_duration)
+        else:
+            segments = select_top_segments(scored_df, top_n)
+        if not segments:
+            warnings.append("no segments with a score > 0; reel not rendered")
+        else:
+            stats = render_highlight_video(video_path, segments, os.path.join(output_dir, "highlight_reel.mp4"), mode=render_mode)
+            timings["render"] = stats["seconds"]
+            if stats["path"] is None:
+                raise RuntimeError("highlight rendering failed")
+            if stats["mode"] != render_mode:
+                warnings.append(f"render fell back from {render_mode} to {stats['mode']}")
+            outputs["reel"] = stats["path"]
+
+    return {"outputs": outputs, "timings": timings, "warnings": warnings}
+
+
+def _run_job(video_path, fingerprint, output_root, options):
+    """Pool task: never raises, so every outcome reaches the manifest."""
+    import telemetry
+
+    start = time.perf_counter()
+    record = {"video": video_path, "fingerprint": fingerprint}
+    job_span = telemetry.Span("batch_job", video=video_path)
+    try:
+        with telemetry.activated(job_span):
+            result = process_video(video_path, output_dir_for(video_path, fingerprint, output_root), **options)
+        record.update(status="done", **result)
+        job_span.finish()
+    except Exception as e:
+        record.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+        job_span.finish(error=e)
+    # Per-analyzer wall/CPU time, peak memory and frame/sample counts
+    record["telemetry"] = telemetry.summarize(job_span)
+    record["seconds"] = round(time.perf_counter() - start, 2)
+    record["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch highlight generation for directories of videos.")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", required=True, help="Root of the output tree (holds the manifest)")
+    parser.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--target-duration", type=float, help="Reel length budget in seconds (replaces --top-n)")
+    parser.add_argument("--max-frames", type=int, default=50, help="Global emotion sample size (only with --no-candidate-mode)")
+    parser.add_argument("--no-candidate-mode", action="store_true", help="Use one global emotion score instead of per-candidate emotion")
+    parser.add_argument("--render-mode", choices=["reencode", "copy", "parallel"], default="copy")
+    parser.add_argument("--scene-mode", choices=["shared", "fast"], default="shared",
+                        help="shared: one decode with the emotion sample; fast: chunk-parallel detection")
+    parser.add_argument("--scene-downscale", type=int, help="Scene detection frame reduction factor (default: automatic)")
+    parser.add_argument("--scene-frame-skip", type=int, default=0, help="Frames skipped between compared frames")
+    parser.add_argument("--scene-workers", type=int, help="Processes for --scene-mode fast (default: CPU count)")
+    parser.add_argument("--no-render", action="store_true", help="Only write scored segments")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run videos that failed in a previous run")
+    args = parser.parse_args(argv)
+
+    from analysis_cache import file_fingerprint
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+
+    # 1. Work out what still needs doing
+    videos = discover_videos(args.inputs)
+    jobs = []
+    skipped = 0
+    for video_path in videos:
+        fingerprint = file_fingerprint(video_path)
+        record = previous.get(fingerprint)
+        if record and (record["status"] == "done" or (record["status"] == "failed" and not args.retry_failed)):
+            skipped += 1
+            continue
+        jobs.append((video_path, fingerprint))
+
+    print(f"{len(videos)} videos found, {skipped} already in manifest, {len(jobs)} to process.")
+
+    options = {
+        "top_n": args.top_n,
+        "target_duration": args.target_duration,
+        "max_frames": args.max_frames,
+        "candidate_mode": not args.no_candidate_mode,
+        "render_mode": args.render_mode,
+        "render": not args.no_render,
+        "scene_mode": args.scene_mode,
+        "scene_downscale": args.scene_downscale,
+        "scene_frame_skip": args.scene_frame_skip,
+        "scene_workers": args.scene_workers,
+    }
+
+    # 2. Process in a pool; only this process writes the manifest. Workers load
+    #    the heavy libraries and models before their first job
+    from warmup import init_worker
+
+    components = ["scene", "audio", "emotion"] + (["render"] if options["render"] else [])
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(components,)) as pool:
+        futures = {pool.submit(_run_job, video_path, fingerprint, args.output_dir, options): video_path
+                   for video_path, fingerprint in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            append_manifest(manifest_path, record)
+            if record["status"] == "failed":
+                failures += 1
+                print(f"[{done}/{len(jobs)}] FAILED {record['video']}: {record['error']}")
+            else:
+                note = f" ({'; '.join(record['warnings'])})" if record["warnings"] else ""
+                print(f"[{done}/{len(jobs)}] done {record['video']} in {record['seconds']}s{note}")
+
+    print(f"Finished: {len(jobs) - failures} succeeded, {failures} failed. Manifest: {manifest_path}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for the interval-join scorer.
+
+Times count_peaks_in_segments (the numeric core of calculate_highlight_scores)
+from small inputs up to 1e5 segments x 1e6 peaks, and compares it with the old
+nested-loop scan on sizes where that still finishes.
+
+Run from the repository root:
+    python -m benchmarks.bench_scorer
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scorer import count_peaks_in_segments
+
+SIZES = [(200, 5_000), (1_000, 10_000), (10_000, 100_000), (100_000, 1_000_000)]
+NESTED_LOOP_LIMIT = 2_000_000  # segments * peaks above this are not run with the nested loop
+
+
+def make_inputs(n_segments, n_peaks, seed=0):
+    """Random contiguous segments over one hour and uniformly spread peaks."""
+    rng = np.random.default_rng(seed)
+    duration = 3600.0
+    bounds = np.sort(rng.uniform(0, duration, n_segments + 1))
+    peak_times = rng.uniform(0, duration, n_peaks)
+    peak_weights = rng.uniform(0.8, 1.0, n_peaks)
+    return bounds[:-1], bounds[1:], peak_times, peak_weights
+
+
+def nested_loop_counts(starts, ends, peak_times):
+    """The original O(segments x peaks) scan, kept for comparison."""
+    counts = []
+    for segment_start, segment_end in zip(starts, ends):
+        peak_count = 0
+        for peak_time in peak_times:
+            if segment_start <= peak_time < segment_end:
+                peak_count += 1
+        counts.append(peak_count)
+    return np.asarray(counts)
+
+
+def time_call(fn, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(f"{'segments':>10} {'peaks':>10} {'join (ms)':>10} {'weighted (ms)':>14} {'nested loop (ms)':>17}")
+    for n_segments, n_peaks in SIZES:
+        starts, ends, peak_times, peak_weights = make_inputs(n_segments, n_peaks)
+
+        join_s, (counts, _) = time_call(count_peaks_in_segments, starts, ends, peak_times)
+        weighted_s, _ = time_call(count_peaks_in_segments, starts, ends, peak_times, peak_weights)
+
+        nested = "skipped"
+        if n_segments * n_peaks <= NESTED_LOOP_LIMIT:
+            nested_s, nested_counts = time_call(nested_loop_counts, starts, ends, peak_times, repeat=1)
+            assert np.array_equal(counts, nested_counts), "interval join disagrees with nested loop"
+            nested = f"{nested_s * 1000:.1f}"
+
+        print(f"{n_segments:>10} {n_peaks:>10} {join_s * 1000:>10.1f} {weighted_s * 1000:>14.1f} {nested:>17}")
+
+    # Correctness spot check on a size the nested loop can handle
+    starts, ends, peak_times, _ = make_inputs(500, 2_000, seed=1)
+    assert np.array_equal(count_peaks_in_segments(starts, ends, peak_times)[0], nested_loop_counts(starts, ends, peak_times))
+
+
+if __name__ == '__main__':
+    main()
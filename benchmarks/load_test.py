@@ -0,0 +1,169 @@
+"""
+Load test for job_service.py: concurrent clients submit videos, back off on
+429, poll until their job finishes, and the run reports throughput and
+latency percentiles.
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8765 --clients 8 --jobs 32 video1.mp4 video2.mp4
+    python -m benchmarks.load_test --start-server --workers 2 --max-queue 4 --clients 8 --jobs 16
+
+Without videos, synthetic ones are generated (benchmarks/synthetic.py,
+needs ffmpeg). Jobs cycle through the videos with a different top_n per
+round, so each submission is a distinct job; pass --duplicates to resubmit
+identical jobs and measure the stored-result path instead.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POLL_INTERVAL_S = 0.5
+
+
+def _request(method, url, payload=None):
+    """Returns (status, json body, headers); HTTP error statuses are returned, not raised."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read()), response.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}"), e.headers
+
+
+def run_client_job(base_url, video_path, options, timeout_s):
+    """
+    One submission from POST to a finished job.
+
+    Returns:
+        dict: status, latency_s (submit to done), rejections (429s) and whether
+        the service answered from its result store ("stored").
+    """
+    start = time.perf_counter()
+    rejections = 0
+    while True:
+        status, body, headers = _request("POST", f"{base_url}/jobs", {"video_path": video_path, **options})
+        if status != 429:
+            break
+        rejections += 1
+        time.sleep(float(headers.get("Retry-After", 1)))
+        if time.perf_counter() - start > timeout_s:
+            return {"status": "timeout", "latency_s": time.perf_counter() - start, "rejections": rejections, "stored": False}
+
+    if status not in (200, 202):
+        return {"status": "error", "error": body.get("error"), "latency_s": time.perf_counter() - start,
+                "rejections": rejections, "stored": False}
+
+    stored = status == 200
+    job_url = f"{base_url}/jobs/{body['job_id']}"
+    while body.get("status") not in ("done", "failed"):
+        if time.perf_counter() - start > timeout_s:
+            return {"status": "timeout", "latency_s": time.perf_counter() - start, "rejections": rejections, "stored": stored}
+        time.sleep(POLL_INTERVAL_S)
+        _, body, _ = _request("GET", job_url)
+
+    return {"status": body["status"], "error": body.get("error"), "latency_s": time.perf_counter() - start,
+            "rejections": rejections, "stored": stored}
+
+
+def run_load_test(base_url, videos, jobs=16, clients=4, duplicates=False, timeout_s=3600, options=None):
+    """
+    Submits `jobs` jobs from `clients` concurrent clients.
+
+    Returns:
+        dict: Throughput (jobs per second), p50/p95/max latency, and counts
+        of done, failed, timed-out, stored and rejected submissions.
+    """
+    options = options or {}
+    submissions = []
+    for i in range(jobs):
+        job_options = dict(options)
+        if not duplicates:
+            # top_n is part of the job identity, so every round is a new job
+            job_options["top_n"] = options.get("top_n", 3) + i // len(videos)
+        submissions.append((videos[i % len(videos)], job_options))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda job: run_client_job(base_url, job[0], job[1], timeout_s), submissions))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([r["latency_s"] for r in results if r["status"] in ("done", "failed")])
+    statuses = [r["status"] for r in results]
+    report = {
+        "jobs": jobs,
+        "clients": clients,
+        "seconds": round(elapsed, 2),
+        "throughput_jobs_per_s": round(len(latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 2) if len(latencies) else None,
+        "latency_max_s": round(float(latencies.max()), 2) if len(latencies) else None,
+        "done": statuses.count("done"),
+        "failed": statuses.count("failed"),
+        "errors": statuses.count("error"),
+        "timeouts": statuses.count("timeout"),
+        "stored_results": sum(r["stored"] for r in results),
+        "rejections_429": sum(r["rejections"] for r in results),
+    }
+    errors = sorted({r["error"] for r in results if r.get("error")})
+    if errors:
+        report["error_samples"] = errors[:3]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-submission load test for job_service.py.")
+    parser.add_argument("videos", nargs="*", help="Videos to submit (default: generate synthetic media)")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duplicates", action="store_true", help="Resubmit identical jobs (measures the result store)")
+    parser.add_argument("--no-render", action="store_true", help="Skip reel rendering in the submitted jobs")
+    parser.add_argument("--timeout", type=float, default=3600, help="Per-job timeout in seconds")
+    parser.add_argument("--start-server", action="store_true", help="Run an in-process service on a free port")
+    parser.add_argument("--workers", type=int, default=2, help="Service workers (with --start-server)")
+    parser.add_argument("--max-queue", type=int, default=4, help="Service queue bound (with --start-server)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="vhg_load_test_")
+    videos = [os.path.abspath(v) for v in args.videos]
+    if not videos:
+        from benchmarks.synthetic import make_synthetic_video
+        for seed in range(2):
+            path = os.path.join(work_dir, f"synthetic_{seed}.mp4")
+            make_synthetic_video(path, duration_s=15.0, width=320, height=180, seed=seed)
+            videos.append(path)
+
+    base_url = args.url
+    server = service = None
+    if args.start_server:
+        from job_service import JobService, make_server
+        service = JobService(os.path.join(work_dir, "service"), workers=args.workers, max_queue=args.max_queue)
+        server = make_server(service, port=0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        options = {"render": False} if args.no_render else {}
+        report = run_load_test(base_url, videos, jobs=args.jobs, clients=args.clients,
+                               duplicates=args.duplicates, timeout_s=args.timeout, options=options)
+    finally:
+        if server is not None:
+            server.shutdown()
+            service.shutdown()
+
+    print(json.dumps(report, indent=2))
+    return 0 if report["done"] == args.jobs else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
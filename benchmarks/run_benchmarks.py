@@ -0,0 +1,275 @@
+"""
+Benchmark suite for every pipeline stage on synthetic media.
+
+For each size it builds a deterministic synthetic video (known cuts and audio
+bursts), then times get_scene_cuts, get_audio_peaks, get_emotional_score,
+calculate_highlight_scores and generate_highlight_video. Each stage runs in a
+fresh process so its peak RSS is its own; the stage's modules are imported
+and warmed up (warmup.preload) before the timer starts, so the numbers are
+steady-state throughput rather than import cost. Results are checked against
+the ground truth, and throughput (media seconds per wall second) is compared
+with benchmarks/baselines.json.
+
+Two memory figures are reported per stage: "rss MB" is the process's peak
+RSS, which includes the preloaded libraries and models, and "+rss MB" is how
+far the stage itself pushed that peak beyond the warmed-up process.
+
+    python -m benchmarks.run_benchmarks                      # check against baselines
+    python -m benchmarks.run_benchmarks --sizes small medium
+    python -m benchmarks.run_benchmarks --update-baselines   # record this machine's numbers
+
+Exits non-zero when a stage fails, misses its accuracy target or drops more
+than --tolerance below its baseline throughput. Stages without a recorded
+baseline are reported as NO BASELINE and only their accuracy is checked;
+pass --strict to fail them too (record baselines with --update-baselines on
+the reference machine first).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import importlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_synthetic_video
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+SIZES = {
+    "small": {"duration_s": 15.0, "width": 320, "height": 180},
+    "medium": {"duration_s": 60.0, "width": 640, "height": 360},
+    "large": {"duration_s": 300.0, "width": 1280, "height": 720},
+}
+
+STAGES = ["scene_cuts", "audio_peaks", "emotion", "scoring", "render"]
+
+# Minimum accuracy each stage must reach on synthetic media
+MIN_CUT_F1 = 0.95
+MIN_BURST_RECALL = 0.9
+PEAK_MATCH_TOLERANCE_S = 0.6
+
+
+# --- Stage runners (executed in a fresh process each) ---
+
+def _stage_scene_cuts(video_path, inputs):
+    from scene_detector import get_scene_cuts
+    return get_scene_cuts(video_path)
+
+
+def _stage_audio_peaks(video_path, inputs):
+    from audio_analyzer import get_audio_peaks
+    return get_audio_peaks(video_path)
+
+
+def _stage_emotion(video_path, inputs):
+    from emotion_detector import get_emotional_score
+    return get_emotional_score(video_path)
+
+
+def _stage_scoring(video_path, inputs):
+    from scorer import calculate_highlight_scores
+    return calculate_highlight_scores(inputs["scene_cuts"], inputs["audio_peaks"][0], inputs["emotion"])
+
+
+def _stage_render(video_path, inputs):
+    from highlight_generator import generate_highlight_video
+    return generate_highlight_video(video_path, inputs["scoring"], top_n=3, output_filename="benchmark_reel.mp4")
+
+
+STAGE_RUNNERS = {
+    "scene_cuts": _stage_scene_cuts,
+    "audio_peaks": _stage_audio_peaks,
+    "emotion": _stage_emotion,
+    "scoring": _stage_scoring,
+    "render": _stage_render,
+}
+
+# Project module and warmup.py components each stage needs loaded before it is timed
+STAGE_MODULES = {
+    "scene_cuts": ("scene_detector", ("scene",)),
+    "audio_peaks": ("audio_analyzer", ("audio",)),
+    "emotion": ("emotion_detector", ("emotion",)),
+    "scoring": ("scorer", ()),
+    "render": ("highlight_generator", ("render",)),
+}
+
+
+def _measure(stage, video_path, inputs):
+    """
+    Runs one stage and returns (result, wall seconds, CPU seconds, peak RSS in MB,
+    peak RSS growth in MB). Imports and model loading happen before the timer,
+    so they are not counted in the times or the growth; the peak RSS includes them.
+    """
+    from warmup import preload
+
+    module, components = STAGE_MODULES[stage]
+    importlib.import_module(module)
+    for component, timing in preload(components).items():
+        if isinstance(timing, str):
+            print(f"Warm-up of {component} failed: {timing}")
+
+    # ru_maxrss is a high-water mark, in kilobytes on Linux
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    result = STAGE_RUNNERS[stage](video_path, inputs)
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    return result, wall, cpu, usage_after.ru_maxrss / 1024, (usage_after.ru_maxrss - usage_before.ru_maxrss) / 1024
+
+
+def run_stage_isolated(stage, video_path, inputs):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, stage, video_path, inputs).result()
+
+
+# --- Accuracy checks against the ground truth ---
+
+def _truth_scene_df(truth):
+    from audio_analyzer import seconds_to_timecode
+    import pandas as pd
+    bounds = [0.0] + truth["cut_times"] + [truth["duration_s"]]
+    return pd.DataFrame({
+        "Segment": range(1, len(bounds)),
+        "Start_Time": [seconds_to_timecode(t) for t in bounds[:-1]],
+        "End_Time": [seconds_to_timecode(t) for t in bounds[1:]],
+    }).set_index("Segment")
+
+
+def check_accuracy(stage, result, truth):
+    """Returns (passed, details dict) for a stage result."""
+    if stage == "scene_cuts":
+        from scene_detector import compare_scene_cuts
+        if "Error" in result.columns:
+            return False, {"error": str(result["Error"].iloc[0])}
+        details = compare_scene_cuts(_truth_scene_df(truth), result, tolerance_s=2.0 / truth["fps"])
+        return details["f1"] >= MIN_CUT_F1, details
+
+    if stage == "audio_peaks":
+        peak_data, envelope = result
+        if envelope.dummy:
+            return False, {"error": "audio decoding failed and dummy data was returned"}
+        peak_times = peak_data.time_seconds
+        found = sum(any(abs(p - b) <= PEAK_MATCH_TOLERANCE_S for p in peak_times) for b in truth["burst_times"])
+        spurious = sum(not any(abs(p - b) <= PEAK_MATCH_TOLERANCE_S for b in truth["burst_times"]) for p in peak_times)
+        recall = found / len(truth["burst_times"]) if truth["burst_times"] else 1.0
+        return recall >= MIN_BURST_RECALL, {"burst_recall": round(recall, 3), "spurious_peaks": spurious}
+
+    if stage == "emotion":
+        if "error" in result:
+            return False, {"error": result["error"]}
+        return result["analyzed_frames"] > 0, {"analyzed_frames": result["analyzed_frames"]}
+
+    if stage == "scoring":
+        top = result.iloc[0]
+        return bool(top["Audio_Peaks"] >= 1), {"top_segment_peaks": int(top["Audio_Peaks"])}
+
+    if stage == "render":
+        import cv2
+        if not result or not os.path.exists(result):
+            return False, {"error": "no reel written"}
+        cap = cv2.VideoCapture(result)
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        return frames > 0, {"reel_frames": frames}
+
+    return True, {}
+
+
+# --- Driver ---
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage benchmarks on synthetic media.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed fractional throughput drop vs baseline")
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--strict", action="store_true",
+                        help="Fail stages that have no recorded baseline instead of skipping the throughput check")
+    parser.add_argument("--keep-media", action="store_true", help="Do not delete the generated videos")
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines()
+    if not baselines and not args.update_baselines:
+        gate = "every stage fails the check" if args.strict else "throughput is not gated"
+        print(f"WARNING: no baselines at {BASELINES_PATH}; {gate} until they are recorded with --update-baselines.")
+    new_baselines = dict(baselines)
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix="vhg_bench_")
+
+    print(f"{'stage':<12} {'size':<7} {'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'+rss MB':>8} {'x realtime':>11} {'baseline':>9}  accuracy")
+    try:
+        for size in args.sizes:
+            video_path = os.path.join(work_dir, f"synthetic_{size}.mp4")
+            truth = make_synthetic_video(video_path, seed=1, **SIZES[size])
+
+            inputs = {}
+            for stage in STAGES:
+                if stage not in args.stages and not any(s in args.stages for s in STAGES[STAGES.index(stage) + 1:]):
+                    continue
+                key = f"{stage}@{size}"
+                try:
+                    result, wall, cpu, rss, rss_growth = run_stage_isolated(stage, video_path, inputs)
+                except Exception as e:
+                    failures.append(f"{key}: raised {e!r}")
+                    print(f"{stage:<12} {size:<7} FAILED: {e!r}")
+                    break
+                inputs[stage] = result
+                if stage not in args.stages:
+                    continue
+
+                passed, details = check_accuracy(stage, result, truth)
+                throughput = truth["duration_s"] / wall if wall > 0 else float("inf")
+                baseline = baselines.get(key, {}).get("throughput")
+
+                status = "ok" if passed else "ACCURACY FAIL"
+                if not passed:
+                    failures.append(f"{key}: accuracy {details}")
+                if baseline and throughput < baseline * (1 - args.tolerance):
+                    status = "REGRESSION"
+                    failures.append(f"{key}: throughput {throughput:.1f}x < baseline {baseline:.1f}x - {args.tolerance:.0%}")
+                elif not baseline and not args.update_baselines:
+                    status = "NO BASELINE" if passed else status
+                    if args.strict:
+                        failures.append(f"{key}: no baseline throughput recorded")
+
+                baseline_text = f"{baseline:.1f}" if baseline else "-"
+                print(f"{stage:<12} {size:<7} {wall:>8.2f} {cpu:>8.2f} {rss:>8.0f} {rss_growth:>8.0f} {throughput:>11.1f} {baseline_text:>9}  {status} {details}")
+                new_baselines[key] = {"throughput": round(throughput, 2), "peak_rss_mb": round(rss, 1),
+                                      "rss_growth_mb": round(rss_growth, 1)}
+    finally:
+        if not args.keep_media:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            print(f"Synthetic media kept in {work_dir}")
+
+    if args.update_baselines:
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(new_baselines, f, indent=2, sort_keys=True)
+        print(f"Baselines written to {BASELINES_PATH}")
+
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
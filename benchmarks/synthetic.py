@@ -0,0 +1,111 @@
+"""
+Deterministic synthetic test media with known ground truth.
+
+Each video is a sequence of solid-colour scenes (with a small moving square so
+frames inside a scene are not identical) separated by hard cuts at known
+times, and an audio track of quiet noise with loud bursts at known times.
+Requires ffmpeg on PATH to mux the audio into an H.264/AAC mp4.
+"""
+import os
+import wave
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import cv2
+
+AUDIO_SAMPLE_RATE = 44100
+
+
+def plan_events(duration_s, scene_length_s=4.0, burst_every_s=7.0, seed=0):
+    """Ground-truth cut and burst times spread over the duration, with jitter from `seed`."""
+    rng = np.random.default_rng(seed)
+    cut_times = []
+    t = scene_length_s
+    while t < duration_s - 1.0:
+        cut_times.append(round(t + rng.uniform(-0.5, 0.5), 2))
+        t += scene_length_s
+    burst_times = []
+    t = burst_every_s / 2
+    while t < duration_s - 1.0:
+        burst_times.append(round(t + rng.uniform(-0.5, 0.5), 2))
+        t += burst_every_s
+    return cut_times, burst_times
+
+
+def _write_frames(path, duration_s, width, height, fps, cut_times, seed):
+    cut_frames = [int(round(t * fps)) for t in cut_times]
+    n_scenes = len(cut_frames) + 1
+    # Step hue, saturation and brightness together so consecutive scenes differ
+    # strongly in HSV, which is what ContentDetector measures
+    hsv = np.array([[[(seed * 31 + i * 67) % 180, 255 if i % 2 else 90, 230 if i % 2 else 70]
+                     for i in range(n_scenes)]], dtype=np.uint8)
+    colours = [tuple(int(c) for c in bgr) for bgr in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0]]
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    square = max(4, min(width, height) // 10)
+    scene = 0
+    for frame_index in range(int(duration_s * fps)):
+        while scene < len(cut_frames) and frame_index >= cut_frames[scene]:
+            scene += 1
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = colours[scene]
+        x = (frame_index * 3) % max(1, width - square)
+        y = height // 2 - square // 2
+        frame[y:y + square, x:x + square] = 255 - np.array(colours[scene], dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+
+
+def _write_audio(path, duration_s, burst_times, burst_length_s, seed):
+    rng = np.random.default_rng(seed + 1)
+    n_samples = int(duration_s * AUDIO_SAMPLE_RATE)
+    samples = rng.normal(0, 0.01, n_samples)
+    for t in burst_times:
+        start = int(t * AUDIO_SAMPLE_RATE)
+        end = min(n_samples, start + int(burst_length_s * AUDIO_SAMPLE_RATE))
+        samples[start:end] = rng.normal(0, 0.5, end - start)
+    pcm = (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(AUDIO_SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+
+
+def make_synthetic_video(output_path, duration_s=30.0, width=640, height=360, fps=25, burst_length_s=0.5, seed=0):
+    """
+    Writes a synthetic H.264/AAC video and returns its ground truth.
+
+    Returns:
+        dict: duration_s, fps, width, height, cut_times and burst_times (seconds).
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is required on PATH to build synthetic benchmark media")
+
+    cut_times, burst_times = plan_events(duration_s, seed=seed)
+    work_dir = tempfile.mkdtemp(prefix="synthetic_media_")
+    try:
+        raw_video = os.path.join(work_dir, "video.mp4")
+        raw_audio = os.path.join(work_dir, "audio.wav")
+        _write_frames(raw_video, duration_s, width, height, fps, cut_times, seed)
+        _write_audio(raw_audio, duration_s, burst_times, burst_length_s, seed)
+
+        # Mux and re-encode to the codecs real uploads use
+        subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", raw_video, "-i", raw_audio,
+             "-c:v", "libx264", "-pix_fmt", "yuv420p", "-g", str(fps * 2),
+             "-c:a", "aac", "-shortest", output_path],
+            check=True, capture_output=True
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "duration_s": duration_s,
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "cut_times": cut_times,
+        "burst_times": burst_times,
+    }
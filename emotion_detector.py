@@ -1,94 +1,389 @@
-from deepface import DeepFace
-import cv2
-import pandas as pd
-import time
-import os
-
-def get_emotional_score(video_path, max_frames=50):
-    """
-    Analyzes a video for dominant facial emotions and assigns a score.
-    
-    Args:
-        video_path (str): Path to the video file.
-        max_frames (int): Maximum number of frames to process for speed.
-        
-    Returns:
-        dict: Summary of detected emotions and a total score.
-    """
-    
-    # 1. Open the video file
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        return {"error": "Failed to open video file."}
-
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    
-    # 2. Determine frame sampling (only analyze a manageable number of frames)
-    # This prevents the process from taking hours for long videos.
-    if frame_count > max_frames:
-        frame_interval = frame_count // max_frames
-    else:
-        frame_interval = 1
-        
-    # 3. Define high-value emotions
-    high_value_emotions = ['happy', 'surprise', 'fear']
-    emotion_tally = {e: 0 for e in high_value_emotions}
-    total_analyzed_frames = 0
-    
-    # 4. Process frames
-    for i in range(frame_count):
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Skip frames based on the interval
-        if i % frame_interval != 0:
-            continue
-            
-        total_analyzed_frames += 1
-
-        try:
-            # DeepFace analysis (action='emotion')
-            result = DeepFace.analyze(
-                frame, 
-                actions=['emotion'], 
-                enforce_detection=False # Detects faces even if partially visible
-            )
-            
-            # Check if a face was detected and emotions analyzed
-            if result and isinstance(result, list) and 'dominant_emotion' in result[0]:
-                dominant_emotion = result[0]['dominant_emotion']
-                if dominant_emotion in high_value_emotions:
-                    emotion_tally[dominant_emotion] += 1
-                    
-        except Exception:
-            # Silently skip frames where no face is detected or detection fails
-            pass
-
-    cap.release()
-
-    # 5. Calculate Final Score
-    # The score is the sum of high-value emotion tallies
-    emotional_score = sum(emotion_tally.values())
-    
-    # 6. Prepare the final summary
-    emotion_summary = {
-        "analyzed_frames": total_analyzed_frames,
-        "happy": emotion_tally['happy'],
-        "surprise": emotion_tally['surprise'],
-        "excitement_score": emotional_score,
-        "detection_success_rate": f"{total_analyzed_frames / (frame_count / frame_interval) * 100:.1f}%"
-    }
-
-    return emotion_summary
-
-if __name__ == '__main__':
-    # This block is for testing and requires a video path
-    # You will need to uncomment this and provide a path to test independently:
-    # dummy_video_path = "path/to/your/video.mp4"
-    # if os.path.exists(dummy_video_path):
-    #     print(get_emotional_score(dummy_video_path))
-    # else:
-    #     print("Test video not found.")
+import cv2
+import pandas as pd
+import time
+import os
+from frame_source import FrameConsumer, estimate_duration_ms
+from emotion_engine import resize_to_width
+from frame_prefilter import FramePrefilter
+import telemetry
+
+# High-value emotions that count towards the excitement score
+HIGH_VALUE_EMOTIONS = ['happy', 'surprise', 'fear']
+
+def analyze_frame_emotion(frame):
+    """Returns the dominant emotion DeepFace finds in a frame, or None if detection fails."""
+    # Imported on first use: TensorFlow takes seconds to load (see warmup.py)
+    from deepface import DeepFace
+
+    try:
+        # DeepFace analysis (action='emotion')
+        result = DeepFace.analyze(
+            frame, 
+            actions=['emotion'], 
+            enforce_detection=False # Detects faces even if partially visible
+        )
+        
+        # Check if a face was detected and emotions analyzed
+        if result and isinstance(result, list) and 'dominant_emotion' in result[0]:
+            return result[0]['dominant_emotion']
+            
+    except Exception:
+        # Silently skip frames where no face is detected or detection fails
+        pass
+    return None
+
+def build_emotion_summary(emotion_tally, total_analyzed_frames, planned_frames):
+    """Builds the summary dict returned by get_emotional_score."""
+
+    # The score is the sum of high-value emotion tallies
+    emotional_score = sum(emotion_tally.values())
+
+    # Guard against files whose frame count is missing or zero
+    success_rate = total_analyzed_frames / planned_frames * 100 if planned_frames > 0 else 0.0
+
+    return {
+        "analyzed_frames": total_analyzed_frames,
+        "happy": emotion_tally['happy'],
+        "surprise": emotion_tally['surprise'],
+        "excitement_score": emotional_score,
+        "detection_success_rate": f"{success_rate:.1f}%"
+    }
+
+def get_frame_interval(frame_count, max_frames):
+    """Determines frame sampling so only a manageable number of frames is analyzed."""
+    if max_frames > 0 and frame_count > max_frames:
+        return frame_count // max_frames
+    return 1
+
+# Above this many frames between samples, seeking (which jumps to the nearest
+# keyframe and decodes forward) is cheaper than grab()-ing through every frame.
+SEEK_STRIDE_THRESHOLD = 120
+
+# Sampling period used when neither the frame count nor the duration is known
+FALLBACK_SAMPLE_INTERVAL_S = 1.0
+
+# Frame rate assumed when the container does not report one
+FALLBACK_FPS = 25.0
+
+def sample_frames(cap, max_frames=50):
+    """
+    Yields (frame_index, frame) for the frames get_emotional_score analyzes,
+    decoding only what is needed to reach them.
+
+    With a known frame count the samples are the same frames the old
+    read-every-frame loop kept (every `frame_interval`-th frame). Large strides
+    seek straight to each sample; small strides skip frames with grab(), which
+    demuxes without the colour conversion. When CAP_PROP_FRAME_COUNT is zero
+    or wrong, frames are sampled by timestamp instead, spread evenly over the
+    duration found by seeking to the end (estimate_duration_ms). Only when
+    that fails too are they taken every FALLBACK_SAMPLE_INTERVAL_S from the
+    start, so just the first `max_frames` seconds are covered.
+
+    Args:
+        cap (cv2.VideoCapture): An opened capture positioned at the start.
+        max_frames (int): Maximum number of frames to sample; 0 samples none.
+    """
+    if max_frames <= 0:
+        return
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Frames read or grabbed from the container (samples plus skipped frames),
+    # reported as frames_decoded once the generator finishes or is closed
+    decoded = 0
+    try:
+        # 1. Unknown frame count: sample by time, over the estimated duration if there is one
+        if frame_count <= 0:
+            duration_ms = estimate_duration_ms(cap)
+            interval_ms = duration_ms / max_frames if duration_ms > 0 else FALLBACK_SAMPLE_INTERVAL_S * 1000
+            fps = cap.get(cv2.CAP_PROP_FPS) or FALLBACK_FPS
+
+            # Large strides: seek to each sample time, as with a known frame count
+            if duration_ms > 0 and interval_ms * fps / 1000 >= SEEK_STRIDE_THRESHOLD:
+                for k in range(max_frames):
+                    cap.set(cv2.CAP_PROP_POS_MSEC, k * interval_ms)
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    decoded += 1
+                    yield int(round(k * interval_ms * fps / 1000)), frame
+                return
+
+            # Otherwise read sequentially and keep the first frame past each sample time
+            next_sample_ms = 0.0
+            frame_index = 0
+            sampled = 0
+            while sampled < max_frames and cap.grab():
+                decoded += 1
+                position_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if position_ms >= next_sample_ms:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        yield frame_index, frame
+                        sampled += 1
+                    next_sample_ms = position_ms + interval_ms
+                frame_index += 1
+            return
+
+        frame_interval = get_frame_interval(frame_count, max_frames)
+
+        # 2. Large strides: seek directly to every sampled frame
+        if frame_interval >= SEEK_STRIDE_THRESHOLD:
+            for frame_index in range(0, frame_count, frame_interval):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                ret, frame = cap.read()
+                if not ret:
+                    # The reported frame count overshoots the real stream
+                    break
+                decoded += 1
+                yield frame_index, frame
+            return
+
+        # 3. Small strides: grab() through the skipped frames, decode only the samples
+        for frame_index in range(frame_count):
+            if frame_index % frame_interval != 0:
+                if not cap.grab():
+                    break
+                decoded += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded += 1
+            yield frame_index, frame
+    finally:
+        telemetry.add("frames_decoded", decoded)
+
+def get_planned_frames(frame_count, frame_interval, analyzed_frames):
+    """Number of samples the run aimed for, used for detection_success_rate."""
+    if frame_count > 0:
+        return frame_count / frame_interval
+    return analyzed_frames
+
+def analyze_frames(frames, engine=None, prefilter=None):
+    """
+    Dominant emotion (or None) per frame, through the engine's worker pool
+    when given and skipping what the FramePrefilter rules out.
+    """
+    if engine is not None:
+        analyze_fn = engine.analyze_frames
+    else:
+        analyze_fn = lambda batch: [analyze_frame_emotion(frame) for frame in batch]
+    if prefilter is None:
+        telemetry.add("deepface_calls", len(frames))
+        return analyze_fn(frames)
+    return prefilter.analyze(frames, analyze_fn)
+
+def tally_emotions(emotion_tally, dominant_emotions):
+    """Adds a list of dominant emotions (None for no face) to the tally in place."""
+    for dominant_emotion in dominant_emotions:
+        if dominant_emotion in HIGH_VALUE_EMOTIONS:
+            emotion_tally[dominant_emotion] += 1
+
+@telemetry.traced("emotion")
+def get_emotional_score(video_path, max_frames=50, engine=None, prefilter=True):
+    """
+    Analyzes a video for dominant facial emotions and assigns a score.
+    
+    Args:
+        video_path (str): Path to the video file.
+        max_frames (int): Maximum number of frames to process for speed.
+            0 skips emotion analysis and returns an empty summary.
+        engine (EmotionEngine): Optional warm worker pool from emotion_engine.py.
+            Frames are then analyzed in batches across the pool instead of
+            one DeepFace.analyze call at a time in this process.
+        prefilter (bool): Skip faceless and near-duplicate frames before
+            DeepFace (see frame_prefilter.py). Skipped frames still count as
+            analyzed; the summary reports how many were skipped.
+        
+    Returns:
+        dict: Summary of detected emotions and a total score.
+    """
+    if max_frames <= 0:
+        return build_emotion_summary({e: 0 for e in HIGH_VALUE_EMOTIONS}, 0, 0)
+    
+    # 1. Open the video file
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return {"error": "Failed to open video file."}
+
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    
+    # 2. Determine frame sampling (only analyze a manageable number of frames)
+    # This prevents the process from taking hours for long videos.
+    frame_interval = get_frame_interval(frame_count, max_frames)
+        
+    # 3. Define high-value emotions
+    emotion_tally = {e: 0 for e in HIGH_VALUE_EMOTIONS}
+    total_analyzed_frames = 0
+    frame_filter = FramePrefilter() if prefilter else None
+    
+    # 4. Process only the sampled frames (decode cost scales with max_frames)
+    if engine is None:
+        for _, frame in sample_frames(cap, max_frames):
+            total_analyzed_frames += 1
+            tally_emotions(emotion_tally, analyze_frames([frame], prefilter=frame_filter))
+            telemetry.progress(total_analyzed_frames, max_frames)
+    else:
+        # Hand the pool enough frames per round to keep every worker busy
+        chunk_size = engine.batch_size * engine.workers
+        pending = []
+        for _, frame in sample_frames(cap, max_frames):
+            pending.append(resize_to_width(frame, engine.max_width))
+            if len(pending) >= chunk_size:
+                tally_emotions(emotion_tally, analyze_frames(pending, engine, frame_filter))
+                total_analyzed_frames += len(pending)
+                pending = []
+                telemetry.progress(total_analyzed_frames, max_frames)
+        if pending:
+            tally_emotions(emotion_tally, analyze_frames(pending, engine, frame_filter))
+            total_analyzed_frames += len(pending)
+
+    cap.release()
+    telemetry.add("frames_analyzed", total_analyzed_frames)
+
+    # 5. Calculate Final Score and prepare the final summary
+    planned_frames = get_planned_frames(frame_count, frame_interval, total_analyzed_frames)
+    emotion_summary = build_emotion_summary(emotion_tally, total_analyzed_frames, planned_frames)
+    if engine is not None:
+        emotion_summary["inference_fps"] = round(engine.throughput(), 1)
+    if frame_filter is not None:
+        emotion_summary.update(frame_filter.counts)
+    return emotion_summary
+
+
+@telemetry.traced("segment_emotion")
+def get_segment_emotion_scores(video_path, segments, frames_per_segment=10, engine=None, prefilter=True):
+    """
+    Densely samples frames inside a few candidate segments and scores each one.
+
+    Used by scorer.calculate_two_phase_scores so emotion analysis only runs
+    where it can change the final ranking.
+
+    Args:
+        video_path (str): Path to the video file.
+        segments (list): (segment_id, start_seconds, end_seconds) tuples.
+        frames_per_segment (int): Evenly spaced frames analyzed per segment.
+        engine (EmotionEngine): Optional warm worker pool from emotion_engine.py.
+        prefilter (bool): Skip faceless and near-duplicate frames before DeepFace.
+
+    Returns:
+        dict: segment_id -> {"analyzed_frames": int, "excitement_score": int}
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return {}
+
+    # 1. Grab the sample frames, visiting segments in time order so seeks move forward
+    frames_by_segment = {}
+    for segment_id, start, end in sorted(segments, key=lambda s: s[1]):
+        frames = []
+        step = (end - start) / frames_per_segment
+        for k in range(frames_per_segment):
+            cap.set(cv2.CAP_PROP_POS_MSEC, (start + k * step) * 1000)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame if engine is None else resize_to_width(frame, engine.max_width))
+        frames_by_segment[segment_id] = frames
+
+    cap.release()
+
+    # 2. Analyze every candidate frame (as one batched job when a pool is available)
+    segment_ids = list(frames_by_segment)
+    all_frames = [frame for segment_id in segment_ids for frame in frames_by_segment[segment_id]]
+    dominant_emotions = analyze_frames(all_frames, engine, FramePrefilter() if prefilter else None)
+    telemetry.add("frames_decoded", len(all_frames))
+    telemetry.add("frames_analyzed", len(all_frames))
+
+    # 3. Split the results back into per-segment scores
+    scores = {}
+    offset = 0
+    for segment_id in segment_ids:
+        count = len(frames_by_segment[segment_id])
+        emotion_tally = {e: 0 for e in HIGH_VALUE_EMOTIONS}
+        tally_emotions(emotion_tally, dominant_emotions[offset:offset + count])
+        offset += count
+        scores[segment_id] = {
+            "analyzed_frames": count,
+            "excitement_score": sum(emotion_tally.values())
+        }
+
+    return scores
+
+
+class EmotionSamplerConsumer(FrameConsumer):
+    """
+    Emotion sampler fed by frame_source.run_frame_source. It asks only for every
+    `frame_interval`-th frame, downscaled to at most `max_width` pixels wide,
+    which is plenty for DeepFace's face detector. Without a frame count the
+    stride comes from the estimated duration (video_info["duration_s"]), as in
+    sample_frames, or is one frame per FALLBACK_SAMPLE_INTERVAL_S when that is
+    unknown too.
+    """
+
+    def __init__(self, max_frames=50, max_width=640, engine=None, prefilter=True):
+        self.max_frames = max_frames
+        self.max_width = max_width
+        self.engine = engine
+        self.frame_filter = FramePrefilter() if prefilter else None
+        self.pending = []
+
+    def start(self, video_info):
+        self.frame_count = video_info["frame_count"]
+        # max_frames=0 means no sampling at all
+        self.done = self.max_frames <= 0
+        if self.frame_count > 0:
+            self.stride = get_frame_interval(self.frame_count, self.max_frames)
+        else:
+            fps = video_info["fps"] or FALLBACK_FPS
+            duration_s = video_info.get("duration_s") or 0.0
+            if duration_s > 0:
+                self.stride = get_frame_interval(int(duration_s * fps), self.max_frames)
+            else:
+                self.stride = max(1, int(round(FALLBACK_SAMPLE_INTERVAL_S * fps)))
+        self.emotion_tally = {e: 0 for e in HIGH_VALUE_EMOTIONS}
+        self.total_analyzed_frames = 0
+
+        width, height = video_info["width"], video_info["height"]
+        if self.max_width and width > self.max_width:
+            self.size = (self.max_width, int(height * self.max_width / width))
+
+    def consume(self, frame_num, frame):
+        self.total_analyzed_frames += 1
+        telemetry.add("frames_analyzed")
+        if self.engine is None:
+            tally_emotions(self.emotion_tally, analyze_frames([frame], prefilter=self.frame_filter))
+        else:
+            # Frame buffers are reused by the decoder, so keep a copy for the batch
+            self.pending.append(frame.copy())
+            if len(self.pending) >= self.engine.batch_size * self.engine.workers:
+                self.flush()
+
+        # Without a usable frame count the stride is only an estimate, so cap the sample budget here
+        if self.frame_count <= 0 and self.total_analyzed_frames >= self.max_frames:
+            self.done = True
+
+    def flush(self):
+        if self.pending:
+            tally_emotions(self.emotion_tally, analyze_frames(self.pending, self.engine, self.frame_filter))
+            self.pending = []
+
+    def finish(self):
+        if self.engine is not None:
+            self.flush()
+        planned_frames = get_planned_frames(self.frame_count, self.stride, self.total_analyzed_frames)
+        emotion_summary = build_emotion_summary(self.emotion_tally, self.total_analyzed_frames, planned_frames)
+        if self.engine is not None:
+            emotion_summary["inference_fps"] = round(self.engine.throughput(), 1)
+        if self.frame_filter is not None:
+            emotion_summary.update(self.frame_filter.counts)
+        return emotion_summary
+
+if __name__ == '__main__':
+    # This block is for testing and requires a video path
+    # You will need to uncomment this and provide a path to test independently:
+    # dummy_video_path = "path/to/your/video.mp4"
+    # if os.path.exists(dummy_video_path):
+    #     print(get_emotional_score(dummy_video_path))
+    # else:
+    #     print("Test video not found.")
     pass
\ No newline at end of file
@@ -0,0 +1,174 @@
+import os
+import time
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Output order of DeepFace's facial-expression model
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Per-process emotion model, loaded once by the pool initializer
+_worker_model = None
+
+
+def _load_emotion_model():
+    """Builds DeepFace's emotion model, handling the old and new build_model signatures."""
+    from deepface import DeepFace
+    try:
+        return DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+    except TypeError:
+        return DeepFace.build_model("Emotion")
+
+
+def _init_worker():
+    """Pool initializer: pays the TensorFlow and model load once per worker process."""
+    global _worker_model
+    _worker_model = _load_emotion_model()
+
+    # Run one dummy frame so detector weights and graph tracing are warm too
+    _analyze_batch([np.zeros((64, 64, 3), dtype=np.uint8)])
+
+
+def _ping():
+    """No-op task used to confirm a worker has finished initialising."""
+    return os.getpid()
+
+
+def _analyze_batch_single(frames):
+    """Fallback path: one DeepFace.analyze call per frame, still inside the warm worker."""
+    from emotion_detector import analyze_frame_emotion
+    return [analyze_frame_emotion(frame) for frame in frames]
+
+
+def _analyze_batch(frames):
+    """
+    Runs face detection on each frame, then a single batched forward pass of
+    the emotion model over all detected faces.
+
+    Returns:
+        list: Dominant emotion per frame, or None where no face was found.
+    """
+    from deepface import DeepFace
+
+    if _worker_model is None or not hasattr(_worker_model, "model"):
+        return _analyze_batch_single(frames)
+
+    try:
+        # 1. Detect the main face in every frame
+        faces = []
+        owners = []
+        for i, frame in enumerate(frames):
+            detected = DeepFace.extract_faces(frame, detector_backend='opencv', enforce_detection=False)
+            if not detected:
+                continue
+            face = detected[0]['face']
+            if face.dtype != np.uint8:
+                face = (face * 255).astype(np.uint8)
+
+            # 2. Same preprocessing as DeepFace's Emotion client: 48x48 grayscale
+            gray = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY)
+            faces.append(cv2.resize(gray, (48, 48)))
+            owners.append(i)
+
+        dominant = [None] * len(frames)
+        if not faces:
+            return dominant
+
+        # 3. One forward pass for the whole batch
+        batch = np.expand_dims(np.stack(faces), axis=-1).astype(np.float32) / 255.0
+        predictions = _worker_model.model.predict(batch, verbose=0)
+        for i, prediction in zip(owners, predictions):
+            dominant[i] = EMOTION_LABELS[int(np.argmax(prediction))]
+        return dominant
+
+    except Exception:
+        # DeepFace internals differ between releases; keep results flowing
+        return _analyze_batch_single(frames)
+
+
+def resize_to_width(frame, max_width):
+    """Downscales a frame to at most max_width pixels wide before it is sent to a worker."""
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    return cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+
+class EmotionEngine:
+    """
+    Pool of warm worker processes that run batched emotion inference.
+
+    The pool is created once and reused across videos (and Streamlit reruns when
+    held with st.cache_resource), so only the first batch per worker pays the
+    model load.
+    """
+
+    def __init__(self, workers=None, batch_size=8, max_width=640):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.batch_size = batch_size
+        self.max_width = max_width
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self.frames_processed = 0
+        self.busy_seconds = 0.0
+        self.last_fps = 0.0
+
+    def warm_up(self):
+        """Blocks until every worker process has loaded the model."""
+        futures = [self.pool.submit(_ping) for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def analyze_frames(self, frames):
+        """
+        Returns the dominant emotion (or None) for each frame, in order.
+
+        Frames are split into batches of `batch_size` and spread over the pool.
+        """
+        if not frames:
+            return []
+
+        start = time.perf_counter()
+        frames = [resize_to_width(frame, self.max_width) for frame in frames]
+        batches = [frames[i:i + self.batch_size] for i in range(0, len(frames), self.batch_size)]
+
+        results = []
+        for batch_result in self.pool.map(_analyze_batch, batches):
+            results.extend(batch_result)
+
+        elapsed = time.perf_counter() - start
+        self.frames_processed += len(frames)
+        self.busy_seconds += elapsed
+        self.last_fps = len(frames) / elapsed if elapsed > 0 else 0.0
+        return results
+
+    def throughput(self):
+        """Average frames per second over everything this engine has analyzed."""
+        if self.busy_seconds <= 0:
+            return 0.0
+        return self.frames_processed / self.busy_seconds
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+
+_default_engine = None
+
+
+def get_emotion_engine(workers=None, batch_size=8):
+    """
+    Returns the process-wide EmotionEngine, creating it on first use.
+
+    The worker count defaults to the VHG_EMOTION_WORKERS environment variable,
+    then to half the CPU count.
+    """
+    global _default_engine
+
+    if workers is None and os.environ.get("VHG_EMOTION_WORKERS"):
+        workers = int(os.environ["VHG_EMOTION_WORKERS"])
+
+    if _default_engine is not None and workers not in (None, _default_engine.workers):
+        _default_engine.shutdown()
+        _default_engine = None
+
+    if _default_engine is None:
+        _default_engine = EmotionEngine(workers=workers, batch_size=batch_size)
+    return _default_engine
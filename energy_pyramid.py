@@ -0,0 +1,105 @@
+"""
+Multi-resolution energy timeline.
+
+get_audio_peaks' envelope has one row per hop (~340k rows for an hour at
+48 kHz), far too many to chart in a browser. EnergyPyramid keeps the
+envelope at the full resolution plus coarser levels, each bin of level k
+covering FACTOR ** k hops with its min, max and mean, all as float32.
+query() answers any time window from the finest level that fits in
+max_points, so a chart never receives more than that many rows while the
+min/max bands still show every spike.
+"""
+import numpy as np
+import pandas as pd
+
+# Hops per bin grow by this factor from one level to the next
+FACTOR = 4
+
+# Rows the Streamlit chart requests per view
+CHART_POINTS = 2000
+
+
+class EnergyPyramid:
+    """
+    Args:
+        values (np.ndarray): Energy per hop (level 0).
+        hop_seconds (float): Time between consecutive values.
+        factor (int): Hops per bin multiplier between levels.
+    """
+
+    def __init__(self, values, hop_seconds, factor=FACTOR, levels=None):
+        self.hop_seconds = float(hop_seconds)
+        self.factor = int(factor)
+        # levels[0] is the raw float32 series; levels[k] is (n_bins, 3) float32 min/max/mean
+        self.levels = levels if levels is not None else self._build(np.asarray(values, dtype=np.float32))
+
+    def _build(self, values):
+        levels = [values]
+        if len(values) == 0:
+            return levels
+        mins = maxs = values.astype(np.float64)
+        sums = values.astype(np.float64)
+        counts = np.ones(len(values))
+
+        # Each level is reduced from the one below, so the whole build is O(n)
+        while len(mins) > 1:
+            starts = np.arange(0, len(mins), self.factor)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            sums = np.add.reduceat(sums, starts)
+            counts = np.add.reduceat(counts, starts)
+            levels.append(np.column_stack([mins, maxs, sums / counts]).astype(np.float32))
+        return levels
+
+    @classmethod
+    def from_envelope(cls, envelope, name='rms', factor=FACTOR):
+        """Builds the pyramid from one feature of a get_audio_peaks AudioEnvelope."""
+        return cls(envelope.column(name), envelope.hop_seconds, factor)
+
+    @property
+    def duration(self):
+        return len(self.levels[0]) * self.hop_seconds
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def query(self, t0=0.0, t1=None, max_points=CHART_POINTS):
+        """
+        The envelope between t0 and t1 seconds in at most max_points rows.
+
+        Returns:
+            pd.DataFrame: 'Time (s)' (bin centre), 'Energy' (mean),
+            'Energy_Min' and 'Energy_Max'.
+        """
+        n = len(self.levels[0])
+        t1 = self.duration if t1 is None else t1
+        first = int(np.clip(np.floor(t0 / self.hop_seconds), 0, n))
+        last = int(np.clip(np.ceil(t1 / self.hop_seconds) + 1, first, n))
+
+        # 1. Finest level whose bins cover the window in at most max_points rows
+        level = 0
+        while level + 1 < len(self.levels) and -(-(last - first) // self.factor ** level) > max(1, max_points):
+            level += 1
+        bin_hops = self.factor ** level
+        lo, hi = first // bin_hops, -(-last // bin_hops)
+
+        # 2. Slice it; level 0 has no separate min/max
+        data = self.levels[level][lo:hi]
+        if level == 0:
+            mins = maxs = means = data
+        else:
+            mins, maxs, means = data[:, 0], data[:, 1], data[:, 2]
+        centres = (np.arange(lo, lo + len(data)) * bin_hops + (bin_hops - 1) / 2) * self.hop_seconds
+        return pd.DataFrame({'Time (s)': centres, 'Energy': means, 'Energy_Min': mins, 'Energy_Max': maxs})
+
+    def to_arrays(self):
+        """Dict of arrays for analysis_cache (np.savez)."""
+        arrays = {"hop_seconds": np.float64(self.hop_seconds), "factor": np.int64(self.factor)}
+        arrays.update({f"level_{k}": level for k, level in enumerate(self.levels)})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        levels = [arrays[f"level_{k}"] for k in range(sum(1 for name in arrays if name.startswith("level_")))]
+        return cls(None, float(arrays["hop_seconds"]), int(arrays["factor"]), levels=levels)
@@ -0,0 +1,250 @@
+"""
+Cheap checks that decide whether a sampled frame is worth a DeepFace call.
+
+    1. Near-duplicates: a 64-bit difference hash (dHash) of the frame is
+       compared with the last frame that was actually checked; static shots
+       reuse that frame's result instead of being analyzed again.
+    2. Face presence: OpenCV's Haar face cascade on a small grayscale copy,
+       or the YuNet detector (cv2.FaceDetectorYN) on builds without cascades
+       such as OpenCV 5. Frames without a face (wide shots, scoreboards,
+       crowd pans) are counted as analyzed with no emotion. When neither
+       detector is available the check is skipped, and counts report
+       face_check: False.
+
+Both filters report how many frames they skipped (telemetry counters
+skipped_duplicate, skipped_no_face and deepface_calls). DeepFace with
+enforce_detection=False still labels faceless frames from the whole image,
+so the tallies can move slightly; compare_tallies measures by how much:
+
+    python frame_prefilter.py clip1.mp4 clip2.mp4 --tolerance 0.05
+"""
+import os
+import sys
+import argparse
+
+import cv2
+import numpy as np
+
+import telemetry
+
+# Width the face check runs at; faces stay detectable while the cascade is ~10x cheaper than at 720p
+FACE_CHECK_WIDTH = 320
+
+# dHash bits (out of 64) that may differ for two frames to count as the same shot
+DUPLICATE_MAX_DISTANCE = 4
+
+# Largest allowed change in the share of sampled frames showing a high-value emotion
+TALLY_TOLERANCE = 0.05
+
+# YuNet weights for cv2.FaceDetectorYN; DeepFace's yunet backend downloads the same file
+YUNET_MODEL_NAME = "face_detection_yunet_2023mar.onnx"
+
+# Outcomes of FramePrefilter.classify
+ANALYZE = "analyze"
+DUPLICATE = "duplicate"
+NO_FACE = "no_face"
+
+_face_detector = None
+
+
+def find_yunet_model():
+    """Path of the YuNet ONNX model ($VHG_FACE_MODEL, else DeepFace's weights folder), or None."""
+    deepface_home = os.environ.get("DEEPFACE_HOME", os.path.expanduser("~"))
+    candidates = [
+        os.environ.get("VHG_FACE_MODEL", ""),
+        os.path.join(deepface_home, ".deepface", "weights", YUNET_MODEL_NAME),
+    ]
+    return next((path for path in candidates if path and os.path.exists(path)), None)
+
+
+def _load_haar_detector():
+    path = os.path.join(getattr(getattr(cv2, "data", None), "haarcascades", ""), "haarcascade_frontalface_default.xml")
+    if not hasattr(cv2, "CascadeClassifier") or not os.path.exists(path):
+        return None
+    cascade = cv2.CascadeClassifier(path)
+    if cascade.empty():
+        return None
+
+    def detect(frame):
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame)
+        # Permissive settings: a false positive costs one DeepFace call, a miss changes the tally
+        return len(cascade.detectMultiScale(gray, scaleFactor=1.15, minNeighbors=3, minSize=(16, 16))) > 0
+
+    return detect
+
+
+def _load_yunet_detector():
+    model_path = find_yunet_model()
+    if not hasattr(cv2, "FaceDetectorYN") or model_path is None:
+        return None
+    try:
+        # Low score threshold for the same reason as the cascade's permissive settings
+        detector = cv2.FaceDetectorYN.create(model_path, "", (FACE_CHECK_WIDTH, FACE_CHECK_WIDTH), 0.5)
+    except cv2.error as e:
+        print(f"Could not load the YuNet face model {model_path}: {e}")
+        return None
+
+    def detect(frame):
+        bgr = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) if frame.ndim == 2 else frame
+        detector.setInputSize((bgr.shape[1], bgr.shape[0]))
+        _, faces = detector.detect(bgr)
+        return faces is not None and len(faces) > 0
+
+    return detect
+
+
+def get_face_detector():
+    """
+    A function frame -> bool telling whether a face is visible, loaded once:
+    the Haar cascade shipped with opencv-python, else YuNet (cv2.FaceDetectorYN).
+
+    Returns:
+        callable or None: None when neither is available; the face check is
+        then skipped, which is printed once.
+    """
+    global _face_detector
+    if _face_detector is None:
+        _face_detector = _load_haar_detector() or _load_yunet_detector() or False
+        if not _face_detector:
+            print(f"Face check disabled: OpenCV {cv2.__version__} has no Haar cascades and no usable YuNet model "
+                  f"was found (set VHG_FACE_MODEL to {YUNET_MODEL_NAME}); every frame goes to DeepFace")
+    return _face_detector or None
+
+
+def dhash(frame):
+    """64-bit difference hash: sign of the horizontal gradient on a 9x8 grayscale thumbnail."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def has_face(frame, detector, width=FACE_CHECK_WIDTH):
+    """True if `detector` (see get_face_detector) finds a face in a copy of the frame downscaled to `width`."""
+    height, frame_width = frame.shape[:2]
+    if frame_width > width:
+        frame = cv2.resize(frame, (width, int(height * width / frame_width)), interpolation=cv2.INTER_AREA)
+    return detector(frame)
+
+
+class FramePrefilter:
+    """
+    Stateful pre-filter for one stream of sampled frames, in time order.
+
+    Args:
+        face_check (bool): Skip frames where no face is found (when a face
+            detector is available; counts["face_check"] says whether it ran).
+        dedup (bool): Reuse the previous result for near-duplicate frames.
+        max_distance (int): dHash distance still treated as a duplicate.
+        face_width (int): Width the face check runs at.
+    """
+
+    def __init__(self, face_check=True, dedup=True, max_distance=DUPLICATE_MAX_DISTANCE, face_width=FACE_CHECK_WIDTH):
+        self.face_detector = get_face_detector() if face_check else None
+        self.dedup = dedup
+        self.max_distance = max_distance
+        self.face_width = face_width
+        self.reference_hash = None
+        self.reference_result = None
+        self.counts = {"skipped_no_face": 0, "skipped_duplicate": 0, "deepface_calls": 0,
+                       "face_check": self.face_detector is not None}
+
+    def classify(self, frame):
+        """Returns ANALYZE, DUPLICATE (of the last classified frame) or NO_FACE."""
+        if self.dedup:
+            frame_hash = dhash(frame)
+            if self.reference_hash is not None and bin(frame_hash ^ self.reference_hash).count("1") <= self.max_distance:
+                return DUPLICATE
+            # Only frames that are checked become the reference, so slow drift is caught
+            self.reference_hash = frame_hash
+        if self.face_detector is not None and not has_face(frame, self.face_detector, self.face_width):
+            return NO_FACE
+        return ANALYZE
+
+    def analyze(self, frames, analyze_fn):
+        """
+        Runs `analyze_fn` (a list of frames -> list of dominant emotions, e.g.
+        EmotionEngine.analyze_frames) on the frames that pass the filters only.
+
+        Returns:
+            list: Dominant emotion (or None) for every frame, in order.
+        """
+        decisions = [self.classify(frame) for frame in frames]
+        to_analyze = [frame for frame, decision in zip(frames, decisions) if decision == ANALYZE]
+        analyzed = iter(analyze_fn(to_analyze) if to_analyze else [])
+
+        results = []
+        for decision in decisions:
+            if decision == ANALYZE:
+                self.reference_result = next(analyzed)
+            elif decision == NO_FACE:
+                self.reference_result = None
+            results.append(self.reference_result)
+
+        skipped_duplicate = decisions.count(DUPLICATE)
+        skipped_no_face = decisions.count(NO_FACE)
+        self.counts["skipped_duplicate"] += skipped_duplicate
+        self.counts["skipped_no_face"] += skipped_no_face
+        self.counts["deepface_calls"] += len(to_analyze)
+        telemetry.add("skipped_duplicate", skipped_duplicate)
+        telemetry.add("skipped_no_face", skipped_no_face)
+        telemetry.add("deepface_calls", len(to_analyze))
+        return results
+
+
+def compare_tallies(video_path, max_frames=50, engine=None, tolerance=TALLY_TOLERANCE):
+    """
+    Runs get_emotional_score with and without the pre-filters and reports the difference.
+
+    The excitement rate is the share of sampled frames with a high-value
+    emotion; the filtered run passes when its rate is within `tolerance` of
+    the unfiltered one.
+
+    Returns:
+        dict: Both summaries, the rate difference, DeepFace calls saved and "within_tolerance".
+    """
+    from emotion_detector import get_emotional_score
+
+    baseline = get_emotional_score(video_path, max_frames=max_frames, engine=engine, prefilter=False)
+    filtered = get_emotional_score(video_path, max_frames=max_frames, engine=engine, prefilter=True)
+    if "error" in baseline or "error" in filtered:
+        return {"video": video_path, "error": baseline.get("error") or filtered.get("error")}
+
+    def rate(summary):
+        return summary["excitement_score"] / summary["analyzed_frames"] if summary["analyzed_frames"] else 0.0
+
+    difference = abs(rate(filtered) - rate(baseline))
+    return {
+        "video": video_path,
+        "baseline": baseline,
+        "filtered": filtered,
+        "rate_difference": round(difference, 4),
+        "tolerance": tolerance,
+        "within_tolerance": difference <= tolerance,
+        "deepface_calls_saved": baseline["analyzed_frames"] - filtered["deepface_calls"],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check that the DeepFace pre-filters keep emotion tallies within tolerance.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--max-frames", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=TALLY_TOLERANCE)
+    args = parser.parse_args()
+
+    failures = 0
+    for video in args.videos:
+        report = compare_tallies(video, max_frames=args.max_frames, tolerance=args.tolerance)
+        if "error" in report:
+            failures += 1
+            print(f"{video}: {report['error']}")
+            continue
+        baseline, filtered = report["baseline"], report["filtered"]
+        failures += not report["within_tolerance"]
+        print(f"{video}: excitement {baseline['excitement_score']} -> {filtered['excitement_score']} "
+              f"of {baseline['analyzed_frames']} frames, rate difference {report['rate_difference']:.3f} "
+              f"(tolerance {report['tolerance']}), DeepFace calls {baseline['analyzed_frames']} -> {filtered['deepface_calls']} "
+              f"({filtered['skipped_no_face']} no face{'' if filtered['face_check'] else ' [face check off]'}, "
+              f"{filtered['skipped_duplicate']} duplicate) "
+              f"{'OK' if report['within_tolerance'] else 'OUT OF TOLERANCE'}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,182 @@
+import cv2
+import telemetry
+
+# Frames between progress reports to the current telemetry span
+PROGRESS_EVERY_FRAMES = 50
+
+
+class FrameConsumer:
+    """
+    Base class for analyzers that receive frames from run_frame_source.
+
+    A consumer declares what it needs through two attributes, which it may set
+    in start() once the video properties are known:
+        stride (int): Only every `stride`-th frame is passed to consume().
+        size (tuple or None): (width, height) the frame is resized to, or None
+            for the native resolution.
+    Setting `done = True` tells the source this consumer needs no more frames.
+    """
+
+    stride = 1
+    size = None
+    done = False
+
+    def start(self, video_info):
+        """Called once before decoding with fps, frame_count, width and height."""
+        pass
+
+    def consume(self, frame_num, frame):
+        """Called for every frame selected by `stride`, already resized to `size`."""
+        raise NotImplementedError
+
+    def finish(self):
+        """Called once after decoding. The return value is this consumer's result."""
+        return None
+
+
+def estimate_duration_ms(cap):
+    """
+    Duration of a capture that reports no frame count: the timestamp after
+    seeking to the end, or 0 when the container cannot seek (e.g. a live
+    stream). The capture is rewound to the start.
+    """
+    duration_ms = 0.0
+    if cap.set(cv2.CAP_PROP_POS_AVI_RATIO, 1.0):
+        duration_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        cap.set(cv2.CAP_PROP_POS_MSEC, 0)
+    return max(duration_ms, 0.0)
+
+
+def get_video_info(cap):
+    """
+    Reads the basic stream properties from an opened cv2.VideoCapture.
+    duration_s is 0 when neither the frame count nor a seek to the end gives it.
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if frame_count > 0:
+        duration_s = frame_count / fps if fps > 0 else 0.0
+    else:
+        duration_s = estimate_duration_ms(cap) / 1000
+    return {
+        "fps": fps,
+        "frame_count": frame_count,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "duration_s": duration_s,
+    }
+
+
+def run_frame_source(video_path, consumers, start_frame=0, end_frame=None):
+    """
+    Decodes a video once and fans the frames out to several consumers.
+
+    Frames that no consumer wants are skipped with grab(), which avoids the
+    colour conversion, and each requested resolution is produced at most once
+    per frame no matter how many consumers share it.
+
+    Args:
+        video_path (str): Path to the video file.
+        consumers (list): FrameConsumer instances.
+        start_frame (int): First frame to decode.
+        end_frame (int): Frame to stop before (None for the end of the video).
+
+    Returns:
+        tuple: (list of consumer results in the same order, video_info dict).
+    """
+
+    # 1. Open the video once for all consumers
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Failed to open video file: {video_path}")
+
+    video_info = get_video_info(cap)
+    for consumer in consumers:
+        consumer.start(video_info)
+
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    last_frame = end_frame if end_frame is not None else video_info["frame_count"]
+    frames_to_decode = max(0, last_frame - start_frame)
+
+    # 2. Decode sequentially, retrieving only frames that someone asked for
+    frame_num = start_frame
+    frames_decoded = 0
+    frames_retrieved = 0
+    while end_frame is None or frame_num < end_frame:
+        active = [c for c in consumers if not c.done]
+        if not active:
+            break
+
+        if frames_decoded % PROGRESS_EVERY_FRAMES == 0:
+            telemetry.progress(frames_decoded, frames_to_decode)
+
+        wanting = [c for c in active if frame_num % c.stride == 0]
+        if not wanting:
+            if not cap.grab():
+                break
+            frame_num += 1
+            frames_decoded += 1
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames_retrieved += 1
+
+        # 3. Downscale once per distinct size and share it between consumers
+        resized = {}
+        for consumer in wanting:
+            if consumer.size not in resized:
+                if consumer.size is None:
+                    resized[consumer.size] = frame
+                else:
+                    resized[consumer.size] = cv2.resize(frame, consumer.size, interpolation=cv2.INTER_AREA)
+            consumer.consume(frame_num, resized[consumer.size])
+
+        frame_num += 1
+        frames_decoded += 1
+
+    cap.release()
+    telemetry.add("frames_decoded", frames_decoded)
+    telemetry.add("frames_retrieved", frames_retrieved)
+    telemetry.progress(frames_decoded, frames_decoded)
+
+    video_info["frames_decoded"] = frames_decoded
+    video_info["last_frame"] = frame_num
+    return [consumer.finish() for consumer in consumers], video_info
+
+
+@telemetry.traced("video_frames")
+def analyze_video_frames(video_path, threshold=27, max_frames=50, engine=None, downscale=None, frame_skip=0, prefilter=True):
+    """
+    Runs scene detection and emotion sampling over a single decode of the video.
+
+    Pass an emotion_engine.EmotionEngine as `engine` to batch the emotion
+    inference across its warm worker pool. With max_frames=0 only scene
+    detection runs and the emotion summary is None (used when emotion is
+    analyzed per candidate segment instead). `downscale` and `frame_skip`
+    are passed to the SceneCutConsumer, `prefilter` to the EmotionSamplerConsumer.
+
+    Returns:
+        tuple: (scene_cuts_df, emotion_summary) in the same formats as
+        get_scene_cuts and get_emotional_score.
+    """
+    import pandas as pd
+    from scene_detector import SceneCutConsumer
+    from emotion_detector import EmotionSamplerConsumer
+
+    consumers = [SceneCutConsumer(threshold=threshold, downscale=downscale, frame_skip=frame_skip)]
+    if max_frames:
+        consumers.append(EmotionSamplerConsumer(max_frames=max_frames, engine=engine, prefilter=prefilter))
+
+    try:
+        results, _ = run_frame_source(video_path, consumers)
+    except IOError as e:
+        # Mirror the error values the individual analyzers return
+        return pd.DataFrame([{"Error": f"Failed to open video: {e}"}]), {"error": "Failed to open video file."}
+
+    scene_cuts_df = results[0]
+    emotion_summary = results[1] if max_frames else None
+    return scene_cuts_df, emotion_summary
@@ -1,80 +1,403 @@
-from moviepy.editor import VideoFileClip, concatenate_videoclips
-import pandas as pd
-import os
-
-# Helper function to convert HH:MM:SS.mmm string to total seconds (float)
-def time_string_to_seconds(time_str):
-    """Converts a time string (HH:MM:SS.mmm) to total seconds (float)."""
-    try:
-        h, m, s = map(float, time_str.split(':'))
-        return h * 3600 + m * 60 + s
-    except Exception:
-        # Fallback for unexpected format, though shouldn't happen with scorer.py output
-        return 0.0
-
-
-def generate_highlight_video(video_path, scored_segments_df, top_n=3, output_filename="highlight_reel.mp4"):
-    """
-    Selects the top N highest-scoring segments and stitches them into a new video.
-    """
-
-    # 1. Select the top N segments based on the score
-    # Filter for segments with a score > 0 and take the top N
-    top_segments = scored_segments_df[scored_segments_df['Highlight_Score'] > 0].head(top_n)
-
-    if top_segments.empty:
-        print("No segments with a score > 0 were found to generate a highlight reel.")
-        return None
-
-    # 2. Extract clip objects for each top segment
-    clip_list = []
-
-    try:
-        # Load the original clip ONCE
-        original_clip = VideoFileClip(video_path)
-    except Exception as e:
-        print(f"Error loading original video: {e}")
-        return None
-
-    for index, segment in top_segments.iterrows():
-        # CONVERSION: Convert time strings (HH:MM:SS.mmm) to seconds (float) for MoviePy
-        start_time_sec = time_string_to_seconds(segment['Start_Time'])
-        end_time_sec = time_string_to_seconds(segment['End_Time'])
-
-        # Clip the original video using the timecodes (now guaranteed to be a float)
-        try:
-            subclip = original_clip.subclip(start_time_sec, end_time_sec)
-            clip_list.append(subclip)
-        except Exception as e:
-            print(f"Error creating subclip for segment {index}: {e}")
-            pass # Skip this segment if it fails
-
-
-    if not clip_list:
-        original_clip.close()
-        return None
-
-    # 3. Concatenate (stitch) the clips together
-    print(f"Concatenating {len(clip_list)} segments into the final reel...")
-    final_clip = concatenate_videoclips(clip_list)
-
-    # 4. Write the final video file
-    output_path = os.path.join(os.path.dirname(video_path), output_filename)
-    
-    # Use a safe output path, adjusting for temp directory naming
-    output_directory = os.path.dirname(video_path)
-    final_output_path = os.path.join(output_directory, output_filename)
-
-
-    # Write the final video file (using logger=None to prevent verbose output)
-    final_clip.write_videofile(final_output_path, codec='libx264', audio_codec='aac', logger=None)
-    
-    # 5. Clean up
-    original_clip.close() # Close the original clip object
-    final_clip.close() # Close the final clip object
-
-    return final_output_path
-
-if __name__ == '__main__':
-    # ... (rest of the __main__ block is unchanged) ...
-    pass
\ No newline at end of file
+import pandas as pd
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import telemetry
+
+# Helper function to convert HH:MM:SS.mmm string to total seconds (float)
+def time_string_to_seconds(time_str):
+    """Converts a time string (HH:MM:SS.mmm) to total seconds (float)."""
+    try:
+        h, m, s = map(float, time_str.split(':'))
+        return h * 3600 + m * 60 + s
+    except Exception:
+        # Fallback for unexpected format, though shouldn't happen with scorer.py output
+        return 0.0
+
+
+def select_top_segments(scored_segments_df, top_n=3):
+    """Returns (start_seconds, end_seconds) for the top N segments with a score > 0."""
+    top_segments = scored_segments_df[scored_segments_df['Highlight_Score'] > 0].head(top_n)
+    return [
+        (time_string_to_seconds(segment['Start_Time']), time_string_to_seconds(segment['End_Time']))
+        for _, segment in top_segments.iterrows()
+    ]
+
+
+def render_reencode(video_path, segments, output_path):
+    """
+    Full re-encode path: cuts each segment with MoviePy, concatenates them and
+    encodes the reel with libx264/aac in one pass.
+    """
+    # MoviePy (and its imageio/ffmpeg probing) is only loaded when this path runs
+    from moviepy.editor import VideoFileClip, concatenate_videoclips
+
+    # 1. Extract clip objects for each segment
+    clip_list = []
+
+    try:
+        # Load the original clip ONCE
+        original_clip = VideoFileClip(video_path)
+    except Exception as e:
+        print(f"Error loading original video: {e}")
+        return None
+
+    for index, (start_time_sec, end_time_sec) in enumerate(segments):
+        # Clip the original video using the timecodes (seconds as floats)
+        try:
+            subclip = original_clip.subclip(start_time_sec, end_time_sec)
+            clip_list.append(subclip)
+        except Exception as e:
+            print(f"Error creating subclip for segment {index}: {e}")
+            pass # Skip this segment if it fails
+
+
+    if not clip_list:
+        original_clip.close()
+        return None
+
+    # 2. Concatenate (stitch) the clips together
+    print(f"Concatenating {len(clip_list)} segments into the final reel...")
+    final_clip = concatenate_videoclips(clip_list)
+
+    # 3. Write the final video file (using logger=None to prevent verbose output)
+    # MoviePy's temporary audio track defaults to the current directory; keep it
+    # next to the output and remove it even when encoding fails
+    temp_audio = os.path.splitext(output_path)[0] + "_temp_audio.m4a"
+    try:
+        final_clip.write_videofile(output_path, codec='libx264', audio_codec='aac',
+                                   temp_audiofile=temp_audio, logger=None)
+    finally:
+        # 4. Clean up
+        original_clip.close() # Close the original clip object
+        final_clip.close() # Close the final clip object
+        if os.path.exists(temp_audio):
+            os.remove(temp_audio)
+
+    return output_path
+
+
+# --- Stream-copy rendering ---
+
+# Codecs whose partial GOPs we can re-encode to match the copied packets
+COPY_COMPATIBLE_VIDEO = {'h264': 'libx264'}
+COPY_COMPATIBLE_AUDIO = {'aac': 'aac'}
+
+# Head/tail pieces shorter than this are not worth a separate re-encode
+MIN_PART_SECONDS = 0.01
+
+# Stream parameters a re-encoded part must share with the copied packets
+MATCHED_VIDEO_PARAMS = ("codec_name", "profile", "level", "pix_fmt", "width", "height")
+
+
+def probe_streams(video_path):
+    """Returns the ffprobe stream descriptions of the first video and audio streams."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries",
+         "stream=index,codec_type,codec_name,profile,level,pix_fmt,width,height,r_frame_rate,sample_rate,channels",
+         "-of", "json", video_path],
+        capture_output=True, text=True, check=True
+    )
+    streams = json.loads(result.stdout).get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    return video, audio
+
+
+def get_keyframe_times(video_path):
+    """Returns the sorted presentation times of video keyframes, read from packet flags (no decoding)."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path],
+        capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in result.stdout.splitlines():
+        fields = line.split(",")
+        if len(fields) >= 2 and "K" in fields[1] and fields[0] not in ("", "N/A"):
+            times.append(float(fields[0]))
+    return sorted(times)
+
+
+def plan_copy_parts(segments, keyframes):
+    """
+    Splits each segment into ('encode' | 'copy', start, end) parts: the span
+    between the first and last keyframe inside the segment is stream-copied,
+    the partial GOPs before and after it are re-encoded.
+    """
+    parts = []
+    for start, end in segments:
+        inside = [k for k in keyframes if start <= k <= end]
+        if len(inside) < 2:
+            # No whole GOP inside the segment: re-encode all of it
+            parts.append(("encode", start, end))
+            continue
+
+        first_key, last_key = inside[0], inside[-1]
+        if first_key - start > MIN_PART_SECONDS:
+            parts.append(("encode", start, first_key))
+        parts.append(("copy", first_key, last_key))
+        if end - last_key > MIN_PART_SECONDS:
+            parts.append(("encode", last_key, end))
+    return parts
+
+
+def _run_ffmpeg(args):
+    subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-y"] + args, check=True, capture_output=True)
+
+
+def check_decodes(video_path):
+    """
+    Decodes the whole file (ffmpeg -v error -i ... -f null -).
+
+    Raises:
+        ValueError: if ffmpeg fails or reports any decoding error.
+    """
+    result = subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-i", video_path, "-f", "null", "-"],
+                            capture_output=True, text=True)
+    errors = result.stderr.strip()
+    if result.returncode != 0 or errors:
+        raise ValueError(f"{os.path.basename(video_path)} does not decode cleanly: {errors.splitlines()[0] if errors else result.returncode}")
+
+
+def render_stream_copy(video_path, segments, output_path):
+    """
+    Fast render: copies whole GOPs without decoding, re-encodes only the partial
+    GOPs at non-keyframe boundaries (with the source's codec parameters) and
+    joins everything with the concat demuxer.
+
+    The joined stream keeps one decoder configuration, so every re-encoded
+    part is probed against the source (profile, level, pix_fmt, size) and the
+    result is decoded end to end before it is accepted.
+
+    Raises:
+        ValueError: if the source codecs cannot be mixed with re-encoded parts,
+            a re-encoded part does not match the source, or the joined file
+            does not decode cleanly.
+    """
+    video, audio = probe_streams(video_path)
+    if video is None or video.get("codec_name") not in COPY_COMPATIBLE_VIDEO:
+        raise ValueError(f"Video codec {video and video.get('codec_name')} is not stream-copy compatible")
+    if audio is not None and audio.get("codec_name") not in COPY_COMPATIBLE_AUDIO:
+        raise ValueError(f"Audio codec {audio.get('codec_name')} is not stream-copy compatible")
+
+    parts = plan_copy_parts(segments, get_keyframe_times(video_path))
+
+    # Re-encoded parts must match the copied stream so the concat stays valid
+    encode_args = [
+        "-c:v", COPY_COMPATIBLE_VIDEO[video["codec_name"]],
+        "-pix_fmt", video.get("pix_fmt", "yuv420p"),
+        "-r", video.get("r_frame_rate", "25/1"),
+        "-s", f"{video['width']}x{video['height']}",
+    ]
+    if video.get("profile"):
+        # ffprobe reports e.g. "High" or "Constrained Baseline"; libx264 wants "high" / "baseline"
+        encode_args += ["-profile:v", video["profile"].lower().replace("constrained ", "").replace(" ", "")]
+    if isinstance(video.get("level"), int) and video["level"] > 0:
+        # ffprobe reports the H.264 level_idc (e.g. 40); libx264 accepts it as is
+        encode_args += ["-level:v", str(video["level"])]
+    if audio is not None:
+        encode_args += ["-c:a", COPY_COMPATIBLE_AUDIO[audio["codec_name"]],
+                        "-ar", str(audio["sample_rate"]), "-ac", str(audio["channels"])]
+
+    work_dir = tempfile.mkdtemp(prefix="highlight_parts_", dir=os.path.dirname(output_path) or None)
+    try:
+        # 1. Produce every part as MPEG-TS, which concatenates cleanly
+        part_paths = []
+        for i, (kind, start, end) in enumerate(parts):
+            part_path = os.path.join(work_dir, f"part_{i:04d}.ts")
+            seek = ["-ss", f"{start:.6f}", "-to", f"{end:.6f}", "-i", video_path]
+            if kind == "copy":
+                _run_ffmpeg(seek + ["-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+                                    "-bsf:v", "h264_mp4toannexb", "-f", "mpegts", part_path])
+            else:
+                _run_ffmpeg(seek + ["-map", "0:v:0", "-map", "0:a:0?"] + encode_args + ["-f", "mpegts", part_path])
+                part_video, _ = probe_streams(part_path)
+                mismatched = [key for key in MATCHED_VIDEO_PARAMS if (part_video or {}).get(key) != video.get(key)]
+                if mismatched:
+                    raise ValueError(f"Re-encoded part {i} does not match the source stream ({', '.join(mismatched)})")
+            part_paths.append(part_path)
+            # The final concat counts as one more step
+            telemetry.progress(len(part_paths), len(parts) + 1)
+
+        # 2. Join with the concat demuxer (no re-encode)
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, "w") as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+        concat_args = ["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy"]
+        if audio is not None:
+            concat_args += ["-bsf:a", "aac_adtstoasc"]
+        _run_ffmpeg(concat_args + [output_path])
+
+        # 3. Parameter sets that slipped past the probe show up as decoding errors
+        try:
+            check_decodes(output_path)
+        except ValueError:
+            os.remove(output_path)
+            raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    copied = sum(end - start for kind, start, end in parts if kind == "copy")
+    encoded = sum(end - start for kind, start, end in parts if kind == "encode")
+    return {"copied_seconds": round(copied, 3), "reencoded_seconds": round(encoded, 3)}
+
+
+# --- Parallel per-segment rendering ---
+
+def _encode_segment(video_path, start, end, output_path, threads):
+    """
+    Worker: encodes one segment with exactly the settings render_reencode uses
+    (MoviePy, libx264/aac, source fps), so the pieces can be joined losslessly.
+    """
+    from moviepy.editor import VideoFileClip
+
+    original_clip = VideoFileClip(video_path)
+    try:
+        subclip = original_clip.subclip(start, end)
+        # Keep MoviePy's temporary audio file inside the work dir (one per segment)
+        temp_audio = os.path.splitext(output_path)[0] + "_audio.m4a"
+        subclip.write_videofile(output_path, codec='libx264', audio_codec='aac',
+                                temp_audiofile=temp_audio, threads=threads, logger=None)
+    finally:
+        original_clip.close()
+    return output_path
+
+
+def render_parallel(video_path, segments, output_path, workers=None):
+    """
+    Encodes every segment independently in a process pool, then joins the
+    intermediate files with the concat demuxer (stream copy, no second encode).
+    Intermediate files are removed whether or not the render succeeds.
+
+    Args:
+        workers (int): Number of encoder processes (default: one per segment,
+            capped at the CPU count).
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = workers or min(len(segments), cpu_count)
+    threads_per_worker = max(1, cpu_count // workers)
+
+    work_dir = tempfile.mkdtemp(prefix="highlight_segments_", dir=os.path.dirname(output_path) or None)
+    try:
+        # 1. Encode all segments concurrently
+        segment_paths = [os.path.join(work_dir, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_encode_segment, video_path, start, end, segment_path, threads_per_worker)
+                for (start, end), segment_path in zip(segments, segment_paths)
+            ]
+            try:
+                for done, future in enumerate(futures, start=1):
+                    future.result()
+                    telemetry.progress(done, len(futures) + 1)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # 2. Join losslessly in segment order
+        list_path = os.path.join(work_dir, "segments.txt")
+        with open(list_path, "w") as f:
+            for segment_path in segment_paths:
+                f.write(f"file '{segment_path}'\n")
+        _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy",
+                     "-movflags", "+faststart", output_path])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"workers": workers}
+
+
+@telemetry.traced("render")
+def render_highlight_video(video_path, segments, output_path, mode="reencode", workers=None):
+    """
+    Renders segments into a reel and reports how it was done.
+
+    Args:
+        mode (str): "reencode" (MoviePy, full re-encode), "copy" (stream
+            copy with partial-GOP re-encode) or "parallel" (per-segment
+            re-encode in `workers` processes). "copy" and "parallel" fall back
+            to a single-pass re-encode when they cannot be used.
+
+    Returns:
+        dict: path (None on failure), mode actually used and render seconds.
+    """
+    start = time.perf_counter()
+    stats = {"requested_mode": mode}
+    telemetry.add("segments", len(segments))
+    telemetry.add("output_seconds", sum(end - start_s for start_s, end in segments))
+
+    if mode == "copy":
+        try:
+            stats.update(render_stream_copy(video_path, segments, output_path))
+            stats.update(path=output_path, mode="copy", seconds=round(time.perf_counter() - start, 2))
+            return stats
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            print(f"Stream-copy render unavailable ({e}); falling back to full re-encode.")
+
+    if mode == "parallel":
+        try:
+            stats.update(render_parallel(video_path, segments, output_path, workers=workers))
+            stats.update(path=output_path, mode="parallel", seconds=round(time.perf_counter() - start, 2))
+            return stats
+        except Exception as e:
+            print(f"Parallel render failed ({e}); falling back to single-pass re-encode.")
+
+    path = render_reencode(video_path, segments, output_path)
+    stats.update(path=path, mode="reencode", seconds=round(time.perf_counter() - start, 2))
+    return stats
+
+
+def generate_highlight_video(video_path, scored_segments_df, top_n=3, output_filename="highlight_reel.mp4", mode="reencode", workers=None, output_dir=None, target_duration=None):
+    """
+    Selects the top N highest-scoring segments and stitches them into a new video.
+
+    With `target_duration` (seconds) the reel is built by selection.py instead:
+    the best-scoring clips that fit the budget, short neighbours merged and
+    clip length/gap constraints applied; `top_n` is then ignored.
+
+    The reel (and any scratch files) go to `output_dir`, e.g. a session's
+    workspace.Workspace.outputs_dir; by default they go next to the input.
+    """
+
+    # 1. Select the top N segments based on the score
+    # Filter for segments with a score > 0 and take the top N
+    if target_duration:
+        from selection import select_segments_for_duration
+        segments = select_segments_for_duration(scored_segments_df, target_duration)
+    else:
+        segments = select_top_segments(scored_segments_df, top_n)
+
+    if not segments:
+        print("No segments with a score > 0 were found to generate a highlight reel.")
+        return None
+
+    # 2. Use a safe output path, adjusting for temp directory naming
+    output_directory = output_dir or os.path.dirname(video_path)
+    final_output_path = os.path.join(output_directory, output_filename)
+
+    # 3. Render and report the time taken per mode
+    stats = render_highlight_video(video_path, segments, final_output_path, mode=mode, workers=workers)
+    print(f"Rendered highlight reel in {stats['seconds']}s (mode: {stats['mode']})")
+
+    return stats["path"]
+
+if __name__ == '__main__':
+    # Render a reel from a scored segments CSV (e.g. segments.csv written by batch_cli.py):
+    #     python highlight_generator.py video.mp4 segments.csv [top_n] [mode]
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python highlight_generator.py VIDEO SCORED_SEGMENTS_CSV [TOP_N] [reencode|copy|parallel]")
+        sys.exit(2)
+
+    scored_df = pd.read_csv(sys.argv[2], index_col='Segment')
+    top_n = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    mode = sys.argv[4] if len(sys.argv) > 4 else "reencode"
+    print(generate_highlight_video(sys.argv[1], scored_df, top_n=top_n, mode=mode))
\ No newline at end of file
@@ -0,0 +1,418 @@
+"""
+Local HTTP job service: lets other systems submit videos to the analysis
+pipeline and fetch the results, without going through the Streamlit UI.
+
+    python job_service.py --root /data/vhg_jobs -w 4 --max-queue 16
+
+    POST /jobs                      JSON {"video_path": "/data/in/match.mp4", "top_n": 3, ...}
+    POST /jobs?filename=match.mp4   raw video bytes (streamed into an upload workspace first)
+    GET  /jobs/<id>                 status
+    GET  /jobs/<id>/result          scored segments, timings and warnings
+    GET  /jobs/<id>/reel            highlight reel
+    GET  /health                    queue depth and capacity
+
+Jobs run batch_cli.process_video in a pool of warm worker processes. At most
+workers + max_queue jobs are accepted at once; beyond that POST /jobs answers
+429 with Retry-After. A job's id is derived from the video's content
+fingerprint and its options, and finished jobs are persisted, so submitting
+the same video again returns the stored result immediately (also after a restart).
+Raw uploads are deleted as soon as no queued or running job needs them, so
+the upload quota only bounds the uploads in flight; an upload that does not
+fit is answered with 413 (larger than the quota) or 507 (quota in use).
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from batch_cli import _run_job, append_manifest
+from workspace import Workspace, WorkspaceQuotaError
+
+# Options a submission may set, with their defaults (the keyword arguments of batch_cli.process_video)
+DEFAULT_OPTIONS = {
+    "top_n": 3,
+    "max_frames": 50,
+    "candidate_mode": True,
+    "render_mode": "copy",
+    "render": True,
+    "target_duration": None,
+    "scene_mode": "shared",
+    "scene_downscale": None,
+    "scene_frame_skip": 0,
+    "scene_workers": None,
+}
+
+RESULTS_NAME = "jobs.jsonl"
+
+# Seconds a client told to back off (429) should wait before retrying
+RETRY_AFTER_SECONDS = 5
+
+REEL_CHUNK_BYTES = 1024 * 1024
+
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]+)(/result|/reel)?$")
+
+
+class QueueFullError(Exception):
+    """Raised when the service already holds as many jobs as it accepts."""
+
+
+def job_id_for(fingerprint, options):
+    """Deterministic job id: the same video with the same options is the same job."""
+    key_source = json.dumps({"fingerprint": fingerprint, "options": options}, sort_keys=True)
+    return hashlib.blake2b(key_source.encode(), digest_size=12).hexdigest()
+
+
+def load_jobs(results_path):
+    """
+    Latest record per job id from the result store. Like batch_cli's
+    manifest, but keyed by job, as one video can have jobs with different options.
+    """
+    jobs = {}
+    if not os.path.exists(results_path):
+        return jobs
+    with open(results_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A service killed mid-write can leave a truncated last line
+                continue
+            jobs[record["job_id"]] = record
+    return jobs
+
+
+def _parse_query_value(value):
+    """Query-string option: JSON literals (3, true, null) as such, anything else as a string."""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+class _RequestBody:
+    """File-like view of a request body that stops at Content-Length (for Workspace.ingest)."""
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.size = size
+        self.remaining = size
+
+    def read(self, n=-1):
+        if self.remaining <= 0:
+            return b""
+        chunk = self.stream.read(self.remaining if n < 0 else min(n, self.remaining))
+        self.remaining -= len(chunk)
+        return chunk
+
+
+class JobService:
+    """
+    Job table, worker pool and result store behind the HTTP handler.
+
+    Args:
+        root (str): Holds the result store, job outputs and uploads.
+        workers (int): Worker processes running the pipeline.
+        max_queue (int): Jobs accepted beyond those currently running.
+    """
+
+    def __init__(self, root, workers=2, max_queue=8):
+        from warmup import init_worker
+
+        self.root = os.path.abspath(root)
+        self.outputs_root = os.path.join(self.root, "outputs")
+        self.results_path = os.path.join(self.root, RESULTS_NAME)
+        os.makedirs(self.outputs_root, exist_ok=True)
+        # Uploads get their own workspace root: stale-workspace sweeps must never touch outputs/
+        self.uploads = Workspace("uploads", root=os.path.join(self.root, "uploads"))
+
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._futures = {}
+        # Upload path -> number of queued/running jobs reading it
+        self._upload_users = {}
+
+        # 1. Finished jobs from earlier runs answer duplicate submissions straight away
+        self.jobs = load_jobs(self.results_path)
+
+        # 2. Warm workers, as in batch_cli
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(["scene", "audio", "emotion", "render"],)
+        )
+
+    def submit(self, video_path, options=None):
+        """
+        Queues a job, or returns the existing one for the same video and options.
+
+        Returns:
+            tuple: (job dict, created) where created is False for duplicates.
+
+        Raises:
+            QueueFullError: when capacity jobs are already queued or running.
+            FileNotFoundError, ValueError: for a missing video or unknown options.
+        """
+        from analysis_cache import file_fingerprint, SCENE_MODES
+
+        unknown = set(options or {}) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        options = {**DEFAULT_OPTIONS, **(options or {})}
+        if options["scene_mode"] not in SCENE_MODES:
+            raise ValueError(f"scene_mode must be one of {', '.join(SCENE_MODES)}")
+        video_path = os.path.abspath(video_path)
+        if not os.path.isfile(video_path):
+            raise FileNotFoundError(f"No such video: {video_path}")
+
+        fingerprint = file_fingerprint(video_path)
+        job_id = job_id_for(fingerprint, options)
+
+        with self._lock:
+            existing = self.jobs.get(job_id)
+            # Failed jobs may be retried; everything else is shared
+            if existing is not None and existing["status"] != "failed":
+                return existing, False
+            if self.in_flight >= self.capacity:
+                raise QueueFullError(f"{self.in_flight} jobs queued or running (capacity {self.capacity})")
+
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "video": video_path,
+                "fingerprint": fingerprint,
+                "options": options,
+                "submitted_at": time.time(),
+            }
+            self.jobs[job_id] = job
+            self.in_flight += 1
+            # One output tree per job, so jobs for the same video with other options never collide
+            job_root = os.path.join(self.outputs_root, job_id)
+            future = self.pool.submit(_run_job, video_path, fingerprint, job_root, options)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+        return job, True
+
+    def submit_upload(self, source, filename, options=None):
+        """
+        Stores a raw upload and submits it. The stored file is removed again
+        once no queued or running job uses it (e.g. straight away for a
+        duplicate of a finished job).
+
+        Raises:
+            WorkspaceQuotaError: when the upload does not fit in the upload quota.
+        """
+        self.uploads.touch()
+        video_path = self.uploads.ingest(source, filename)
+        with self._lock:
+            # Counted before submitting, so a job finishing right away cannot delete it under us
+            self._upload_users[video_path] = self._upload_users.get(video_path, 0) + 1
+        created = False
+        try:
+            job, created = self.submit(video_path, options)
+            if created:
+                job["upload"] = video_path
+            return job, created
+        finally:
+            if not created:
+                self._release_upload(video_path)
+
+    def _release_upload(self, video_path):
+        with self._lock:
+            users = self._upload_users.get(video_path, 0) - 1
+            if users > 0:
+                self._upload_users[video_path] = users
+                return
+            self._upload_users.pop(video_path, None)
+            if os.path.exists(video_path):
+                os.remove(video_path)
+
+    def _finish(self, job_id, future):
+        try:
+            record = future.result()
+        except Exception as e:
+            # The worker process itself died (e.g. out of memory)
+            record = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+        with self._lock:
+            job = self.jobs[job_id]
+            job.update(record)
+            job["job_id"] = job_id
+            job["latency_s"] = round(time.time() - job["submitted_at"], 2)
+            self.in_flight -= 1
+            self._futures.pop(job_id, None)
+            upload = job.pop("upload", None)
+            append_manifest(self.results_path, job)
+        if upload:
+            self._release_upload(upload)
+
+    def status(self, job_id):
+        """The job record (with status queued/running/done/failed), or None for unknown ids."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self._futures.get(job_id)
+        if future is not None and future.running():
+            job["status"] = "running"
+        return job
+
+    def health(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "capacity": self.capacity, "workers": self.workers,
+                    "jobs_known": len(self.jobs)}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """Routes the endpoints in the module docstring to the server's JobService."""
+
+    server_version = "VHGJobService/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_summary(self, job):
+        summary = {key: job.get(key) for key in ("job_id", "status", "video", "options", "error", "latency_s")}
+        if job["status"] == "done":
+            summary["result_url"] = f"/jobs/{job['job_id']}/result"
+            if job.get("outputs", {}).get("reel"):
+                summary["reel_url"] = f"/jobs/{job['job_id']}/reel"
+        return summary
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("application/json"):
+                request = json.loads(self.rfile.read(length) or b"{}")
+                video_path = request.pop("video_path", None)
+                if not video_path:
+                    return self._send_json(400, {"error": "video_path is required"})
+                job, created = self.service.submit(video_path, request)
+            else:
+                # Raw upload: options come from the query string
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                filename = query.pop("filename", "upload.mp4")
+                options = {key: _parse_query_value(value) for key, value in query.items()}
+                if length > self.service.uploads.quota_bytes:
+                    return self._send_json(413, {"error": f"Upload of {length} bytes exceeds the upload quota "
+                                                          f"of {self.service.uploads.quota_bytes} bytes"})
+                job, created = self.service.submit_upload(_RequestBody(self.rfile, length), filename, options)
+        except WorkspaceQuotaError as e:
+            # Other uploads in flight hold the space; retrying later can succeed
+            return self._send_json(507, {"error": str(e)}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        except QueueFullError as e:
+            return self._send_json(429, {"error": str(e)}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        except (ValueError, FileNotFoundError) as e:
+            return self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            return self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+        # Duplicates of finished jobs are answered with the stored result at once
+        status = 202 if created or job["status"] not in ("done", "failed") else 200
+        self._send_json(status, self._job_summary(job), {"Location": f"/jobs/{job['job_id']}"})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            return self._send_json(200, self.service.health())
+
+        match = _JOB_PATH.match(path)
+        job = self.service.status(match.group(1)) if match else None
+        if job is None:
+            return self._send_json(404, {"error": "unknown job"})
+
+        action = match.group(2)
+        if action is None:
+            return self._send_json(200, self._job_summary(job))
+        if job["status"] != "done":
+            return self._send_json(409, {"error": f"job is {job['status']}", "status": job["status"]})
+
+        if action == "/result":
+            segments_path = job["outputs"]["segments"]
+            segments = pd.read_csv(segments_path).to_dict(orient="records") if os.path.exists(segments_path) else []
+            return self._send_json(200, {
+                **self._job_summary(job),
+                "segments": segments,
+                "timings": job.get("timings"),
+                "warnings": job.get("warnings"),
+                "telemetry": job.get("telemetry"),
+            })
+
+        reel_path = job["outputs"].get("reel")
+        if not reel_path or not os.path.exists(reel_path):
+            return self._send_json(404, {"error": "no highlight reel for this job"})
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(reel_path)))
+        self.send_header("Content-Disposition", f"attachment; filename={job['job_id']}.mp4")
+        self.end_headers()
+        with open(reel_path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, REEL_CHUNK_BYTES)
+
+
+def make_server(service, host="127.0.0.1", port=8765, quiet=False):
+    """A ThreadingHTTPServer bound to `service`; port 0 picks a free port."""
+    handler = JobRequestHandler
+    if quiet:
+        handler = type("QuietJobRequestHandler", (JobRequestHandler,), {"log_message": lambda self, *args: None})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the highlight pipeline as local HTTP jobs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--root", required=True, help="Directory for the result store, outputs and uploads")
+    parser.add_argument("-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--max-queue", type=int, default=8, help="Jobs accepted beyond the running ones before 429")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
+    args = parser.parse_args(argv)
+
+    service = JobService(args.root, workers=args.workers, max_queue=args.max_queue)
+    server = make_server(service, args.host, args.port, quiet=args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"({args.workers} workers, capacity {service.capacity}, results in {service.results_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,446 @@
+"""
+Live mode: finds highlight candidates in a recording while it is still being
+written, either one growing file (MPEG-TS, MKV or fragmented MP4) or a
+sequence of segment files.
+
+New frames and audio are analyzed once as they arrive. Scene cuts come from
+the same ContentDetector the batch path uses, and the RMS envelope and peaks
+from the same RmsAccumulator and extract_peaks. Segments are then re-scored
+over a sliding window with calculate_highlight_scores. All state is bounded by
+that window, so memory stays flat over multi-hour sessions.
+
+    python live_mode.py /recordings/event.ts
+    python live_mode.py --segments "/recordings/event_*.ts" --max-latency 8
+"""
+import glob
+import bisect
+import json
+import time
+import queue
+import argparse
+import threading
+import subprocess
+from collections import deque
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import telemetry
+from scene_detector import SceneCutConsumer
+from audio_analyzer import RmsAccumulator, extract_peaks, make_audio_peaks, seconds_to_timecode, stream_audio_chunks
+from scorer import calculate_highlight_scores
+
+DEFAULT_WINDOW_SECONDS = 300.0
+DEFAULT_MAX_LATENCY_SECONDS = 10.0
+
+# Same peak definition as get_audio_peaks
+PEAK_THRESHOLD = 0.8
+PEAK_SEPARATION_SECONDS = 1.0
+
+# Decoded chunks buffered between the ffmpeg readers and the analyzer
+QUEUE_CHUNKS = 64
+AUDIO_CHUNK_SECONDS = 0.5
+
+# How often a reader blocked on a full queue checks whether it should stop
+QUEUE_PUT_TIMEOUT_S = 0.5
+
+# Grace period for ffmpeg to exit after terminate() before it is killed
+READER_STOP_TIMEOUT_S = 2.0
+
+
+class LiveAnalyzer:
+    """
+    Incremental counterpart of get_scene_cuts + get_audio_peaks +
+    calculate_highlight_scores.
+
+    Frames and audio are fed as they arrive, and timeline positions continue
+    across calls and files. update() re-scores the segments inside the window
+    and returns the candidates that became final since the last call.
+
+    Args:
+        fps, width, height (float, int, int): Video stream properties.
+        sr (int): Audio sample rate.
+        threshold (int): ContentDetector threshold, as in get_scene_cuts.
+        window_seconds (float): History kept for energy normalization and
+            candidate ranking; older data is dropped.
+        max_latency_s (float): Media seconds between the first audio peak of a
+            segment and its emission. A scene still open by then is split.
+        min_score (float): Minimum Highlight_Score for a candidate to be emitted.
+    """
+
+    def __init__(self, fps, width, height, sr, threshold=27, window_seconds=DEFAULT_WINDOW_SECONDS,
+                 max_latency_s=DEFAULT_MAX_LATENCY_SECONDS, min_score=1, frame_length=2048, hop_length=512):
+        if max_latency_s < PEAK_SEPARATION_SECONDS:
+            raise ValueError(f"max_latency_s must be at least {PEAK_SEPARATION_SECONDS}s (peak confirmation delay)")
+
+        self.fps = float(fps)
+        self.sr = sr
+        self.hop_length = hop_length
+        self.window_seconds = window_seconds
+        self.max_latency_s = max_latency_s
+        self.min_score = min_score
+
+        # 1. Visual state: a scene detector fed with global frame numbers
+        self.scene = SceneCutConsumer(threshold=threshold)
+        self.scene.start({"fps": self.fps, "frame_count": 0, "width": width, "height": height})
+        self.frame_size = self.scene.size or (width, height)
+        self.frames_seen = 0
+
+        # 2. Audio state: the RMS envelope of the window only
+        self.rms_accumulator = RmsAccumulator(frame_length=frame_length, hop_length=hop_length)
+        self.rms = np.zeros(0, dtype=np.float32)
+        self.rms_offset = 0  # global index of self.rms[0]
+        self.max_rms_frames = int(np.ceil(window_seconds * sr / hop_length))
+
+        # 3. Segments: boundary times (seconds) and why each one was placed
+        self.boundaries = deque([0.0])
+        self.boundary_kinds = deque(["start"])
+        self.first_segment_id = 1  # id of the segment starting at boundaries[0]
+        self.finalized_until = 0.0
+        self.finished = False
+
+    @property
+    def video_seconds(self):
+        return self.frames_seen / self.fps
+
+    @property
+    def audio_seconds(self):
+        return self.rms_accumulator.samples_seen / self.sr
+
+    def feed_frame(self, frame):
+        """Analyzes the next video frame (resized to the detection size if needed)."""
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+        self.scene.consume(self.frames_seen, frame)
+        self.frames_seen += 1
+
+    def feed_audio(self, samples):
+        """Adds the next mono float32 samples to the energy envelope."""
+        self._append_rms(self.rms_accumulator.update(samples))
+
+    def _append_rms(self, values):
+        if len(values) == 0:
+            return
+        self.rms = np.concatenate([self.rms, values])
+        excess = len(self.rms) - self.max_rms_frames
+        if excess > 0:
+            self.rms = self.rms[excess:]
+            self.rms_offset += excess
+
+    def _window_peaks(self, confirmed_until):
+        """Peaks in the window, normalized to the window's loudest frame, up to confirmed_until."""
+        max_rms = float(np.max(self.rms)) if len(self.rms) else 0.0
+        if max_rms <= 0:
+            return make_audio_peaks([], [])
+        times, scores = extract_peaks(self.rms / max_rms, self.sr, self.hop_length,
+                                      threshold=PEAK_THRESHOLD, min_separation=PEAK_SEPARATION_SECONDS)
+        times = times + self.rms_offset * self.hop_length / self.sr
+        confirmed = times <= confirmed_until
+        return make_audio_peaks(times[confirmed], scores[confirmed])
+
+    def _add_boundary(self, seconds, kind):
+        # Cuts are reported a few frames late and may land before a latency
+        # split; they are still placed as long as that segment is not final
+        if seconds <= self.finalized_until or seconds in self.boundaries:
+            return
+        position = bisect.bisect_left(self.boundaries, seconds)
+        self.boundaries.insert(position, seconds)
+        self.boundary_kinds.insert(position, kind)
+
+    def update(self, final=False):
+        """
+        Incorporates everything fed so far and returns new candidates, oldest
+        first. Pass final=True once the recording has ended to close the last
+        segment.
+
+        Returns:
+            list: Candidate dicts with segment, start/end seconds and
+            timecodes, score, audio_peaks, window_rank and closed_by.
+        """
+        if self.finished:
+            return []
+
+        # 1. New scene cuts become segment boundaries (consumed cuts are dropped)
+        if final and self.scene.last_frame is not None:
+            self.scene.finish()
+            self.finished = True
+        for cut in sorted(self.scene.cuts):
+            self._add_boundary(cut / self.fps, "cut")
+        self.scene.cuts.clear()
+
+        # 2. Peaks need PEAK_SEPARATION_SECONDS of look-ahead before they are final
+        now = min(self.video_seconds, self.audio_seconds)
+        if final:
+            self._append_rms(self.rms_accumulator.finish())
+            now = max(self.video_seconds, self.audio_seconds)
+            self.finished = True
+        confirmed_until = now if final else self.audio_seconds - PEAK_SEPARATION_SECONDS
+        peaks = self._window_peaks(confirmed_until)
+
+        # 3. Latency bound: split a still-open scene once its first peak is old enough
+        open_peaks = peaks.time_seconds[peaks.time_seconds > self.boundaries[-1]]
+        if len(open_peaks) and now - open_peaks[0] >= self.max_latency_s - PEAK_SEPARATION_SECONDS:
+            self._add_boundary(now, "latency")
+        if final:
+            self._add_boundary(now, "end")
+
+        if len(self.boundaries) < 2:
+            return []
+
+        # 4. Re-score every closed segment in the window
+        segment_ids = range(self.first_segment_id, self.first_segment_id + len(self.boundaries) - 1)
+        starts = list(self.boundaries)[:-1]
+        ends = list(self.boundaries)[1:]
+        segments_df = pd.DataFrame({
+            "Segment": segment_ids,
+            "Start_Time": [seconds_to_timecode(t) for t in starts],
+            "End_Time": [seconds_to_timecode(t) for t in ends],
+        }).set_index("Segment")
+        scored_df = calculate_highlight_scores(segments_df, peaks, {})
+        ranks = {segment_id: rank for rank, segment_id in enumerate(scored_df.index, start=1)}
+
+        # 5. Emit segments whose peaks are all confirmed, in time order
+        candidates = []
+        kinds = list(self.boundary_kinds)
+        for i, segment_id in enumerate(segment_ids):
+            if ends[i] <= self.finalized_until or ends[i] > confirmed_until:
+                continue
+            self.finalized_until = ends[i]
+            row = scored_df.loc[segment_id]
+            if row["Highlight_Score"] < self.min_score:
+                continue
+            candidates.append({
+                "segment": int(segment_id),
+                "start_seconds": round(starts[i], 3),
+                "end_seconds": round(ends[i], 3),
+                "start_time": row["Start_Time"],
+                "end_time": row["End_Time"],
+                "score": float(row["Highlight_Score"]),
+                "audio_peaks": int(row["Audio_Peaks"]),
+                "window_rank": ranks[segment_id],
+                "closed_by": kinds[i + 1],
+            })
+
+        # 6. Forget segments that are both final and outside the window
+        window_start = max(self.video_seconds, self.audio_seconds) - self.window_seconds
+        while len(self.boundaries) > 1 and self.boundaries[1] <= min(window_start, self.finalized_until):
+            self.boundaries.popleft()
+            self.boundary_kinds.popleft()
+            self.first_segment_id += 1
+
+        return candidates
+
+
+# --- Sources: ffmpeg readers feeding a LiveAnalyzer ---
+
+def _follow_options(follow, idle_timeout):
+    """ffmpeg input options that keep reading a growing file until it stops growing for idle_timeout seconds."""
+    if not follow:
+        return []
+    return ["-follow", "1", "-rw_timeout", str(int(idle_timeout * 1e6))]
+
+
+def _put(out_queue, item, stop):
+    """Queues `item`, giving up once `stop` is set. Returns False if it gave up."""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=QUEUE_PUT_TIMEOUT_S)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _stop_process(process):
+    """Terminates an ffmpeg reader, killing it if it does not exit in time."""
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=READER_STOP_TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _read_video(path, frame_size, input_options, out_queue, stop, processes):
+    """Reader thread: decodes frames at the detection size and queues them until `stop` is set."""
+    width, height = frame_size
+    args = ["ffmpeg", "-nostdin", "-v", "error", *input_options, "-i", path, "-an",
+            "-vf", f"scale={width}:{height}:flags=area", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+    frame_bytes = width * height * 3
+    try:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        processes.append(process)
+        try:
+            while True:
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                if not _put(out_queue, ("video", np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)), stop):
+                    return
+        finally:
+            process.kill()
+            process.wait()
+        _put(out_queue, ("video", None), stop)
+    except Exception as e:
+        _put(out_queue, ("error", e), stop)
+
+
+def _read_audio(path, sr, channels, input_options, out_queue, stop, processes):
+    """Reader thread: queues mono float32 audio chunks until `stop` is set."""
+    chunks = stream_audio_chunks(path, sr, channels, AUDIO_CHUNK_SECONDS, input_options=input_options, processes=processes)
+    try:
+        for samples in chunks:
+            if not _put(out_queue, ("audio", samples), stop):
+                return
+        _put(out_queue, ("audio", None), stop)
+    except Exception as e:
+        _put(out_queue, ("error", e), stop)
+    finally:
+        # Kills ffmpeg when the loop is left early
+        chunks.close()
+
+
+def _drain(analyzer, path, sr, channels, follow, idle_timeout, update_interval):
+    """
+    Feeds one input to the analyzer, yielding candidates every update_interval seconds.
+
+    When the consumer stops early (an error, or the generator being closed),
+    the readers are told to stop and both ffmpeg processes are terminated.
+    """
+    input_options = _follow_options(follow, idle_timeout)
+    chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+    stop = threading.Event()
+    processes = []
+    readers = [
+        threading.Thread(target=_read_video, args=(path, analyzer.frame_size, input_options, chunks, stop, processes),
+                         daemon=True),
+        threading.Thread(target=_read_audio, args=(path, sr, channels, input_options, chunks, stop, processes),
+                         daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    try:
+        finished = 0
+        last_update = time.monotonic()
+        while finished < len(readers):
+            try:
+                kind, item = chunks.get(timeout=update_interval)
+            except queue.Empty:
+                kind, item = None, None
+
+            if kind == "error":
+                raise item
+            if kind is not None and item is None:
+                finished += 1
+            elif kind == "video":
+                analyzer.feed_frame(item)
+                telemetry.add("frames_decoded")
+            elif kind == "audio":
+                analyzer.feed_audio(item)
+                telemetry.add("audio_samples", len(item))
+
+            if time.monotonic() - last_update >= update_interval:
+                yield from analyzer.update()
+                last_update = time.monotonic()
+
+        yield from analyzer.update()
+    finally:
+        stop.set()
+        for process in list(processes):
+            _stop_process(process)
+        for reader in readers:
+            reader.join(timeout=READER_STOP_TIMEOUT_S)
+
+
+def _open_analyzer(path, idle_timeout, analyzer_options):
+    """Waits until ffprobe can read the stream headers, then builds the analyzer."""
+    from highlight_generator import probe_streams
+
+    deadline = time.monotonic() + idle_timeout
+    while True:
+        try:
+            video, audio = probe_streams(path)
+            if video is not None and audio is not None:
+                break
+        except subprocess.CalledProcessError:
+            pass  # not enough of the file written yet
+        if time.monotonic() > deadline:
+            raise ValueError(f"No readable video and audio streams in {path}")
+        time.sleep(0.5)
+
+    numerator, denominator = video.get("r_frame_rate", "25/1").split("/")
+    analyzer = LiveAnalyzer(
+        fps=float(numerator) / float(denominator or 1), width=int(video["width"]), height=int(video["height"]),
+        sr=int(audio["sample_rate"]), **analyzer_options
+    )
+    return analyzer, int(audio["sample_rate"]), int(audio["channels"])
+
+
+def follow_recording(path, update_interval=1.0, idle_timeout=10.0, **analyzer_options):
+    """
+    Yields highlight candidates from a file that is still being written.
+    Stops once the file has not grown for `idle_timeout` seconds.
+
+    `analyzer_options` are passed to LiveAnalyzer (window_seconds,
+    max_latency_s, min_score, threshold).
+    """
+    with telemetry.span("live", source=path):
+        analyzer, sr, channels = _open_analyzer(path, idle_timeout, analyzer_options)
+        yield from _drain(analyzer, path, sr, channels, True, idle_timeout, update_interval)
+        yield from analyzer.update(final=True)
+
+
+def follow_segments(pattern, update_interval=1.0, idle_timeout=30.0, **analyzer_options):
+    """
+    Yields highlight candidates from segment files matching a glob pattern,
+    processed in name order as they appear. A segment is read once a newer
+    one exists, and the last one once no new segment has appeared for
+    `idle_timeout` seconds, which also ends the session.
+    """
+    with telemetry.span("live", source=pattern):
+        analyzer = None
+        processed = set()
+        last_new_segment = time.monotonic()
+        while True:
+            # 1. Segments that are complete (a newer one exists, or the stream went idle)
+            segments = sorted(path for path in glob.glob(pattern) if path not in processed)
+            idle = time.monotonic() - last_new_segment >= idle_timeout
+            ready = segments if idle else segments[:-1]
+            if not ready:
+                if idle:
+                    break
+                time.sleep(update_interval)
+                continue
+
+            # 2. Timeline positions carry over from one segment to the next
+            for path in ready:
+                if analyzer is None:
+                    analyzer, sr, channels = _open_analyzer(path, idle_timeout, analyzer_options)
+                yield from _drain(analyzer, path, sr, channels, False, idle_timeout, update_interval)
+                processed.add(path)
+                last_new_segment = time.monotonic()
+
+        if analyzer is not None:
+            yield from analyzer.update(final=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Emit highlight candidates from a live recording.")
+    parser.add_argument("source", help="Growing recording file, or a glob pattern with --segments")
+    parser.add_argument("--segments", action="store_true", help="Treat source as a glob of segment files")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW_SECONDS, help="Sliding window in seconds")
+    parser.add_argument("--max-latency", type=float, default=DEFAULT_MAX_LATENCY_SECONDS,
+                        help="Media seconds between a segment's first peak and its emission")
+    parser.add_argument("--min-score", type=float, default=1)
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Seconds without new data that end the session")
+    args = parser.parse_args()
+
+    options = {"window_seconds": args.window, "max_latency_s": args.max_latency, "min_score": args.min_score}
+    if args.idle_timeout is not None:
+        options["idle_timeout"] = args.idle_timeout
+    follow = follow_segments if args.segments else follow_recording
+    for candidate in follow(args.source, **options):
+        print(json.dumps(candidate), flush=True)
@@ -0,0 +1,332 @@
+"""
+Multi-variant highlight rendering from a single decode.
+
+Publishing one highlight as several reels (different top_n or durations, a
+9:16 vertical crop, a low-bitrate preview) used to take one
+generate_highlight_video call per variant, each decoding the same segments
+again. render_variants decodes the union of every variant's source ranges
+once with OpenCV and fans the frames out to one ffmpeg encoder per variant;
+the encoders scale/crop and compress in parallel.
+
+    specs = [VariantSpec("full", top_n=3),
+             VariantSpec("vertical", target_duration=30, crop="9:16", height=1280),
+             VariantSpec("preview", top_n=3, height=360, video_bitrate="400k", container="webm")]
+    result = render_variants("match.mp4", scored_df, specs, output_dir="reels")
+
+Clips are joined in chronological order. Audio is cut from the source by
+each encoder (atrim + concat), which only decodes the audio stream.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import tempfile
+import threading
+import subprocess
+
+import cv2
+
+import telemetry
+from highlight_generator import probe_streams, select_top_segments
+from selection import select_segments_for_duration
+
+# Video/audio encoders per output container
+CONTAINER_CODECS = {
+    "mp4": ("libx264", "aac"),
+    "mov": ("libx264", "aac"),
+    "mkv": ("libx264", "aac"),
+    "webm": ("libvpx-vp9", "libopus"),
+}
+
+# Frames buffered per encoder; the decoder waits for the slowest encoder beyond this
+FRAME_QUEUE_SIZE = 32
+
+# Forward gaps shorter than this many seconds are skipped with grab() instead of a seek
+MAX_GRAB_GAP_SECONDS = 2.0
+
+
+class VariantSpec:
+    """
+    One output reel.
+
+    Args:
+        name (str): Variant name; also the output file stem.
+        top_n (int): Take the top N segments (as generate_highlight_video does).
+        target_duration (float): Use selection.py with this budget instead of top_n.
+        segments (list): Explicit (start_s, end_s) list, overriding both.
+        width, height (int): Output size. Give one to keep the aspect ratio.
+        crop (str): Centre crop to an aspect ratio such as "9:16" before scaling.
+        video_bitrate (str): e.g. "400k"; default is constant quality (CRF).
+        audio_bitrate (str): e.g. "96k".
+        container (str): One of CONTAINER_CODECS.
+    """
+
+    def __init__(self, name, top_n=3, target_duration=None, segments=None, width=None, height=None,
+                 crop=None, video_bitrate=None, audio_bitrate="128k", container="mp4"):
+        if container not in CONTAINER_CODECS:
+            raise ValueError(f"Unsupported container '{container}' for variant '{name}'")
+        self.name = name
+        self.top_n = top_n
+        self.target_duration = target_duration
+        self.segments = segments
+        self.width = width
+        self.height = height
+        self.crop = crop
+        self.video_bitrate = video_bitrate
+        self.audio_bitrate = audio_bitrate
+        self.container = container
+
+    def select(self, scored_segments_df):
+        """Returns this variant's (start_s, end_s) clips in chronological order."""
+        if self.segments is not None:
+            segments = list(self.segments)
+        elif self.target_duration:
+            segments = select_segments_for_duration(scored_segments_df, self.target_duration)
+        else:
+            segments = select_top_segments(scored_segments_df, self.top_n)
+        return sorted(segments)
+
+
+def merge_ranges(ranges):
+    """Union of (start, end) frame ranges as a sorted list of disjoint ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def _video_filter(spec, width, height):
+    """ffmpeg filter chain turning raw source frames into this variant's picture."""
+    filters = []
+    if spec.crop:
+        aspect_w, aspect_h = map(float, spec.crop.split(":"))
+        crop_w = min(width, int(height * aspect_w / aspect_h)) // 2 * 2
+        crop_h = min(height, int(width * aspect_h / aspect_w)) // 2 * 2
+        filters.append(f"crop={crop_w}:{crop_h}")
+    if spec.width or spec.height:
+        # -2 keeps the aspect ratio with an even dimension, as libx264 requires
+        filters.append(f"scale={spec.width or -2}:{spec.height or -2}")
+    filters.append("format=yuv420p")
+    return ",".join(filters)
+
+
+def _encoder_command(video_path, spec, clips, fps, width, height, has_audio, output_path):
+    """ffmpeg reading BGR frames on stdin (input 0) and the source's audio (input 1)."""
+    video_codec, audio_codec = CONTAINER_CODECS[spec.container]
+    command = [
+        "ffmpeg", "-nostdin", "-v", "error", "-y",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps:.6f}", "-i", "pipe:0",
+    ]
+
+    filter_graph = f"[0:v]{_video_filter(spec, width, height)}[vout]"
+    maps = ["-map", "[vout]"]
+    if has_audio:
+        command += ["-i", video_path]
+        # Frame-aligned cuts, so audio stays in sync with the piped frames
+        trims = "".join(
+            f"[1:a]atrim=start={start / fps:.6f}:end={end / fps:.6f},asetpts=PTS-STARTPTS[a{i}];"
+            for i, (start, end) in enumerate(clips)
+        )
+        inputs = "".join(f"[a{i}]" for i in range(len(clips)))
+        filter_graph += f";{trims}{inputs}concat=n={len(clips)}:v=0:a=1[aout]"
+        maps += ["-map", "[aout]", "-c:a", audio_codec, "-b:a", spec.audio_bitrate]
+
+    command += ["-filter_complex", filter_graph] + maps + ["-c:v", video_codec]
+    if spec.video_bitrate:
+        command += ["-b:v", spec.video_bitrate]
+    elif video_codec == "libvpx-vp9":
+        command += ["-crf", "33", "-b:v", "0"]
+    else:
+        command += ["-crf", "23", "-preset", "veryfast"]
+    if spec.container in ("mp4", "mov"):
+        command += ["-movflags", "+faststart"]
+    return command + [output_path]
+
+
+class _Encoder:
+    """An ffmpeg process plus the thread feeding its stdin from a bounded queue."""
+
+    def __init__(self, spec, clips, fps, command, output_path, started):
+        self.spec = spec
+        self.clips = clips
+        self.fps = fps
+        self.output_path = output_path
+        self.started = started
+        self.frames = 0
+        self.error = None
+        self.seconds = None
+        self.next_clip = 0
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+        self.frames_queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+        self.thread = threading.Thread(target=self._write, name=f"vhg-encode-{spec.name}", daemon=True)
+        self.thread.start()
+
+    def wants(self, frame_num):
+        """True if the frame falls in one of this variant's clips (frames arrive in order)."""
+        while self.next_clip < len(self.clips) and frame_num >= self.clips[self.next_clip][1]:
+            self.next_clip += 1
+        return self.next_clip < len(self.clips) and frame_num >= self.clips[self.next_clip][0]
+
+    def put(self, frame):
+        """Queues a frame for the encoder; it is written later, so it must not be modified afterwards."""
+        if self.error is None:
+            self.frames_queue.put(frame)
+
+    def _write(self):
+        while True:
+            frame = self.frames_queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # keep draining so the decoder never blocks on a dead encoder
+            try:
+                self.process.stdin.write(frame.data)
+                self.frames += 1
+            except (BrokenPipeError, OSError) as e:
+                self.error = f"encoder stopped: {e}"
+
+    def close(self):
+        """Flushes the queue, waits for ffmpeg and returns this variant's result."""
+        self.frames_queue.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        returncode = self.process.wait()
+        self.seconds = round(time.perf_counter() - self.started, 2)
+        if returncode != 0:
+            self.stderr.seek(0)
+            message = self.stderr.read().decode(errors="replace").strip().splitlines()
+            self.error = message[-1] if message else f"ffmpeg exited with status {returncode}"
+        self.stderr.close()
+        return {
+            "path": self.output_path if self.error is None else None,
+            "seconds": self.seconds,
+            "frames": self.frames,
+            "segments": len(self.clips),
+            "output_seconds": round(sum(end - start for start, end in self.clips) / self.fps, 3),
+            "error": self.error,
+        }
+
+
+@telemetry.traced("render_variants")
+def render_variants(video_path, scored_segments_df, specs, output_dir=None):
+    """
+    Renders every VariantSpec from one sequential decode of the source.
+
+    Args:
+        video_path (str): Source video.
+        scored_segments_df (pd.DataFrame): Output of scorer.calculate_highlight_scores.
+        specs (list): VariantSpec instances (names must be unique).
+        output_dir (str): Where the reels go (default: next to the input).
+
+    Returns:
+        dict: "variants" maps each name to its path (None on failure), encode
+        seconds, frames, segments, output_seconds and error; plus the shared
+        "decode_seconds", "frames_decoded" and total "seconds".
+    """
+    start = time.perf_counter()
+    output_dir = output_dir or os.path.dirname(video_path)
+    os.makedirs(output_dir, exist_ok=True)
+    if len({spec.name for spec in specs}) != len(specs):
+        raise ValueError("Variant names must be unique")
+
+    # 1. Source properties; audio is optional
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Failed to open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    try:
+        has_audio = probe_streams(video_path)[1] is not None
+    except (OSError, subprocess.CalledProcessError):
+        has_audio = False
+
+    # 2. Each variant's clips as frame ranges, and the union every decode must cover
+    results = {}
+    encoders = []
+    for spec in specs:
+        clips = [(int(round(s * fps)), int(round(e * fps))) for s, e in spec.select(scored_segments_df)]
+        clips = merge_ranges([clip for clip in clips if clip[1] > clip[0]])
+        if not clips:
+            results[spec.name] = {"path": None, "seconds": 0.0, "frames": 0, "segments": 0,
+                                  "output_seconds": 0.0, "error": "no segments selected"}
+            continue
+        output_path = os.path.join(output_dir, f"{spec.name}.{spec.container}")
+        command = _encoder_command(video_path, spec, clips, fps, width, height, has_audio, output_path)
+        encoders.append(_Encoder(spec, clips, fps, command, output_path, time.perf_counter()))
+    ranges = merge_ranges([clip for encoder in encoders for clip in encoder.clips])
+    total_frames = sum(end - begin for begin, end in ranges)
+
+    # 3. One sequential pass over the union: short gaps are grabbed, long ones seeked
+    frames_decoded = 0
+    position = 0
+    decode_start = time.perf_counter()
+    try:
+        for range_start, range_end in ranges:
+            if range_start - position > MAX_GRAB_GAP_SECONDS * fps:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, range_start)
+            else:
+                while position < range_start and cap.grab():
+                    position += 1
+            position = range_start
+            while position < range_end:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                wanting = [encoder for encoder in encoders if encoder.wants(position)]
+                if wanting:
+                    # The encoders write asynchronously while decoding continues, and the
+                    # decoder may reuse its buffer: one copy, shared by every variant
+                    frame = frame.copy()
+                for encoder in wanting:
+                    encoder.put(frame)
+                position += 1
+                frames_decoded += 1
+                if frames_decoded % 50 == 0:
+                    telemetry.progress(frames_decoded, total_frames)
+    finally:
+        cap.release()
+        decode_seconds = round(time.perf_counter() - decode_start, 2)
+        # 4. Let every encoder finish, even if decoding failed part-way
+        for encoder in encoders:
+            results[encoder.spec.name] = encoder.close()
+
+    telemetry.add("frames_decoded", frames_decoded)
+    telemetry.add("variants", len(specs))
+    telemetry.progress(frames_decoded, frames_decoded)
+    for name, result in results.items():
+        if result["error"]:
+            print(f"Variant '{name}' failed: {result['error']}")
+
+    return {
+        "variants": {spec.name: results[spec.name] for spec in specs},
+        "decode_seconds": decode_seconds,
+        "frames_decoded": frames_decoded,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == '__main__':
+    # Render several reels from a scored segments CSV (e.g. segments.csv written by batch_cli.py):
+    #     python multi_render.py video.mp4 segments.csv variants.json [output_dir]
+    # variants.json holds a list of VariantSpec keyword arguments, e.g.
+    #     [{"name": "full", "top_n": 3}, {"name": "vertical", "crop": "9:16", "height": 1280}]
+    import pandas as pd
+
+    if len(sys.argv) < 4:
+        print("Usage: python multi_render.py VIDEO SCORED_SEGMENTS_CSV VARIANTS_JSON [OUTPUT_DIR]")
+        sys.exit(2)
+
+    scored_df = pd.read_csv(sys.argv[2], index_col='Segment')
+    with open(sys.argv[3]) as f:
+        variant_specs = [VariantSpec(**options) for options in json.load(f)]
+    print(json.dumps(render_variants(sys.argv[1], scored_df, variant_specs,
+                                     output_dir=sys.argv[4] if len(sys.argv) > 4 else None), indent=2))
@@ -0,0 +1,174 @@
+import time
+import telemetry
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StageError(Exception):
+    """Raised by run_pipeline with the name of the stage that failed or timed out."""
+
+    def __init__(self, stage, cause):
+        self.stage = stage
+        self.cause = cause
+        super().__init__(f"Stage '{stage}' failed: {cause!r}")
+
+
+class Stage:
+    """
+    One unit of work in the pipeline.
+
+    Args:
+        name (str): Unique stage name; also the key of its result.
+        fn (callable): Called with the results of `deps`, in order.
+        deps (list): Names of stages that must finish first.
+        executor (str): "thread" for work that releases the GIL (OpenCV
+            decoding, ffmpeg pipes, numpy) or "process" for GIL-bound Python
+            work. Process stages need a picklable, module-level `fn`.
+        timeout (float): Seconds the stage may run before the pipeline fails.
+    """
+
+    def __init__(self, name, fn, deps=(), executor="thread", timeout=None):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor '{executor}' for stage '{name}'")
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.executor = executor
+        self.timeout = timeout
+
+
+def _check_graph(stages):
+    """Rejects duplicate names, unknown dependencies and cycles."""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate stage name '{stage.name}'")
+        by_name[stage.name] = stage
+
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    # Kahn's algorithm: every stage must become ready at some point
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def _run_stage(stage_span, fn, *args):
+    """Thread-pool task: runs fn with its stage span current, so analyzers report into it."""
+    with telemetry.activated(stage_span):
+        return fn(*args)
+
+
+def run_pipeline(stages, progress_callback=None, poll_interval=0.2):
+    """
+    Runs stages concurrently as soon as their dependencies are done, so the
+    total latency approaches the slowest chain instead of the sum of stages.
+
+    Each stage runs in a telemetry span, a child of the caller's current span,
+    and the analyzers it calls report their counters and progress into it.
+
+    `progress_callback(event)` is always invoked from the calling thread (safe
+    for Streamlit) with a dict holding stage, status ("started", "progress",
+    "finished", "failed"), completed, total, elapsed seconds, the stage's own
+    progress fraction and the overall fraction across all stages. "progress"
+    events are sent while a thread stage's reported progress changes; process
+    stages only report start and finish.
+
+    Returns:
+        tuple: (results dict by stage name, timings dict of seconds by stage name)
+
+    Raises:
+        StageError: for the first stage that raises or exceeds its timeout.
+    """
+    _check_graph(stages)
+
+    thread_pool = ThreadPoolExecutor(max_workers=max(1, len(stages)))
+    process_pool = None
+    if any(stage.executor == "process" for stage in stages):
+        process_pool = ProcessPoolExecutor(max_workers=sum(stage.executor == "process" for stage in stages))
+
+    results = {}
+    timings = {}
+    running = {}  # future -> (stage, start time)
+    pending = list(stages)
+    parent_span = telemetry.current_span()
+    stage_spans = {}
+    last_reported = {}
+    pipeline_start = time.perf_counter()
+
+    def overall_progress():
+        return sum(stage_spans[s.name].progress if s.name in stage_spans else 0.0 for s in stages) / len(stages)
+
+    def notify(stage, status):
+        if progress_callback is not None:
+            stage_span = stage_spans.get(stage.name)
+            progress_callback({
+                "stage": stage.name,
+                "status": status,
+                "completed": len(results),
+                "total": len(stages),
+                "elapsed": time.perf_counter() - pipeline_start,
+                "stage_progress": stage_span.progress if stage_span is not None else 0.0,
+                "progress": overall_progress(),
+            })
+
+    try:
+        while pending or running:
+            # 1. Submit every stage whose dependencies have all finished
+            for stage in [s for s in pending if all(dep in results for dep in s.deps)]:
+                args = [results[dep] for dep in stage.deps]
+                stage_span = telemetry.Span(stage.name, parent=parent_span, executor=stage.executor)
+                stage_spans[stage.name] = stage_span
+                if stage.executor == "process":
+                    future = process_pool.submit(stage.fn, *args)
+                else:
+                    future = thread_pool.submit(_run_stage, stage_span, stage.fn, *args)
+                running[future] = (stage, time.perf_counter())
+                pending.remove(stage)
+                notify(stage, "started")
+
+            # 2. Wait for something to finish (or for the next timeout check)
+            done, _ = wait(list(running), timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, started = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    stage_spans[stage.name].finish(error=e)
+                    notify(stage, "failed")
+                    raise StageError(stage.name, e) from e
+                timings[stage.name] = time.perf_counter() - started
+                stage_spans[stage.name].finish()
+                notify(stage, "finished")
+
+            # 3. Report progress of the stages still running
+            for stage, _ in running.values():
+                fraction = round(stage_spans[stage.name].progress, 3)
+                if fraction != last_reported.get(stage.name):
+                    last_reported[stage.name] = fraction
+                    notify(stage, "progress")
+
+            # 4. Enforce per-stage timeouts
+            now = time.perf_counter()
+            for future, (stage, started) in running.items():
+                if stage.timeout is not None and now - started > stage.timeout:
+                    error = TimeoutError(f"exceeded {stage.timeout}s")
+                    stage_spans[stage.name].finish(error=error)
+                    notify(stage, "failed")
+                    raise StageError(stage.name, error)
+    finally:
+        # Do not block on stages that are still running after a failure
+        thread_pool.shutdown(wait=not running, cancel_futures=True)
+        if process_pool is not None:
+            process_pool.shutdown(wait=not running, cancel_futures=True)
+
+    return results, timings
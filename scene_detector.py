@@ -1,44 +1,301 @@
-from scenedetect import ContentDetector, open_video, SceneManager
-import pandas as pd
-import tempfile
-import os
-
-def get_scene_cuts(video_path):
-    """Detects scene cuts using the ContentDetector and returns a DataFrame of timecodes."""
-    
-    # 1. Prepare for detection
-    # Note: We don't strictly need a stats file for this demo, but it's good practice.
-    
-    # 2. Open the video and set up the manager
-    try:
-        video = open_video(video_path)
-        scene_manager = SceneManager(stats_manager=None)
-    except Exception as e:
-        return pd.DataFrame([{"Error": f"Failed to open video: {e}"}])
-
-    # 3. Add the ContentDetector (detects sudden changes in content/pixels)
-    # Threshold 27 is a good starting point for fast cuts.
-    scene_manager.add_detector(ContentDetector(threshold=27))
-
-    # 4. Process the video
-    # show_progress=True makes it display a progress bar in the terminal during detection
-    scene_manager.detect_scenes(video, show_progress=True)
-    scene_list = scene_manager.get_scene_list()
-
-    # 5. Convert scene list to a structured format (list of dicts)
-    data = []
-    for i, scene in enumerate(scene_list):
-        data.append({
-            "Segment": i + 1,
-            "Start_Time": str(scene[0].get_timecode()),
-            "End_Time": str(scene[1].get_timecode())
-        })
-
-    # 6. Return the data as a table (Pandas DataFrame)
-    return pd.DataFrame(data).set_index("Segment")
-
-# You can remove or comment out this block later, it's just for testing this file independently.
-if __name__ == '__main__':
-    # You would need to put a real video path here to test this file alone
-    # print(get_scene_cuts("path/to/your/video.mp4"))
+import pandas as pd
+import tempfile
+import os
+import json
+import time
+import cv2
+from concurrent.futures import ProcessPoolExecutor
+from frame_source import FrameConsumer, run_frame_source, get_video_info
+from scorer import times_to_seconds
+import telemetry
+
+def scene_list_to_df(scene_list):
+    """Converts a PySceneDetect scene list into the Segment/Start_Time/End_Time table."""
+    data = []
+    for i, scene in enumerate(scene_list):
+        data.append({
+            "Segment": i + 1,
+            "Start_Time": str(scene[0].get_timecode()),
+            "End_Time": str(scene[1].get_timecode())
+        })
+
+    if not data:
+        return pd.DataFrame(columns=["Segment", "Start_Time", "End_Time"]).set_index("Segment")
+    return pd.DataFrame(data).set_index("Segment")
+
+@telemetry.traced("scene_cuts")
+def get_scene_cuts(video_path, threshold=27):
+    """Detects scene cuts using the ContentDetector and returns a DataFrame of timecodes."""
+    # PySceneDetect is imported on first use to keep module import cheap (see warmup.py)
+    from scenedetect import ContentDetector, open_video, SceneManager
+    
+    # 1. Prepare for detection
+    # Note: We don't strictly need a stats file for this demo, but it's good practice.
+    
+    # 2. Open the video and set up the manager
+    try:
+        video = open_video(video_path)
+        scene_manager = SceneManager(stats_manager=None)
+    except Exception as e:
+        return pd.DataFrame([{"Error": f"Failed to open video: {e}"}])
+
+    # 3. Add the ContentDetector (detects sudden changes in content/pixels)
+    # Threshold 27 is a good starting point for fast cuts.
+    scene_manager.add_detector(ContentDetector(threshold=threshold))
+
+    # 4. Process the video
+    # show_progress=True makes it display a progress bar in the terminal during detection
+    scene_manager.detect_scenes(video, show_progress=True)
+    scene_list = scene_manager.get_scene_list()
+    telemetry.add("frames_decoded", video.frame_number)
+
+    # 5. Convert scene list to a structured format and return it as a table (Pandas DataFrame)
+    return scene_list_to_df(scene_list)
+
+
+def cuts_to_scene_df(cuts, first_frame, end_frame, fps):
+    """
+    Builds the scene table from cut frame numbers, pairing boundaries the same
+    way SceneManager.get_scene_list does (no cuts -> no scenes).
+    """
+    from scenedetect import FrameTimecode
+
+    if not cuts:
+        return scene_list_to_df([])
+
+    boundaries = [first_frame] + sorted(cuts) + [end_frame]
+    scene_list = [
+        (FrameTimecode(start, fps), FrameTimecode(end, fps))
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+    ]
+    return scene_list_to_df(scene_list)
+
+
+def _frame_numbers(cuts):
+    """Detector results may be ints or FrameTimecodes depending on the PySceneDetect version."""
+    return [cut if isinstance(cut, int) else cut.get_frames() for cut in cuts or []]
+
+
+class SceneCutConsumer(FrameConsumer):
+    """
+    Runs the ContentDetector on frames supplied by frame_source.run_frame_source,
+    so scene detection can share one decode with the other frame analyzers.
+
+    `downscale` is an integer reduction factor (None matches PySceneDetect's
+    automatic choice) and `frame_skip` skips that many frames between the
+    frames that are compared, trading accuracy for speed.
+    """
+
+    # PySceneDetect downscales frames to roughly this width before detection
+    MIN_DETECTION_WIDTH = 256
+
+    def __init__(self, threshold=27, min_scene_len=15, downscale=None, frame_skip=0):
+        self.threshold = threshold
+        self.min_scene_len = min_scene_len
+        self.downscale = downscale
+        self.stride = frame_skip + 1
+        self.cuts = []
+
+    def start(self, video_info):
+        from scenedetect import ContentDetector, FrameTimecode
+
+        self.fps = video_info["fps"]
+        self.frame_count = video_info["frame_count"]
+        self.timecode = FrameTimecode
+        self.detector = ContentDetector(threshold=self.threshold, min_scene_len=self.min_scene_len)
+        self.first_frame = None
+        self.last_frame = None
+
+        # Match SceneManager's automatic downscaling unless a factor is given
+        width, height = video_info["width"], video_info["height"]
+        factor = self.downscale
+        if factor is None:
+            factor = max(1, width // self.MIN_DETECTION_WIDTH)
+        if factor > 1 and width and height:
+            self.size = (width // factor, height // factor)
+
+    def consume(self, frame_num, frame):
+        if self.first_frame is None:
+            self.first_frame = frame_num
+        self.last_frame = frame_num
+        # Newer PySceneDetect releases expect a FrameTimecode rather than an int
+        cuts = self.detector.process_frame(self.timecode(frame_num, self.fps), frame)
+        self.cuts.extend(_frame_numbers(cuts))
+
+    def finish(self):
+        if self.last_frame is None:
+            return scene_list_to_df([])
+
+        self.cuts.extend(_frame_numbers(self.detector.post_process(self.timecode(self.last_frame, self.fps))))
+        telemetry.add("scene_frames", self.last_frame - self.first_frame + 1)
+        # With frame_skip the frames after the last compared one still belong to the last scene
+        end_frame = self.last_frame + self.stride
+        if self.frame_count > 0:
+            end_frame = min(end_frame, self.frame_count)
+        return cuts_to_scene_df(self.cuts, self.first_frame, end_frame, self.fps)
+
+
+# --- Fast (chunk-parallel / downscaled) scene detection ---
+
+def _detect_chunk_cuts(video_path, chunk_start, chunk_end, threshold, min_scene_len, downscale, frame_skip):
+    """
+    Worker: detects cuts in frames [chunk_start, chunk_end).
+
+    Decoding starts min_scene_len + 1 compared frames earlier, so the detector
+    has a previous frame to compare against and the same min_scene_len history
+    it would have in a single pass. Cuts inside that overlap belong to the
+    previous chunk and are dropped.
+    """
+    stride = frame_skip + 1
+    overlap = (min_scene_len + 1) * stride
+    decode_start = max(0, chunk_start - overlap)
+    # Keep the stride grid aligned with a single pass over the whole video
+    decode_start -= decode_start % stride
+
+    consumer = SceneCutConsumer(threshold=threshold, min_scene_len=min_scene_len, downscale=downscale, frame_skip=frame_skip)
+    _, video_info = run_frame_source(video_path, [consumer], start_frame=decode_start, end_frame=chunk_end)
+
+    cuts = [cut for cut in consumer.cuts if chunk_start <= cut < chunk_end]
+    return cuts, video_info["fps"], video_info["last_frame"]
+
+
+def stitch_chunk_cuts(chunk_cuts, min_scene_len):
+    """
+    Merges per-chunk cut lists: removes duplicates and re-applies min_scene_len
+    across chunk boundaries so a boundary cut is counted once.
+    """
+    merged = []
+    for cut in sorted(set(cut for cuts in chunk_cuts for cut in cuts)):
+        if merged and cut - merged[-1] < min_scene_len:
+            continue
+        merged.append(cut)
+    return merged
+
+
+def get_scene_cuts_fast(video_path, threshold=27, workers=None, chunk_seconds=60.0,
+                        downscale=None, frame_skip=0, min_scene_len=15):
+    """
+    Fast scene detection: splits the video into time ranges, detects cuts in
+    each range in a separate process, and stitches the results.
+
+    Args:
+        video_path (str): Path to the video file.
+        threshold (float): ContentDetector threshold (same meaning as get_scene_cuts).
+        workers (int): Worker processes (default: CPU count).
+        chunk_seconds (float): Length of each time range.
+        downscale (int): Frame reduction factor (None = PySceneDetect default).
+        frame_skip (int): Frames skipped between compared frames.
+
+    Returns:
+        pd.DataFrame: Same format as get_scene_cuts.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return pd.DataFrame([{"Error": f"Failed to open video: {video_path}"}])
+    video_info = get_video_info(cap)
+    cap.release()
+
+    fps = video_info["fps"]
+    frame_count = video_info["frame_count"]
+
+    # 1. Plan the chunks (a single chunk when the length is unknown)
+    if frame_count <= 0 or fps <= 0:
+        chunks = [(0, None)]
+    else:
+        chunk_frames = max(int(chunk_seconds * fps), (min_scene_len + 1) * (frame_skip + 1) * 2)
+        chunks = [(start, min(start + chunk_frames, frame_count)) for start in range(0, frame_count, chunk_frames)]
+
+    # 2. Detect each chunk in its own process
+    workers = workers or os.cpu_count() or 1
+    args = (threshold, min_scene_len, downscale, frame_skip)
+    if len(chunks) == 1 or workers == 1:
+        results = [_detect_chunk_cuts(video_path, start, end, *args) for start, end in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_detect_chunk_cuts, *zip(*[(video_path, start, end) + args for start, end in chunks])))
+
+    # 3. Stitch the cut lists and build the scene table
+    cuts = stitch_chunk_cuts([cuts for cuts, _, _ in results], min_scene_len)
+    end_frame = max(last_frame for _, _, last_frame in results)
+    return cuts_to_scene_df(cuts, 0, end_frame, results[0][1] or fps)
+
+
+def scene_cut_times(scene_cuts_df):
+    """Cut times in seconds: the start of every scene after the first."""
+    if scene_cuts_df.empty or "Start_Time" not in scene_cuts_df.columns:
+        return []
+    return list(times_to_seconds(scene_cuts_df["Start_Time"].iloc[1:]))
+
+
+def compare_scene_cuts(reference_df, candidate_df, tolerance_s=0.5):
+    """
+    Scores a candidate cut list against a reference one. Cuts match one-to-one
+    when they are within tolerance_s seconds.
+
+    Returns:
+        dict: precision, recall, f1 and the mean offset of matched cuts.
+    """
+    reference = scene_cut_times(reference_df)
+    candidate = scene_cut_times(candidate_df)
+
+    # Two-pointer greedy matching over both sorted lists
+    matched_offsets = []
+    i = j = 0
+    while i < len(reference) and j < len(candidate):
+        offset = candidate[j] - reference[i]
+        if abs(offset) <= tolerance_s:
+            matched_offsets.append(abs(offset))
+            i += 1
+            j += 1
+        elif offset < 0:
+            j += 1
+        else:
+            i += 1
+
+    matches = len(matched_offsets)
+    precision = matches / len(candidate) if candidate else 1.0
+    recall = matches / len(reference) if reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "reference_cuts": len(reference),
+        "candidate_cuts": len(candidate),
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "f1": round(f1, 3),
+        "mean_offset_s": round(float(sum(matched_offsets)) / matches, 3) if matches else None,
+    }
+
+
+def evaluate_fast_scene_detection(video_path, configs, threshold=27, tolerance_s=0.5):
+    """
+    Times the reference get_scene_cuts (full resolution pipeline, threshold 27)
+    against fast configurations and reports accuracy for each, so the
+    speed/precision trade-off can be chosen per job.
+
+    Args:
+        configs (list): Keyword-argument dicts for get_scene_cuts_fast, e.g.
+            [{"workers": 8}, {"workers": 8, "downscale": 8, "frame_skip": 2}].
+
+    Returns:
+        pd.DataFrame: One row per configuration (plus the reference).
+    """
+    start = time.perf_counter()
+    reference_df = get_scene_cuts(video_path, threshold=threshold)
+    reference_seconds = time.perf_counter() - start
+
+    rows = [{"config": "reference", "seconds": round(reference_seconds, 2), "speedup": 1.0,
+             **compare_scene_cuts(reference_df, reference_df, tolerance_s)}]
+    for config in configs:
+        start = time.perf_counter()
+        candidate_df = get_scene_cuts_fast(video_path, threshold=threshold, **config)
+        seconds = time.perf_counter() - start
+        rows.append({"config": json.dumps(config, sort_keys=True), "seconds": round(seconds, 2),
+                     "speedup": round(reference_seconds / seconds, 2) if seconds else None,
+                     **compare_scene_cuts(reference_df, candidate_df, tolerance_s)})
+    return pd.DataFrame(rows).set_index("config")
+
+# You can remove or comment out this block later, it's just for testing this file independently.
+if __name__ == '__main__':
+    # You would need to put a real video path here to test this file alone
+    # print(get_scene_cuts("path/to/your/video.mp4"))
     pass
\ No newline at end of file
@@ -1,102 +1,245 @@
-import pandas as pd
-from datetime import datetime, timedelta
-
-# Helper function to convert time strings (like "00:00:04.500") to seconds for calculation
-def time_to_seconds(time_str):
-    # This assumes the format HH:MM:SS.mmm, which SceneDetect and Librosa use
-    parts = time_str.split(':')
-    if len(parts) == 3:
-        h, m, s = map(float, parts)
-    else: # Handle cases where hour might be missing if librosa or scenedetect output varies
-        m, s = map(float, parts)
-        h = 0.0
-    return h * 3600 + m * 60 + s
-
-def calculate_highlight_scores(segments_df, peaks_list, emotional_summary):
-    """
-    Calculates the importance score for each visual segment based on audio peak density.
-    
-    Args:
-        segments_df (pd.DataFrame): DataFrame of visual segments (from scene_detector.py)
-        peaks_list (list): List of dictionaries for audio peaks (from audio_analyzer.py)
-    
-    Returns:
-        pd.DataFrame: Segments DataFrame with a new 'Highlight_Score' column.
-    """
-    
-    # 1. Convert audio peak times (strings) to seconds
-    peaks_seconds = [time_to_seconds(peak['time']) for peak in peaks_list if 'time' in peak]
-    
-    # 2. Prepare the results list
-    scored_segments = []
-    
-    # 2. Get the overall emotional score from the summary
-    overall_emotional_score = emotional_summary.get('excitement_score', 0)
-    
-    # 3. Define the weight for emotional impact. (e.g., 5 points per high-emotion frame)
-    EMOTION_WEIGHT = 5 
-    
-    # 4. Calculate the bonus score based on overall emotion (normalizing by frames analyzed)
-    frames_analyzed = emotional_summary.get('analyzed_frames', 1)
-    
-    # Bonus score is the average high-emotion per frame, multiplied by the segment duration
-    # This rewards the video's emotional intensity.
-    emotion_bonus_per_second = (overall_emotional_score / frames_analyzed) * EMOTION_WEIGHT 
-
-
-    # 5. Iterate through each visual segment
-    for index, segment in segments_df.iterrows():
-        segment_start = time_to_seconds(segment['Start_Time'])
-        segment_end = time_to_seconds(segment['End_Time'])
-        segment_duration = segment_end - segment_start
-        
-        # 6. Score Logic 1: Audio Peak Density (Primary Score)
-        peak_count = 0
-        for peak_time in peaks_seconds:
-            if segment_start <= peak_time < segment_end:
-                peak_count += 1
-        
-        # 7. Score Logic 2: Emotional Bonus (Secondary Score)
-        # We assume emotional impact applies across the duration of the clip
-        emotion_bonus = emotion_bonus_per_second * segment_duration
-        
-        # 8. Calculate Final Fused Score
-        final_score = peak_count + emotion_bonus
-        
-        # 9. Create a new dictionary for the scored segment
-        scored_segments.append({
-            'Segment': index,
-            'Start_Time': segment['Start_Time'],
-            'End_Time': segment['End_Time'],
-            'Duration': round(segment_duration, 2),
-            'Audio_Peaks': peak_count,
-            'Emotion_Bonus': round(emotion_bonus, 2),
-            'Highlight_Score': round(final_score, 2)
-        })
-        
-    # 6. Convert to DataFrame, sort by score (highest first), and return
-    scored_df = pd.DataFrame(scored_segments).set_index('Segment')
-    # Sort by the score to clearly rank the most important segments
-    scored_df = scored_df.sort_values(by='Highlight_Score', ascending=False)
-    
-    return scored_df
-
-
-# Example usage (for testing purposes, should be called from app.py)
-if __name__ == '__main__':
-    # Dummy segment data (must match output of scene_detector.py)
-    dummy_segments = pd.DataFrame([
-        {'Start_Time': '00:00:00.000', 'End_Time': '00:00:10.000'},
-        {'Start_Time': '00:00:10.000', 'End_Time': '00:00:20.000'}
-    ])
-    # Dummy peak data (must match output of audio_analyzer.py)
-    dummy_peaks = [
-        {'time': '00:00:05.500', 'score': 90},  # Falls in Segment 1
-        {'time': '00:00:15.200', 'score': 95},  # Falls in Segment 2
-        {'time': '00:00:16.800', 'score': 88}   # Falls in Segment 2 (Score 2)
-    ]
-    
-    scored_results = calculate_highlight_scores(dummy_segments, dummy_peaks)
-    print(scored_results)
-
+import numpy as np
+import pandas as pd
+import telemetry
+from datetime import datetime, timedelta
+
+# Helper function to convert time strings (like "00:00:04.500") to seconds for calculation
+def time_to_seconds(time_str):
+    # This assumes the format HH:MM:SS.mmm, which SceneDetect and Librosa use
+    parts = time_str.split(':')
+    if len(parts) == 3:
+        h, m, s = map(float, parts)
+    else: # Handle cases where hour might be missing if librosa or scenedetect output varies
+        m, s = map(float, parts)
+        h = 0.0
+    return h * 3600 + m * 60 + s
+
+# Weight for emotional impact (e.g., 5 points per high-emotion frame)
+EMOTION_WEIGHT = 5
+
+# Points per unit of onset strength above the video's average (crowd roars, whistles)
+ONSET_WEIGHT = 2
+
+def times_to_seconds(time_strings):
+    """
+    Vectorized time_to_seconds: converts a sequence of HH:MM:SS.mmm (or MM:SS.mmm)
+    strings to a float numpy array in one pass.
+    """
+    time_strings = pd.Series(time_strings, dtype=str)
+    if time_strings.empty:
+        return np.zeros(0)
+    parts = time_strings.str.split(':', expand=True).astype(float).to_numpy()
+    if parts.shape[1] == 2:
+        parts = np.column_stack([np.zeros(len(parts)), parts])
+    else:
+        # Right-align rows that are missing the hour field
+        short = np.isnan(parts[:, 2])
+        parts[short] = np.column_stack([np.zeros(short.sum()), parts[short, 0], parts[short, 1]])
+    return parts[:, 0] * 3600 + parts[:, 1] * 60 + parts[:, 2]
+
+def count_peaks_in_segments(starts, ends, peak_times, peak_weights=None):
+    """
+    Counts the peaks falling in each [start, end) segment with a sorted
+    binary-search join: O((S + P) log P) instead of O(S * P).
+
+    Args:
+        starts, ends (np.ndarray): Segment bounds in seconds.
+        peak_times (np.ndarray): Peak times in seconds (any order).
+        peak_weights (np.ndarray): Optional per-peak weights, summed in the same pass.
+
+    Returns:
+        tuple: (counts, weighted_sums); weighted_sums is None without weights.
+    """
+    order = np.argsort(peak_times, kind='stable')
+    sorted_times = peak_times[order]
+
+    lo = np.searchsorted(sorted_times, starts, side='left')
+    hi = np.searchsorted(sorted_times, ends, side='left')
+    counts = hi - lo
+
+    weighted_sums = None
+    if peak_weights is not None:
+        cumulative = np.concatenate([[0.0], np.cumsum(peak_weights[order], dtype=np.float64)])
+        weighted_sums = cumulative[hi] - cumulative[lo]
+    return counts, weighted_sums
+
+def aggregate_segment_features(starts, ends, frame_times, features):
+    """
+    Mean of each feature column over the frames falling in each [start, end)
+    segment, using prefix sums and a binary search like count_peaks_in_segments.
+
+    Args:
+        starts, ends (np.ndarray): Segment bounds in seconds.
+        frame_times (np.ndarray): Sorted frame times in seconds.
+        features (np.ndarray): (n_frames, n_features) matrix.
+
+    Returns:
+        np.ndarray: (n_segments, n_features) means; 0 for segments with no frames.
+    """
+    lo = np.searchsorted(frame_times, starts, side='left')
+    hi = np.searchsorted(frame_times, ends, side='left')
+    cumulative = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(features, axis=0, dtype=np.float64)])
+    counts = (hi - lo)[:, None]
+    return (cumulative[hi] - cumulative[lo]) / np.maximum(counts, 1)
+
+@telemetry.traced("scoring")
+def calculate_highlight_scores(segments_df, peaks, emotional_summary, peak_weighting=False, audio_features=None):
+    """
+    Calculates the importance score for each visual segment based on audio peak density.
+    
+    Args:
+        segments_df (pd.DataFrame): DataFrame of visual segments (from scene_detector.py)
+        peaks (AudioPeaks): Audio peak arrays (from audio_analyzer.get_audio_peaks)
+        emotional_summary (dict): Summary from emotion_detector.py
+        peak_weighting (bool): Weight each peak by its score / 100 instead of
+            counting it as 1. Adds a 'Peak_Weight' column.
+        audio_features (AudioEnvelope): Optional envelope from
+            get_audio_peaks(features=True). Adds per-segment 'Mean_*' feature
+            columns and an 'Onset_Bonus' for above-average onset strength.
+    
+    Returns:
+        pd.DataFrame: Segments DataFrame with a new 'Highlight_Score' column.
+    """
+    
+    # 1. Keep segment bounds and audio peak times as numeric arrays
+    starts = times_to_seconds(segments_df['Start_Time'])
+    ends = times_to_seconds(segments_df['End_Time'])
+    durations = ends - starts
+    peak_times = peaks.time_seconds
+    
+    # 2. Get the overall emotional score from the summary
+    overall_emotional_score = emotional_summary.get('excitement_score', 0)
+    
+    # 3. Emotional impact is weighted by EMOTION_WEIGHT (e.g., 5 points per high-emotion frame)
+
+    # 4. Calculate the bonus score based on overall emotion (normalizing by frames analyzed)
+    frames_analyzed = emotional_summary.get('analyzed_frames', 1)
+    
+    # Bonus score is the average high-emotion per frame, multiplied by the segment duration
+    # This rewards the video's emotional intensity.
+    emotion_bonus_per_second = (overall_emotional_score / frames_analyzed) * EMOTION_WEIGHT 
+
+    # 5. Score Logic 1: Audio Peak Density (Primary Score), for all segments at once
+    peak_counts, peak_weights = count_peaks_in_segments(
+        starts, ends, peak_times, peaks.score / 100.0 if peak_weighting else None
+    )
+
+    # 6. Score Logic 2: Emotional Bonus (Secondary Score)
+    # We assume emotional impact applies across the duration of the clip
+    emotion_bonus = emotion_bonus_per_second * durations
+
+    # 7. Score Logic 3: Onset Bonus from the spectral audio features, if available
+    feature_columns = []
+    onset_bonus = np.zeros(len(starts))
+    if audio_features is not None and 'onset_strength' in audio_features.names:
+        from audio_features import FEATURE_COLUMNS, FEATURE_NAMES
+        feature_columns = [FEATURE_COLUMNS[FEATURE_NAMES.index(name)] for name in audio_features.names]
+        feature_means = aggregate_segment_features(
+            starts, ends, audio_features.time_seconds, audio_features.features
+        )
+        onset_means = feature_means[:, audio_features.names.index('onset_strength')]
+        global_onset = audio_features.column('onset_strength').mean(dtype=np.float64)
+        if global_onset > 0:
+            onset_bonus = ONSET_WEIGHT * np.maximum(0.0, onset_means / global_onset - 1.0) * durations
+
+    # 8. Calculate Final Fused Score
+    audio_score = peak_weights if peak_weighting else peak_counts
+    final_score = audio_score + emotion_bonus + onset_bonus
+
+    # 9. Build the scored table column-wise
+    scored_df = pd.DataFrame({
+        'Segment': segments_df.index,
+        'Start_Time': segments_df['Start_Time'].to_numpy(),
+        'End_Time': segments_df['End_Time'].to_numpy(),
+        'Duration': np.round(durations, 2),
+        'Audio_Peaks': peak_counts,
+        'Emotion_Bonus': np.round(emotion_bonus, 2),
+        'Highlight_Score': np.round(final_score, 2)
+    }).set_index('Segment')
+    if peak_weighting:
+        scored_df.insert(scored_df.columns.get_loc('Emotion_Bonus'), 'Peak_Weight', np.round(peak_weights, 2))
+    if feature_columns:
+        for position, column in enumerate(feature_columns):
+            scored_df.insert(scored_df.columns.get_loc('Emotion_Bonus'), f'Mean_{column}', np.round(feature_means[:, position], 4))
+        scored_df.insert(scored_df.columns.get_loc('Highlight_Score'), 'Onset_Bonus', np.round(onset_bonus, 2))
+
+    # 10. Sort by the score to clearly rank the most important segments
+    scored_df = scored_df.sort_values(by='Highlight_Score', ascending=False)
+    telemetry.add("segments", len(scored_df))
+    telemetry.add("audio_peaks", len(peak_times))
+    
+    return scored_df
+
+
+@telemetry.traced("two_phase_scoring")
+def calculate_two_phase_scores(segments_df, peaks, segment_emotion_fn, top_k=5, audio_features=None):
+    """
+    Candidate-driven scoring: rank cheaply first, then spend emotion analysis
+    only on the segments that could end up in the highlight reel.
+
+    Phase 1 scores every segment from audio peaks alone. Phase 2 passes the
+    top_k candidates to `segment_emotion_fn` and adds a per-segment emotion
+    bonus, using the same formula calculate_highlight_scores applies globally.
+
+    Args:
+        segments_df (pd.DataFrame): DataFrame of visual segments (from scene_detector.py)
+        peaks (AudioPeaks): Audio peak arrays (from audio_analyzer.get_audio_peaks)
+        segment_emotion_fn (callable): Takes a list of (segment_id, start_s, end_s)
+            and returns {segment_id: {"analyzed_frames", "excitement_score"}},
+            e.g. emotion_detector.get_segment_emotion_scores bound to a video.
+        top_k (int): Number of candidate segments that get emotion analysis.
+        audio_features (AudioEnvelope): Optional spectral features, as for calculate_highlight_scores.
+
+    Returns:
+        pd.DataFrame: Same columns as calculate_highlight_scores, re-ranked.
+    """
+
+    # 1. Phase 1: audio-only ranking (no emotion data yet)
+    scored_df = calculate_highlight_scores(segments_df, peaks, {}, audio_features=audio_features)
+    if scored_df.empty:
+        return scored_df
+
+    # Segment length breaks ties, as it drives the emotion bonus in phase 2
+    candidates_df = scored_df.sort_values(by=['Highlight_Score', 'Duration'], ascending=False).head(top_k)
+    candidates = [
+        (index, time_to_seconds(row['Start_Time']), time_to_seconds(row['End_Time']))
+        for index, row in candidates_df.iterrows()
+    ]
+
+    # 2. Phase 2: emotion analysis restricted to the candidates
+    segment_emotions = segment_emotion_fn(candidates)
+
+    for index, start, end in candidates:
+        emotion = segment_emotions.get(index)
+        if not emotion or not emotion.get('analyzed_frames'):
+            continue
+        emotion_bonus = (emotion['excitement_score'] / emotion['analyzed_frames']) * EMOTION_WEIGHT * (end - start)
+        scored_df.loc[index, 'Emotion_Bonus'] = round(emotion_bonus, 2)
+        # Phase 1 scores carry no emotion bonus, so the audio part is kept as-is
+        scored_df.loc[index, 'Highlight_Score'] = round(scored_df.loc[index, 'Highlight_Score'] + emotion_bonus, 2)
+
+    # 3. Final ranking with the per-segment emotion signal
+    return scored_df.sort_values(by='Highlight_Score', ascending=False)
+
+
+# Example usage (for testing purposes, should be called from app.py)
+if __name__ == '__main__':
+    # Dummy segment data (must match output of scene_detector.py)
+    dummy_segments = pd.DataFrame([
+        {'Start_Time': '00:00:00.000', 'End_Time': '00:00:10.000'},
+        {'Start_Time': '00:00:10.000', 'End_Time': '00:00:20.000'}
+    ])
+    # Dummy peak data (must match output of audio_analyzer.py)
+    from audio_analyzer import make_audio_peaks
+    dummy_peaks = make_audio_peaks(
+        [5.5, 15.2, 16.8],  # Segment 1, then two in Segment 2 (Score 2)
+        [90, 95, 88]
+    )
+    
+    # Dummy emotion summary (must match output of emotion_detector.py)
+    dummy_emotions = {'analyzed_frames': 50, 'excitement_score': 0}
+
+    scored_results = calculate_highlight_scores(dummy_segments, dummy_peaks, dummy_emotions)
+    print(scored_results)
+
 # Expected output shows Segment 2 (score 2) is higher than Segment 1 (score 1)
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Duration-budgeted clip selection.
+
+Picks what goes into a highlight reel of a target length from the scored
+segments table, instead of taking however many seconds the top N scenes add up to:
+
+    1. adjacent short segments are merged into clips of at least min_clip seconds,
+    2. clips longer than max_clip are trimmed to their central max_clip seconds,
+    3. clips are taken greedily by score per second from a heap until the
+       budget is used up; a clip closer than min_gap to one already selected
+       is joined to it when the result still fits max_clip, and skipped otherwise.
+
+Everything is O(n log n) in the number of segments, so tens of thousands of
+candidates are fine. Fewer, longer clips also mean fewer seeks and encodes.
+"""
+import heapq
+from bisect import bisect_right
+
+import numpy as np
+
+import telemetry
+from scorer import times_to_seconds
+
+MIN_CLIP_SECONDS = 3.0
+MAX_CLIP_SECONDS = 20.0
+
+# Selected clips closer than this are joined into one (or the later one is skipped)
+MIN_GAP_SECONDS = 2.0
+
+# Segments at most this far apart count as adjacent when merging short ones
+MERGE_GAP_SECONDS = 0.5
+
+
+def merge_short_segments(starts, ends, scores, min_clip=MIN_CLIP_SECONDS, max_clip=MAX_CLIP_SECONDS,
+                         merge_gap=MERGE_GAP_SECONDS):
+    """
+    Merges runs of adjacent segments (chronological order) until each clip is
+    at least `min_clip` long, without growing past `max_clip`. Scores add up.
+
+    Returns:
+        tuple: (starts, ends, scores) numpy arrays of the merged clips.
+    """
+    merged_starts, merged_ends, merged_scores = [], [], []
+    for start, end, score in zip(starts, ends, scores):
+        if merged_starts:
+            last_length = merged_ends[-1] - merged_starts[-1]
+            adjacent = start - merged_ends[-1] <= merge_gap
+            if adjacent and last_length < min_clip and end - merged_starts[-1] <= max_clip:
+                merged_ends[-1] = max(merged_ends[-1], end)
+                merged_scores[-1] += score
+                continue
+        merged_starts.append(start)
+        merged_ends.append(end)
+        merged_scores.append(score)
+    return np.asarray(merged_starts, dtype=np.float64), np.asarray(merged_ends, dtype=np.float64), np.asarray(merged_scores, dtype=np.float64)
+
+
+def select_clips(starts, ends, scores, target_duration, min_clip=MIN_CLIP_SECONDS, max_clip=MAX_CLIP_SECONDS,
+                 min_gap=MIN_GAP_SECONDS, merge_gap=MERGE_GAP_SECONDS):
+    """
+    Chooses clips totalling at most `target_duration` seconds.
+
+    Args:
+        starts, ends, scores (np.ndarray): Segment bounds in seconds and their
+            scores, in any order. Segments with a score <= 0 are ignored.
+        target_duration (float): Reel length budget in seconds.
+        min_clip, max_clip (float): Clip length bounds after merging/trimming.
+        min_gap (float): Minimum distance between two selected clips.
+        merge_gap (float): Maximum distance between segments merged as adjacent.
+
+    Returns:
+        list: (start_seconds, end_seconds) tuples in chronological order.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+
+    # 1. Positive-scoring segments, chronologically, with short neighbours merged
+    keep = (scores > 0) & (ends > starts)
+    order = np.argsort(starts[keep], kind='stable')
+    starts, ends, scores = merge_short_segments(
+        starts[keep][order], ends[keep][order], scores[keep][order], min_clip, max_clip, merge_gap
+    )
+
+    # 2. Length bounds: drop what is still too short, trim what is too long
+    #    (score scales with the part kept, as scores accumulate over time)
+    lengths = ends - starts
+    long_enough = lengths >= min(min_clip, target_duration)
+    starts, ends, scores, lengths = starts[long_enough], ends[long_enough], scores[long_enough], lengths[long_enough]
+    max_length = min(max_clip, target_duration)
+    too_long = lengths > max_length
+    centres = (starts + ends) / 2
+    scores = np.where(too_long, scores * max_length / np.maximum(lengths, 1e-9), scores)
+    starts = np.where(too_long, centres - max_length / 2, starts)
+    ends = np.where(too_long, centres + max_length / 2, ends)
+    lengths = ends - starts
+    telemetry.add("candidate_clips", len(starts))
+    if len(starts) == 0:
+        return []
+
+    # 3. Greedy by score density. heapify is O(n) and each pop O(log n), so only
+    #    the clips actually considered get ordered
+    heap = [(-score / length, -score, start, end) for start, end, score, length in zip(starts, ends, scores, lengths)]
+    heapq.heapify(heap)
+
+    selected_starts, selected_ends = [], []  # non-overlapping, sorted by start
+    remaining = target_duration
+    while heap and remaining >= min(min_clip, target_duration) - 1e-9:
+        _, _, start, end = heapq.heappop(heap)
+
+        # 4. Selected clips within min_gap of this one (at most a few, found by bisection)
+        lo = bisect_right(selected_ends, start - min_gap)
+        hi = lo
+        while hi < len(selected_starts) and selected_starts[hi] < end + min_gap:
+            hi += 1
+
+        new_start = min([start] + selected_starts[lo:hi])
+        new_end = max([end] + selected_ends[lo:hi])
+        added = (new_end - new_start) - sum(e - s for s, e in zip(selected_starts[lo:hi], selected_ends[lo:hi]))
+        if (hi > lo and new_end - new_start > max_clip) or added > remaining + 1e-9:
+            continue
+
+        selected_starts[lo:hi] = [new_start]
+        selected_ends[lo:hi] = [new_end]
+        remaining -= added
+
+    telemetry.add("selected_clips", len(selected_starts))
+    return [(float(start), float(end)) for start, end in zip(selected_starts, selected_ends)]
+
+
+@telemetry.traced("selection")
+def select_segments_for_duration(scored_segments_df, target_duration, **constraints):
+    """
+    select_clips for a scorer.calculate_highlight_scores table.
+
+    Returns:
+        list: (start_seconds, end_seconds) tuples in chronological order, as
+        highlight_generator.render_highlight_video expects.
+    """
+    if scored_segments_df.empty:
+        return []
+    return select_clips(
+        times_to_seconds(scored_segments_df['Start_Time']),
+        times_to_seconds(scored_segments_df['End_Time']),
+        scored_segments_df['Highlight_Score'].to_numpy(dtype=np.float64),
+        target_duration,
+        **constraints
+    )
@@ -0,0 +1,247 @@
+"""
+Structured per-stage telemetry.
+
+Analyzers and the renderer run inside spans. A span records wall time, the
+CPU time of the thread that ran it, how much memory it added (resident set
+size at its end minus at its start, and how far it raised the process's peak
+RSS), and counters such as frames_decoded, frames_analyzed and audio_samples. It also records how far
+through its work it is, so the UI can show real progress.
+
+    with telemetry.span("audio_peaks", video=path):
+        ...
+        telemetry.add("audio_samples", len(samples))
+        telemetry.progress(seconds_done, duration)
+
+Finished spans are kept in memory (recent_spans) and, when VHG_TELEMETRY_PATH
+is set, appended to that file as one JSON object per line.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+TELEMETRY_PATH = os.environ.get("VHG_TELEMETRY_PATH")
+
+# Finished spans kept in memory for the UI
+MAX_RECENT_SPANS = 1000
+
+_current = contextvars.ContextVar("vhg_current_span", default=None)
+_lock = threading.Lock()
+_recent = deque(maxlen=MAX_RECENT_SPANS)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (the peak so far where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+    return round(resident_pages * resource.getpagesize() / (1024 * 1024), 1)
+
+
+class Span:
+    """
+    One timed unit of work. Spans form a tree through `parent`, so counters
+    and timings can be rolled up per pipeline run.
+
+    CPU time covers only threads that activated the span; work done in
+    worker processes (DeepFace pools, ffmpeg) shows up in wall time. Memory
+    is measured for the whole process, so spans running concurrently in
+    other threads share each other's growth.
+    """
+
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.counters = {}
+        self.children = []
+        self.done = 0
+        self.total = None
+        self.status = "running"
+        self.error = None
+        self.started_at = time.time()
+        self.wall_s = None
+        self.cpu_s = None
+        self.rss_delta_mb = None
+        self.peak_growth_mb = None
+        self._start = time.perf_counter()
+        self._rss_start = rss_mb()
+        self._peak_start = peak_rss_mb()
+        if parent is not None:
+            with _lock:
+                parent.children.append(self)
+
+    def add(self, counter, amount=1):
+        with _lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set_progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    @property
+    def progress(self):
+        """Fraction done in [0, 1]; falls back to the latest child without a total of its own."""
+        if self.status != "running":
+            return 1.0
+        if self.total:
+            return min(1.0, self.done / self.total)
+        with _lock:
+            latest = self.children[-1] if self.children else None
+        return latest.progress if latest is not None else 0.0
+
+    def finish(self, error=None):
+        """Closes the span and emits it. Safe to call from any thread, once."""
+        if self.status != "running":
+            return
+        self.wall_s = round(time.perf_counter() - self._start, 4)
+        self.rss_delta_mb = round(rss_mb() - self._rss_start, 1)
+        # 0 when the span stayed below a peak reached before it started
+        self.peak_growth_mb = round(peak_rss_mb() - self._peak_start, 1)
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+        else:
+            self.status = "ok"
+        _emit(self)
+
+    def path(self):
+        names = []
+        span = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return "/".join(reversed(names))
+
+    def to_dict(self):
+        return {
+            "span": self.path(),
+            "name": self.name,
+            "status": self.status,
+            "error": self.error,
+            "started_at": round(self.started_at, 3),
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "rss_delta_mb": self.rss_delta_mb,
+            "peak_growth_mb": self.peak_growth_mb,
+            "counters": dict(self.counters),
+            "attrs": {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                      for key, value in self.attrs.items()},
+        }
+
+
+def _emit(span):
+    record = span.to_dict()
+    with _lock:
+        _recent.append(record)
+        if TELEMETRY_PATH:
+            with open(TELEMETRY_PATH, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def activated(span):
+    """
+    Makes `span` current in this thread and adds this thread's CPU time to it,
+    without finishing it (run_pipeline finishes stage spans itself).
+    """
+    token = _current.set(span)
+    cpu_start = time.thread_time()
+    try:
+        yield span
+    finally:
+        span.cpu_s = round((span.cpu_s or 0.0) + time.thread_time() - cpu_start, 4)
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, parent=None, **attrs):
+    """Runs the block in a new child span of `parent` (default: the current span)."""
+    new_span = Span(name, parent=parent if parent is not None else _current.get(), **attrs)
+    try:
+        with activated(new_span):
+            yield new_span
+    except BaseException as e:
+        new_span.finish(error=e)
+        raise
+    new_span.finish()
+
+
+def traced(name):
+    """Decorator form of span() for analyzer entry points."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current.get()
+
+
+def add(counter, amount=1):
+    """Adds to a counter on the current span (no-op outside a span)."""
+    current = _current.get()
+    if current is not None:
+        current.add(counter, amount)
+
+
+def progress(done, total=None):
+    """Reports progress on the current span (no-op outside a span)."""
+    current = _current.get()
+    if current is not None:
+        current.set_progress(done, total)
+
+
+def recent_spans():
+    """Finished spans of this process, oldest first, as dicts."""
+    with _lock:
+        return list(_recent)
+
+
+def summarize(root):
+    """
+    Flattens a span tree into one row per span, with counters summed over
+    each span's subtree. Suitable for pd.DataFrame.
+    """
+    def visit(node, depth):
+        with _lock:
+            children = list(node.children)
+        totals = dict(node.counters)
+        child_rows = []
+        for child in children:
+            subtotals, rows = visit(child, depth + 1)
+            child_rows.extend(rows)
+            for key, value in subtotals.items():
+                totals[key] = totals.get(key, 0) + value
+        row = {
+            "span": "  " * depth + node.name,
+            "status": node.status,
+            "wall_s": node.wall_s,
+            "cpu_s": node.cpu_s,
+            "rss_delta_mb": node.rss_delta_mb,
+            "peak_growth_mb": node.peak_growth_mb,
+        }
+        row.update(totals)
+        return totals, [row] + child_rows
+
+    return visit(root, 0)[1]
@@ -0,0 +1,44 @@
+"""
+Shared fixtures. Tests import the flat top-level modules directly, so the
+repository root goes on sys.path; media is generated with OpenCV (MJPG in
+AVI needs no ffmpeg).
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_video(path, frames, fps=25.0):
+    """Writes BGR frames to an MJPG .avi and returns the path."""
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    assert writer.isOpened(), "OpenCV cannot write MJPG video"
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def noise_video(tmp_path):
+    """40 frames of 64x48 seeded noise at 25 fps, every frame different."""
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (48, 64, 3), dtype=np.uint8) for _ in range(40)]
+    return write_video(str(tmp_path / "noise.avi"), frames)
+
+
+def read_all_frames(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_cache
+import emotion_detector
+import frame_source
+from analysis_cache import AnalysisCache, cached_emotional_score, cached_video_frames
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"not decoded, only fingerprinted")
+    return str(path)
+
+
+@pytest.fixture
+def analyzer_runs(monkeypatch):
+    """Replaces the analyzers with stubs that record which implementation ran."""
+    runs = []
+    scene_cuts_df = pd.DataFrame({"Segment": [1], "Start_Time": ["00:00:00.000"], "End_Time": ["00:00:01.600"]}).set_index("Segment")
+
+    def summary(max_frames):
+        return {"analyzed_frames": max_frames, "excitement_score": 1}
+
+    def analyze_video_frames(video_path, threshold=27, max_frames=50, engine=None, downscale=None, frame_skip=0, prefilter=True):
+        runs.append(("consumer", max_frames, prefilter))
+        return scene_cuts_df, summary(max_frames) if max_frames else None
+
+    def get_emotional_score(video_path, max_frames=50, engine=None, prefilter=True):
+        runs.append(("seek", max_frames, prefilter))
+        return summary(max_frames)
+
+    monkeypatch.setattr(frame_source, "analyze_video_frames", analyze_video_frames)
+    monkeypatch.setattr(emotion_detector, "get_emotional_score", get_emotional_score)
+    return runs
+
+
+def test_emotion_entries_are_keyed_by_implementation_and_prefilter(video, cache, analyzer_runs):
+    cached_video_frames(video, max_frames=5, cache=cache)
+    cached_video_frames(video, max_frames=5, cache=cache)
+    assert analyzer_runs == [("consumer", 5, True)]
+
+    # The shared-decode sample is not served for the seek-sampling implementation
+    cached_emotional_score(video, 5, cache=cache)
+    assert analyzer_runs[-1] == ("seek", 5, True)
+
+    # Scene cuts are cached, the unfiltered sample is not
+    cached_video_frames(video, max_frames=5, cache=cache, prefilter=False)
+    assert analyzer_runs[-1] == ("seek", 5, False)
+    cached_emotional_score(video, 5, cache=cache, prefilter=False)
+    assert len(analyzer_runs) == 3
+
+
+def test_algorithm_version_invalidates_entries(video, cache, analyzer_runs, monkeypatch):
+    cached_emotional_score(video, 5, cache=cache)
+    monkeypatch.setitem(analysis_cache.ALGORITHM_VERSIONS, "emotion", analysis_cache.ALGORITHM_VERSIONS["emotion"] + 1)
+    cached_emotional_score(video, 5, cache=cache)
+    assert analyzer_runs == [("seek", 5, True), ("seek", 5, True)]
+
+
+def _payload(seed):
+    # Random bytes do not compress, so every entry is about 10 kB on disk
+    return {"data": np.random.default_rng(seed).integers(0, 256, 10_000, dtype=np.uint8)}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, video):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=25_000)
+    cache.put("a", video, {}, _payload(1))
+    cache.put("b", video, {}, _payload(2))
+    os.utime(cache.entry_path("a", video, {}), (1000, 1000))
+    os.utime(cache.entry_path("b", video, {}), (2000, 2000))
+
+    # Reading "a" makes it the most recently used, so "b" goes when "c" arrives
+    assert cache.get("a", video, {}) is not None
+    cache.put("c", video, {}, _payload(3))
+
+    assert cache.evictions == 1
+    assert cache.get("b", video, {}) is None
+    assert np.array_equal(cache.get("a", video, {})["data"], _payload(1)["data"])
+    assert cache.get("c", video, {}) is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_follow_the_content_not_the_path(tmp_path, cache, video):
+    cache.put("a", video, {"x": 1}, _payload(1))
+    copy = tmp_path / "re-upload.mp4"
+    copy.write_bytes(open(video, "rb").read())
+
+    assert cache.get("a", str(copy), {"x": 1}) is not None
+    assert cache.get("a", str(copy), {"x": 2}) is None
+    assert (cache.hits, cache.misses) == (1, 1)
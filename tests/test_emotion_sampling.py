@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+import pytest
+
+import emotion_detector
+import frame_source
+from conftest import write_video
+
+_VideoCapture = cv2.VideoCapture
+
+
+class NoFrameCount:
+    """A capture whose container reports no frame count (CAP_PROP_FRAME_COUNT == 0)."""
+
+    def __init__(self, path):
+        self.cap = _VideoCapture(path)
+
+    def get(self, prop):
+        return 0 if prop == cv2.CAP_PROP_FRAME_COUNT else self.cap.get(prop)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+@pytest.fixture
+def long_video(tmp_path):
+    """60 s of tiny frames at 25 fps (1500 frames)."""
+    frames = [np.full((16, 16, 3), i % 256, dtype=np.uint8) for i in range(1500)]
+    return write_video(str(tmp_path / "long.avi"), frames)
+
+
+@pytest.fixture
+def no_deepface(monkeypatch):
+    sampled = []
+
+    def analyze_frames(frames, engine=None, prefilter=None):
+        sampled.extend(frames)
+        return [None] * len(frames)
+
+    monkeypatch.setattr(emotion_detector, "analyze_frames", analyze_frames)
+    return sampled
+
+
+def test_sample_frames_spreads_unknown_length_over_the_duration(long_video):
+    cap = NoFrameCount(long_video)
+    indices = [index for index, _ in emotion_detector.sample_frames(cap, max_frames=10)]
+    cap.release()
+    assert len(indices) == 10
+    assert indices[-1] >= 1300  # reaches the end, not just the first 10 seconds
+
+
+def test_consumer_spreads_unknown_length_over_the_duration(long_video, monkeypatch, no_deepface):
+    monkeypatch.setattr(frame_source.cv2, "VideoCapture", NoFrameCount)
+    consumer = emotion_detector.EmotionSamplerConsumer(max_frames=10, prefilter=False)
+    (summary,), video_info = frame_source.run_frame_source(long_video, [consumer])
+    assert 140 <= consumer.stride <= 150  # duration estimated from the last frame's timestamp
+    assert summary["analyzed_frames"] == 10
+    assert video_info["last_frame"] > 1300
+
+
+def test_zero_max_frames_samples_nothing(long_video, no_deepface):
+    assert emotion_detector.get_frame_interval(1500, 0) == 1
+    cap = cv2.VideoCapture(long_video)
+    assert list(emotion_detector.sample_frames(cap, max_frames=0)) == []
+    cap.release()
+
+    summary = emotion_detector.get_emotional_score(long_video, max_frames=0)
+    assert summary["analyzed_frames"] == 0
+    assert summary["excitement_score"] == 0
+    assert no_deepface == []
+
+
+def test_zero_max_frames_consumer_is_done_at_once(long_video, no_deepface):
+    consumer = emotion_detector.EmotionSamplerConsumer(max_frames=0, prefilter=False)
+    (summary,), _ = frame_source.run_frame_source(long_video, [consumer])
+    assert summary["analyzed_frames"] == 0
+    assert no_deepface == []
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from audio_analyzer import AudioEnvelope
+from energy_pyramid import EnergyPyramid
+
+HOP_SECONDS = 0.01
+
+
+@pytest.fixture
+def values():
+    values = np.random.default_rng(5).uniform(0.1, 0.2, 100_000).astype(np.float32)
+    values[54_321] = 1.0  # a one-hop spike
+    return values
+
+
+def test_small_windows_return_the_raw_envelope(values):
+    view = EnergyPyramid(values, HOP_SECONDS).query(10.0, 12.0, max_points=500)
+    assert len(view) <= 500
+    assert np.array_equal(view["Energy"].to_numpy(), values[1000:1201])
+    assert np.array_equal(view["Energy_Min"].to_numpy(), view["Energy_Max"].to_numpy())
+
+
+@pytest.mark.parametrize("max_points", [10, 300, 2000])
+def test_large_windows_stay_under_max_points_and_keep_spikes(values, max_points):
+    view = EnergyPyramid(values, HOP_SECONDS).query(max_points=max_points)
+    assert 0 < len(view) <= max_points
+    assert view["Energy_Max"].max() == 1.0
+    assert view["Energy_Min"].min() == values.min()
+    assert (view["Energy_Min"] <= view["Energy"]).all() and (view["Energy"] <= view["Energy_Max"]).all()
+    assert view["Time (s)"].is_monotonic_increasing
+
+
+def test_bin_means_match_the_raw_envelope(values):
+    pyramid = EnergyPyramid(values, HOP_SECONDS, factor=4)
+    # 64-hop bins fit 100_000 hops in at most 1563 rows
+    view = pyramid.query(max_points=1600)
+    assert len(view) == 1563
+    assert np.allclose(view["Energy"].to_numpy()[:-1], values[:1562 * 64].reshape(-1, 64).mean(axis=1), rtol=1e-5)
+    assert view["Time (s)"].iloc[0] == pytest.approx(31.5 * HOP_SECONDS)
+
+
+def test_round_trip_and_envelope_source(values):
+    envelope = AudioEnvelope(HOP_SECONDS, np.column_stack([values, values * 2]), ("rms", "onset_strength"))
+    pyramid = EnergyPyramid.from_envelope(envelope)
+    restored = EnergyPyramid.from_arrays(pyramid.to_arrays())
+
+    assert restored.duration == pytest.approx(1000.0)
+    assert restored.query(100.0, 400.0).equals(pyramid.query(100.0, 400.0))
+    assert EnergyPyramid.from_envelope(envelope, name="onset_strength").query(10.0, 12.0)["Energy"].iloc[0] == values[1000] * 2
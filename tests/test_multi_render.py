@@ -0,0 +1,80 @@
+import sys
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+
+import multi_render
+from multi_render import VariantSpec, render_variants
+from conftest import read_all_frames
+
+_VideoCapture = cv2.VideoCapture
+
+# Stands in for ffmpeg: stores the raw BGR frames it receives, byte for byte
+RAW_SINK = "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open(sys.argv[1], 'wb'))"
+
+
+@pytest.fixture
+def raw_encoders(monkeypatch):
+    def command(video_path, spec, clips, fps, width, height, has_audio, output_path):
+        return [sys.executable, "-c", RAW_SINK, output_path]
+
+    monkeypatch.setattr(multi_render, "_encoder_command", command)
+    monkeypatch.setattr(multi_render, "probe_streams", lambda path: (None, None))
+
+
+class ReusingCapture:
+    """A capture that decodes every frame into the same buffer, as cap.read(buffer) does."""
+
+    def __init__(self, path):
+        self.cap = _VideoCapture(path)
+        self.buffer = None
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            if self.buffer is None:
+                self.buffer = frame
+            else:
+                self.buffer[...] = frame
+        return ret, self.buffer
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def _output_frames(path, width, height):
+    data = np.fromfile(path, dtype=np.uint8)
+    return data.reshape(-1, height, width, 3)
+
+
+def _render_two_variants(video_path, tmp_path):
+    # 25 fps: frames 0-24 and 15-34, overlapping so both encoders get the same frame objects
+    specs = [VariantSpec("first", segments=[(0.0, 1.0)], container="mkv"),
+             VariantSpec("second", segments=[(0.6, 1.4)], container="mkv")]
+    return render_variants(video_path, pd.DataFrame(), specs, output_dir=str(tmp_path / "out"))
+
+
+def _assert_frames_match(result, source):
+    expected = {"first": source[0:25], "second": source[15:35]}
+    for name, frames in expected.items():
+        variant = result["variants"][name]
+        assert variant["error"] is None
+        written = _output_frames(variant["path"], 64, 48)
+        assert len(written) == len(frames)
+        for index, (got, want) in enumerate(zip(written, frames)):
+            assert np.array_equal(got, want), f"{name}: frame {index} differs from the source"
+
+
+def test_variants_receive_their_own_frames(noise_video, tmp_path, raw_encoders):
+    source = read_all_frames(noise_video)
+    result = _render_two_variants(noise_video, tmp_path)
+    assert result["frames_decoded"] == 35
+    _assert_frames_match(result, source)
+
+
+def test_variants_survive_a_decoder_reusing_its_buffer(noise_video, tmp_path, raw_encoders, monkeypatch):
+    source = read_all_frames(noise_video)
+    monkeypatch.setattr(cv2, "VideoCapture", ReusingCapture)
+    _assert_frames_match(_render_two_variants(noise_video, tmp_path), source)
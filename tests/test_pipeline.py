@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import Stage, StageError, run_pipeline
+
+
+def test_dependencies_receive_results_and_independent_stages_overlap():
+    def slow(value):
+        time.sleep(0.3)
+        return value
+
+    start = time.perf_counter()
+    results, timings = run_pipeline([
+        Stage("a", lambda: slow(2)),
+        Stage("b", lambda: slow(3)),
+        Stage("product", lambda a, b: a * b, deps=["a", "b"]),
+    ], poll_interval=0.02)
+
+    assert results == {"a": 2, "b": 3, "product": 6}
+    assert set(timings) == {"a", "b", "product"}
+    assert time.perf_counter() - start < 0.55  # a and b ran side by side
+
+
+def test_failed_dependency_stops_the_pipeline():
+    ran = []
+
+    def broken():
+        raise RuntimeError("decoder crashed")
+
+    with pytest.raises(StageError) as info:
+        run_pipeline([
+            Stage("frames", broken),
+            Stage("scoring", lambda frames: ran.append(frames), deps=["frames"]),
+        ], poll_interval=0.02)
+
+    assert info.value.stage == "frames"
+    assert isinstance(info.value.cause, RuntimeError)
+    assert ran == []
+
+
+def test_timeout_fails_without_waiting_for_the_stage():
+    release = threading.Event()
+    events = []
+    try:
+        start = time.perf_counter()
+        with pytest.raises(StageError) as info:
+            run_pipeline([Stage("audio", release.wait, timeout=0.1)],
+                         progress_callback=events.append, poll_interval=0.02)
+        assert time.perf_counter() - start < 1.0
+    finally:
+        release.set()
+
+    assert info.value.stage == "audio"
+    assert isinstance(info.value.cause, TimeoutError)
+    statuses = [event["status"] for event in events]
+    assert statuses[0] == "started" and statuses[-1] == "failed"
+    assert "finished" not in statuses
+
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage("a", int), Stage("a", int)], "Duplicate"),
+    ([Stage("a", int, deps=["missing"])], "unknown stage"),
+    ([Stage("a", int, deps=["b"]), Stage("b", int, deps=["a"])], "cycle"),
+])
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        run_pipeline(stages)
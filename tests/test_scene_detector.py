@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from conftest import write_video
+from frame_source import analyze_video_frames
+from scene_detector import get_scene_cuts_fast, scene_cut_times, stitch_chunk_cuts
+
+# Frame numbers of the cuts; 50 and 100 fall exactly on 2 s chunk boundaries at 25 fps
+CUT_FRAMES = [30, 50, 100, 140, 200]
+# Dark grey between saturated colours, so every cut is well above the threshold
+COLOURS = [(30, 30, 30), (0, 0, 255), (30, 30, 30), (0, 255, 0), (30, 30, 30), (255, 0, 0)]
+
+
+@pytest.fixture(scope="module")
+def scenes_video(tmp_path_factory):
+    """10 s at 25 fps (250 frames) of flat-coloured scenes with a little noise, cut at CUT_FRAMES."""
+    rng = np.random.default_rng(11)
+    frames = []
+    for index in range(250):
+        scene = sum(index >= cut for cut in CUT_FRAMES)
+        frame = np.empty((48, 64, 3), dtype=np.uint8)
+        frame[:] = COLOURS[scene]
+        frames.append(np.clip(frame + rng.integers(0, 8, frame.shape), 0, 255).astype(np.uint8))
+    return write_video(str(tmp_path_factory.mktemp("scenes") / "scenes.avi"), frames)
+
+
+def test_stitch_drops_duplicates_and_cuts_too_close_across_chunks():
+    assert stitch_chunk_cuts([[10, 100], [100, 105, 200], []], min_scene_len=15) == [10, 100, 200]
+    assert stitch_chunk_cuts([[], []], min_scene_len=15) == []
+
+
+@pytest.mark.parametrize("frame_skip", [0, 1])
+def test_chunked_detection_matches_the_shared_consumer(scenes_video, frame_skip):
+    shared_df, _ = analyze_video_frames(scenes_video, max_frames=0, frame_skip=frame_skip)
+    fast_df = get_scene_cuts_fast(scenes_video, workers=2, chunk_seconds=2.0, frame_skip=frame_skip)
+
+    assert fast_df.equals(shared_df)
+    assert fast_df["End_Time"].iloc[-1] == "00:00:10.000"
+    if frame_skip == 0:
+        assert np.allclose(scene_cut_times(fast_df), np.array(CUT_FRAMES) / 25.0)
+
+
+def test_single_chunk_matches_many_chunks(scenes_video):
+    many = get_scene_cuts_fast(scenes_video, workers=1, chunk_seconds=2.0)
+    single = get_scene_cuts_fast(scenes_video, workers=1, chunk_seconds=60.0)
+    assert many.equals(single)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from audio_analyzer import make_audio_peaks
+from scorer import calculate_highlight_scores, count_peaks_in_segments
+
+
+def nested_loop_counts(starts, ends, peak_times, peak_weights):
+    counts = np.zeros(len(starts), dtype=int)
+    sums = np.zeros(len(starts))
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        for time, weight in zip(peak_times, peak_weights):
+            if start <= time < end:
+                counts[i] += 1
+                sums[i] += weight
+    return counts, sums
+
+
+def test_matches_the_nested_loop_on_random_input():
+    rng = np.random.default_rng(3)
+    bounds = np.sort(rng.uniform(0, 600, 81))
+    peak_times = rng.uniform(0, 600, 500)  # unsorted
+    peak_weights = rng.uniform(0.5, 1.0, 500)
+
+    counts, sums = count_peaks_in_segments(bounds[:-1], bounds[1:], peak_times, peak_weights)
+    expected_counts, expected_sums = nested_loop_counts(bounds[:-1], bounds[1:], peak_times, peak_weights)
+    assert np.array_equal(counts, expected_counts)
+    assert np.allclose(sums, expected_sums)
+
+
+def test_segments_are_half_open():
+    starts = np.array([0.0, 10.0, 20.0])
+    ends = np.array([10.0, 20.0, 30.0])
+    counts, weights = count_peaks_in_segments(starts, ends, np.array([0.0, 10.0, 19.999, 30.0]))
+    assert counts.tolist() == [1, 2, 0]  # the peak at 30.0 is past the last end
+    assert weights is None
+
+
+def test_overlapping_segments_count_shared_peaks_twice():
+    counts, _ = count_peaks_in_segments(np.array([0.0, 5.0]), np.array([10.0, 15.0]), np.array([7.0]))
+    assert counts.tolist() == [1, 1]
+
+
+def test_no_peaks():
+    counts, weights = count_peaks_in_segments(np.array([0.0]), np.array([5.0]), np.zeros(0), np.zeros(0))
+    assert counts.tolist() == [0]
+    assert weights.tolist() == [0.0]
+
+
+def test_highlight_scores_rank_by_peak_density():
+    segments = pd.DataFrame({
+        "Segment": [1, 2],
+        "Start_Time": ["00:00:00.000", "00:00:10.000"],
+        "End_Time": ["00:00:10.000", "00:00:20.000"],
+    }).set_index("Segment")
+    peaks = make_audio_peaks([5.5, 15.2, 16.8], [90, 95, 88])
+
+    scored = calculate_highlight_scores(segments, peaks, {}, peak_weighting=True)
+    assert scored.index.tolist() == [2, 1]
+    assert scored["Audio_Peaks"].tolist() == [2, 1]
+    assert scored.loc[2, "Peak_Weight"] == 1.83
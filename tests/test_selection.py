@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from selection import MAX_CLIP_SECONDS, MIN_CLIP_SECONDS, MIN_GAP_SECONDS, select_clips, select_segments_for_duration
+
+
+def test_takes_the_densest_clips_within_the_budget():
+    clips = select_clips([0.0, 20.0, 40.0], [5.0, 25.0, 45.0], [10.0, 1.0, 8.0], target_duration=10.0)
+    assert clips == [(0.0, 5.0), (40.0, 45.0)]
+
+
+def test_adjacent_short_segments_are_merged():
+    assert select_clips([0.0, 1.0, 2.0], [1.0, 2.0, 3.0], [1.0, 1.0, 1.0], target_duration=10.0) == [(0.0, 3.0)]
+
+
+def test_long_clips_are_trimmed_to_their_centre():
+    assert select_clips([0.0], [60.0], [10.0], target_duration=30.0, max_clip=20.0) == [(20.0, 40.0)]
+
+
+def test_clips_closer_than_min_gap_are_joined():
+    assert select_clips([0.0, 6.0], [5.0, 10.0], [5.0, 5.0], target_duration=30.0, min_gap=2.0) == [(0.0, 10.0)]
+
+
+def test_non_positive_scores_are_ignored():
+    assert select_clips([0.0, 10.0], [5.0, 15.0], [0.0, -1.0], target_duration=30.0) == []
+    assert select_clips([], [], [], target_duration=30.0) == []
+
+
+@pytest.mark.parametrize("target_duration", [5.0, 30.0, 120.0])
+def test_constraints_hold_on_random_scenes(target_duration):
+    rng = np.random.default_rng(7)
+    bounds = np.concatenate([[0.0], np.cumsum(rng.uniform(0.5, 8.0, 400))])
+    scores = np.where(rng.random(400) < 0.2, 0.0, rng.uniform(0, 5, 400))
+
+    clips = select_clips(bounds[:-1], bounds[1:], scores, target_duration)
+    assert clips
+    assert sum(end - start for start, end in clips) <= target_duration + 1e-6
+    for start, end in clips:
+        assert min(MIN_CLIP_SECONDS, target_duration) - 1e-9 <= end - start <= MAX_CLIP_SECONDS + 1e-9
+    for (_, previous_end), (next_start, _) in zip(clips, clips[1:]):
+        assert next_start - previous_end >= MIN_GAP_SECONDS - 1e-9
+
+
+def test_select_segments_for_duration_reads_a_scored_table():
+    scored = pd.DataFrame({
+        "Start_Time": ["00:00:40.000", "00:00:00.000"],
+        "End_Time": ["00:00:45.000", "00:00:05.000"],
+        "Highlight_Score": [8.0, 10.0],
+    })
+    assert select_segments_for_duration(scored, 10.0) == [(0.0, 5.0), (40.0, 45.0)]
+    assert select_segments_for_duration(scored.iloc[:0], 10.0) == []
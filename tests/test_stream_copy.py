@@ -0,0 +1,61 @@
+import subprocess
+
+import pytest
+
+import highlight_generator
+
+SOURCE = {"codec_name": "h264", "profile": "High", "level": 40, "pix_fmt": "yuv420p",
+          "width": 1280, "height": 720, "r_frame_rate": "25/1"}
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """Runs render_stream_copy without ffmpeg: parts are empty files, probes are canned."""
+    calls = {"reencode": 0, "part_stream": dict(SOURCE), "decode_errors": ""}
+
+    def run_ffmpeg(args):
+        open(args[-1], "w").close()
+
+    def probe_streams(path):
+        return (calls["part_stream"] if path.endswith(".ts") else SOURCE), None
+
+    def run(command, **kwargs):
+        assert command[:4] == ["ffmpeg", "-nostdin", "-v", "error"] and command[-3:] == ["-f", "null", "-"]
+        return subprocess.CompletedProcess(command, 0, stdout="", stderr=calls["decode_errors"])
+
+    def render_reencode(video_path, segments, output_path):
+        calls["reencode"] += 1
+        return output_path
+
+    monkeypatch.setattr(highlight_generator, "_run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(highlight_generator, "probe_streams", probe_streams)
+    monkeypatch.setattr(highlight_generator, "get_keyframe_times", lambda path: [0.0, 2.0, 4.0, 6.0])
+    monkeypatch.setattr(highlight_generator.subprocess, "run", run)
+    monkeypatch.setattr(highlight_generator, "render_reencode", render_reencode)
+    return calls
+
+
+def _render(tmp_path):
+    # 1.0-5.0 s: encoded head, copied 2.0-4.0 GOP, encoded tail
+    return highlight_generator.render_highlight_video("source.mp4", [(1.0, 5.0)], str(tmp_path / "reel.mp4"), mode="copy")
+
+
+def test_matching_parts_are_stream_copied(fake_ffmpeg, tmp_path):
+    stats = _render(tmp_path)
+    assert stats["mode"] == "copy"
+    assert stats["copied_seconds"] == 2.0 and stats["reencoded_seconds"] == 2.0
+    assert fake_ffmpeg["reencode"] == 0
+
+
+def test_mismatched_part_falls_back_to_reencode(fake_ffmpeg, tmp_path):
+    fake_ffmpeg["part_stream"]["level"] = 31
+    stats = _render(tmp_path)
+    assert stats["mode"] == "reencode"
+    assert fake_ffmpeg["reencode"] == 1
+
+
+def test_joined_file_with_decode_errors_falls_back_to_reencode(fake_ffmpeg, tmp_path):
+    fake_ffmpeg["decode_errors"] = "[h264 @ 0x1] non-existing PPS 0 referenced\n"
+    stats = _render(tmp_path)
+    assert stats["mode"] == "reencode"
+    assert not (tmp_path / "reel.mp4").exists()
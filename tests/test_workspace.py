@@ -0,0 +1,79 @@
+import io
+import os
+
+import pytest
+
+from workspace import HEARTBEAT_NAME, Workspace, WorkspaceQuotaError, sweep_stale_workspaces
+
+
+class SizedUpload(io.BytesIO):
+    """An in-memory upload that reports its size, like Streamlit's UploadedFile."""
+
+    @property
+    def size(self):
+        return len(self.getbuffer())
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    with Workspace("session", root=str(tmp_path), quota_bytes=10_000) as ws:
+        yield ws
+
+
+def _stored_inputs(ws):
+    return sorted(os.listdir(ws.inputs_dir))
+
+
+def test_identical_uploads_are_stored_once(workspace, tmp_path):
+    data = os.urandom(4000)
+    source = tmp_path / "upload.mp4"
+    source.write_bytes(data)
+
+    first = workspace.ingest(io.BytesIO(data), "clip.MP4")
+    with open(source, "rb") as f:
+        second = workspace.ingest(f, "renamed.mp4", chunk_size=1000)
+
+    assert first == second and first.endswith(".mp4")
+    assert _stored_inputs(workspace) == [os.path.basename(first)]
+    assert open(first, "rb").read() == data
+
+
+def test_upload_over_quota_is_rejected_without_leftovers(workspace):
+    with pytest.raises(WorkspaceQuotaError):
+        workspace.ingest(io.BytesIO(os.urandom(12_000)), "big.mp4", chunk_size=1000)
+    assert _stored_inputs(workspace) == []
+
+
+def test_sized_upload_is_checked_before_writing(workspace):
+    workspace.ingest(io.BytesIO(os.urandom(6000)), "first.mp4")
+    with pytest.raises(WorkspaceQuotaError):
+        workspace.ingest(SizedUpload(os.urandom(6000)), "second.mp4")
+    assert len(_stored_inputs(workspace)) == 1
+
+
+def test_duplicate_past_the_budget_costs_nothing(workspace):
+    data = os.urandom(6000)
+    path = workspace.ingest(io.BytesIO(data), "first.mp4")
+    # Streamed (no getbuffer), so it is only recognised as a duplicate after hashing
+    assert workspace.ingest(io.BufferedReader(io.BytesIO(data)), "again.mp4", chunk_size=1000) == path
+    assert _stored_inputs(workspace) == [os.path.basename(path)]
+
+
+def test_release_inputs_keeps_the_current_upload(workspace):
+    old = workspace.ingest(io.BytesIO(b"old video"), "old.mp4")
+    new = workspace.ingest(io.BytesIO(b"new video"), "new.mp4")
+    workspace.release_inputs(keep=[new])
+    assert not os.path.exists(old) and os.path.exists(new)
+
+
+def test_cleanup_and_stale_sweep(tmp_path):
+    live = Workspace("live", root=str(tmp_path))
+    stale = Workspace("stale", root=str(tmp_path))
+    os.utime(os.path.join(stale.path, HEARTBEAT_NAME), (0, 0))
+
+    assert sweep_stale_workspaces(str(tmp_path), max_age_s=60) == [stale.path]
+    assert os.path.isdir(live.path) and not os.path.exists(stale.path)
+
+    live.cleanup()
+    live.cleanup()
+    assert not os.path.exists(live.path)
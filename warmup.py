@@ -0,0 +1,155 @@
+"""
+Startup cost control: heavy libraries are imported by the analyzers on first
+use, and this module loads them (and the emotion model) ahead of traffic.
+
+    python warmup.py --imports     # cold import cost of every module, each in a fresh interpreter
+    python warmup.py               # warm this process and the emotion worker pool, with timings
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import threading
+from concurrent.futures import Future
+
+# Heavy third-party modules behind each analysis component
+COMPONENT_MODULES = {
+    "scene": ["cv2", "scenedetect"],
+    "audio": ["numpy", "scipy.signal"],
+    "emotion": ["deepface.DeepFace"],
+    "render": ["moviepy.editor"],
+}
+ALL_COMPONENTS = tuple(COMPONENT_MODULES)
+
+# Project modules whose import cost the UI pays before it can render
+PROJECT_MODULES = [
+    "scorer", "frame_source", "scene_detector", "audio_analyzer", "emotion_detector", "emotion_engine",
+    "highlight_generator", "analysis_cache", "pipeline", "telemetry", "workspace",
+]
+
+
+def measure_import_costs(modules=None, python=sys.executable):
+    """
+    Cold import time of each module, measured in a fresh interpreter with
+    `python -X importtime` so nothing is already cached.
+
+    Returns:
+        dict: module -> seconds (cumulative, including its dependencies), or
+        an error string when the module cannot be imported.
+    """
+    modules = modules or PROJECT_MODULES + [m for names in COMPONENT_MODULES.values() for m in names]
+    here = os.path.dirname(os.path.abspath(__file__))
+    costs = {}
+    for module in modules:
+        result = subprocess.run(
+            [python, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=here
+        )
+        if result.returncode != 0:
+            costs[module] = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"
+            continue
+        # Lines look like "import time:  self [us] | cumulative | imported package";
+        # the last entry for the module itself carries its cumulative cost
+        cumulative_us = None
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            parts = [part.strip() for part in line[len("import time:"):].split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative_us = int(parts[1])
+        costs[module] = cumulative_us / 1e6 if cumulative_us is not None else 0.0
+    return costs
+
+
+def preload(components=ALL_COMPONENTS):
+    """
+    Imports the heavy modules of each component in this process.
+
+    Returns:
+        dict: component -> seconds, or an error string for missing optional dependencies.
+    """
+    import importlib
+
+    timings = {}
+    for component in components:
+        start = time.perf_counter()
+        try:
+            for module in COMPONENT_MODULES[component]:
+                importlib.import_module(module)
+            if component == "emotion":
+                # Build the emotion model too, so the first DeepFace.analyze call reuses it
+                from emotion_engine import _load_emotion_model
+                _load_emotion_model()
+            timings[component] = round(time.perf_counter() - start, 3)
+        except Exception as e:
+            timings[component] = f"{type(e).__name__}: {e}"
+    return timings
+
+
+def init_worker(components=ALL_COMPONENTS):
+    """Process-pool initializer: pays the imports and model load before the worker takes its first job."""
+    preload(components)
+
+
+def warm_up(components=ALL_COMPONENTS, engine=None):
+    """
+    Preloads the components in this process and, when an EmotionEngine is
+    given, blocks until every one of its workers has loaded the model.
+
+    Returns:
+        dict: Seconds per component, plus "emotion_workers" for the pool.
+    """
+    # The engine's workers load the model themselves, so skip it here
+    local = [c for c in components if not (c == "emotion" and engine is not None)]
+    timings = preload(local)
+    if engine is not None and "emotion" in components:
+        start = time.perf_counter()
+        try:
+            engine.warm_up()
+            timings["emotion_workers"] = round(time.perf_counter() - start, 3)
+        except Exception as e:
+            timings["emotion_workers"] = f"{type(e).__name__}: {e}"
+    return timings
+
+
+def warm_up_in_background(components=ALL_COMPONENTS, engine=None):
+    """
+    Runs warm_up on a daemon thread so the caller (e.g. the Streamlit page)
+    stays responsive. Returns a Future holding the warm_up timings.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(warm_up(components, engine))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="vhg-warmup", daemon=True).start()
+    return future
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure import costs or warm up the analysis stack.")
+    parser.add_argument("--imports", action="store_true", help="Report the cold import cost of each module")
+    parser.add_argument("--components", nargs="+", choices=ALL_COMPONENTS, default=list(ALL_COMPONENTS))
+    parser.add_argument("--no-engine", action="store_true", help="Do not start the emotion worker pool")
+    args = parser.parse_args()
+
+    if args.imports:
+        for module, cost in measure_import_costs().items():
+            print(f"{module:<22} {cost:>8.3f}s" if isinstance(cost, float) else f"{module:<22} {cost}")
+        sys.exit(0)
+
+    engine = None
+    if "emotion" in args.components and not args.no_engine:
+        from emotion_engine import get_emotion_engine
+        engine = get_emotion_engine()
+
+    start = time.perf_counter()
+    for component, seconds in warm_up(args.components, engine).items():
+        print(f"{component:<16} {seconds}")
+    print(f"{'total':<16} {time.perf_counter() - start:.3f}")
+    if engine is not None:
+        engine.shutdown()
@@ -0,0 +1,216 @@
+"""
+Per-session workspaces for uploads and everything derived from them.
+
+Each session gets one directory holding its ingested inputs and rendered
+reels (renderer scratch files live under it as well). Uploads are streamed to
+disk in chunks and stored under their content hash, so re-uploading the same
+video is a no-op. The directory is removed when the workspace is cleaned up,
+garbage-collected or the process exits; directories left behind by a crashed
+process are swept once they go stale.
+"""
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import weakref
+
+DEFAULT_WORKSPACE_ROOT = os.environ.get(
+    "VHG_WORKSPACE_DIR", os.path.join(tempfile.gettempdir(), "vhg_workspaces")
+)
+DEFAULT_QUOTA_BYTES = int(os.environ.get("VHG_WORKSPACE_QUOTA_BYTES", 8 * 1024 ** 3))
+
+# Workspaces not touched for this long are assumed abandoned
+STALE_AFTER_SECONDS = int(os.environ.get("VHG_WORKSPACE_STALE_SECONDS", 6 * 3600))
+
+INGEST_CHUNK_BYTES = 8 * 1024 * 1024
+HEARTBEAT_NAME = ".last_used"
+
+
+class WorkspaceQuotaError(Exception):
+    """Raised when a write would take a workspace over its byte quota."""
+
+
+def directory_size(path):
+    """Total size in bytes of all files under `path`."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # removed while we were walking
+    return total
+
+
+def sweep_stale_workspaces(root=None, max_age_s=STALE_AFTER_SECONDS):
+    """
+    Removes workspaces under `root` whose heartbeat is older than max_age_s
+    (left behind by sessions that ended without cleanup, or by a crash).
+
+    Returns:
+        list: Paths that were removed.
+    """
+    root = root or DEFAULT_WORKSPACE_ROOT
+    if not os.path.isdir(root):
+        return []
+
+    removed = []
+    cutoff = time.time() - max_age_s
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        heartbeat = os.path.join(path, HEARTBEAT_NAME)
+        try:
+            last_used = os.path.getmtime(heartbeat if os.path.exists(heartbeat) else path)
+        except OSError:
+            continue
+        if os.path.isdir(path) and last_used < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+def _iter_chunks(source, chunk_size):
+    """
+    Yields the source's bytes in chunks. In-memory uploads (anything with
+    getbuffer(), e.g. Streamlit's UploadedFile) are sliced as memoryviews, so
+    no second copy of the video is made; other file objects are read().
+    """
+    if hasattr(source, "getbuffer"):
+        buffer = source.getbuffer()
+        for offset in range(0, len(buffer), chunk_size):
+            yield buffer[offset:offset + chunk_size]
+        return
+
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class Workspace:
+    """
+    A session's private directory, with a byte quota.
+
+    Args:
+        session_id (str): Directory name (default: a random id).
+        root (str): Parent directory shared by all workspaces.
+        quota_bytes (int): Maximum bytes the workspace may hold.
+    """
+
+    def __init__(self, session_id=None, root=None, quota_bytes=None):
+        self.root = root or DEFAULT_WORKSPACE_ROOT
+        self.quota_bytes = quota_bytes or DEFAULT_QUOTA_BYTES
+        self.path = os.path.join(self.root, session_id or uuid.uuid4().hex)
+        self.inputs_dir = os.path.join(self.path, "inputs")
+        self.outputs_dir = os.path.join(self.path, "outputs")
+
+        sweep_stale_workspaces(self.root)
+        self.touch()
+
+        # Runs on cleanup(), when the object is garbage-collected, or at interpreter exit
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+    def touch(self):
+        """Refreshes the heartbeat so sweep_stale_workspaces leaves this workspace alone."""
+        # Recreates the directories if a sweep removed them during a long idle period
+        os.makedirs(self.inputs_dir, exist_ok=True)
+        os.makedirs(self.outputs_dir, exist_ok=True)
+        with open(os.path.join(self.path, HEARTBEAT_NAME), "w"):
+            pass
+
+    def usage(self):
+        return directory_size(self.path)
+
+    def check_quota(self, incoming_bytes=0):
+        """Raises WorkspaceQuotaError if `incoming_bytes` more would exceed the quota."""
+        used = self.usage()
+        if used + incoming_bytes > self.quota_bytes:
+            raise WorkspaceQuotaError(
+                f"Workspace quota exceeded: {used + incoming_bytes} bytes needed, {self.quota_bytes} allowed"
+            )
+
+    def ingest(self, source, filename, chunk_size=INGEST_CHUNK_BYTES):
+        """
+        Streams an upload (file object or in-memory buffer) into inputs/,
+        named after its content hash. An identical file already in the
+        workspace is reused instead of being written again, and only bytes
+        that are actually stored count against the quota.
+
+        Returns:
+            str: Path of the stored input.
+
+        Raises:
+            WorkspaceQuotaError: if the upload does not fit in the quota.
+        """
+        self.touch()
+        extension = os.path.splitext(filename)[1].lower()
+
+        # 1. In-memory uploads can be hashed before anything is written, so a
+        #    rerun with the same upload does not touch the disk (or the quota) at all
+        if hasattr(source, "getbuffer"):
+            final_path = os.path.join(self.inputs_dir, hashlib.blake2b(source.getbuffer(), digest_size=16).hexdigest() + extension)
+            if os.path.exists(final_path):
+                return final_path
+            size = getattr(source, "size", None)
+            if size is not None:
+                self.check_quota(size)
+
+        # 2. Stream to a partial file while hashing, enforcing the quota as we go.
+        #    Past the budget the rest is only hashed: if the content turns out to
+        #    be stored already it costs nothing, otherwise the upload is rejected
+        budget = self.quota_bytes - self.usage()
+        digest = hashlib.blake2b(digest_size=16)
+        part_path = os.path.join(self.inputs_dir, f".{uuid.uuid4().hex}.part")
+        written = 0
+        over_quota = False
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in _iter_chunks(source, chunk_size):
+                    digest.update(chunk)
+                    written += len(chunk)
+                    if written > budget:
+                        over_quota = True
+                    if not over_quota:
+                        f.write(chunk)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        # 3. Keep one copy per content hash
+        final_path = os.path.join(self.inputs_dir, digest.hexdigest() + extension)
+        if os.path.exists(final_path):
+            os.remove(part_path)
+        elif over_quota:
+            os.remove(part_path)
+            raise WorkspaceQuotaError(
+                f"Upload '{filename}' exceeds the workspace quota of {self.quota_bytes} bytes"
+            )
+        else:
+            os.replace(part_path, final_path)
+        return final_path
+
+    def release_inputs(self, keep=()):
+        """Deletes ingested inputs except the paths in `keep` (e.g. after a new upload replaced them)."""
+        keep = {os.path.abspath(path) for path in keep}
+        for name in os.listdir(self.inputs_dir):
+            path = os.path.abspath(os.path.join(self.inputs_dir, name))
+            if path not in keep:
+                os.remove(path)
+
+    def clear_outputs(self):
+        shutil.rmtree(self.outputs_dir, ignore_errors=True)
+        os.makedirs(self.outputs_dir, exist_ok=True)
+
+    def cleanup(self):
+        """Removes the whole workspace. Safe to call more than once."""
+        self._finalizer()